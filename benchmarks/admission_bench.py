@@ -0,0 +1,164 @@
+"""
+Admission control and upstream rate limiting under overload.
+
+upstream:  several processes, standing in for MCP server workers, fire OpenFDA
+           requests through async_http at a stub that answers 429 beyond
+           --stub-rate requests per second. Run once with the shared token
+           buckets of rate_limit.py and once without, counting what the stub refused.
+admission: a burst of /chat requests against the FastAPI app with a stubbed model
+           and tools, more than MAX_ACTIVE_CHATS + MAX_QUEUED_CHATS, counting how
+           many were served and how many got 503 with Retry-After.
+
+Usage (from the repository root):
+    python -m benchmarks.admission_bench
+    python -m benchmarks.admission_bench --workers 4 --requests 40 --stub-rate 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def worker(base_url: str, requests: int, concurrency: int) -> dict:
+    """Runs in each worker process: `requests` drug label lookups, `concurrency` at a time."""
+    sys.path.insert(0, os.path.join(REPO_ROOT, "src", "mcp-server"))
+    import async_http
+    from rate_limit import limiter
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> int:
+        async with semaphore:
+            response = await async_http.get(base_url + "/openfda/drug/label.json",
+                                            params={"search": "openfda.brand_name:advil", "limit": 1})
+            return response.status_code
+
+    statuses = await asyncio.gather(*(one() for _ in range(requests)))
+    return {"statuses": Counter(statuses), "limiter": limiter.stats()}
+
+
+def run_upstream(args, limited: bool) -> dict:
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_upstreams", "--rate-limit", str(args.stub_rate)],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True
+    )
+    base_url = stub.stdout.readline().strip()
+    work_dir = tempfile.mkdtemp(prefix="admission_bench_")
+    env = dict(
+        os.environ,
+        MCP_RATE_LIMIT="1" if limited else "0",
+        MCP_RATE_LIMIT_PATH=os.path.join(work_dir, "rate_limits.sqlite"),
+        # stay just under the stub's limit, as the defaults do for the real APIs
+        MCP_RATE_LIMITS=json.dumps({"127.0.0.1": [args.stub_rate * 0.9, max(1, int(args.stub_rate))]}),
+    )
+    start = time.perf_counter()
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.admission_bench", "--worker", base_url,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(args.workers)
+    ]
+    statuses = Counter()
+    for process in workers:
+        result = json.loads(process.communicate()[0].strip().splitlines()[-1])
+        statuses.update({int(status): count for status, count in result["statuses"].items()})
+    elapsed = time.perf_counter() - start
+
+    import httpx
+    stub_stats = httpx.get(base_url + "/stats").json()
+    stub.terminate()
+    stub.wait()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "limited": limited,
+        "seconds": elapsed,
+        "ok": statuses.get(200, 0),
+        "failed": sum(count for status, count in statuses.items() if status != 200),
+        "stub_429s": sum(stub_stats["throttled"].values()),
+    }
+
+
+async def run_admission(args) -> dict:
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["MAX_ACTIVE_CHATS"] = str(args.active_chats)
+    os.environ["MAX_QUEUED_CHATS"] = str(args.queued_chats)
+    import httpx
+    from benchmarks.chat_load import StubModels, StubPool
+    from src import fastapi_app
+    from src.host.answer_cache import AnswerCache
+    from types import SimpleNamespace
+
+    chatbot = fastapi_app.chatbot
+    chatbot.answers = AnswerCache(max_entries=0)
+    chatbot.gemini = SimpleNamespace(aio=SimpleNamespace(models=StubModels(args.model_latency, blocking=False)))
+    chatbot.gemini_client.pools["openfda_server"] = StubPool(0.05)
+    chatbot.gemini_client.tool_server_map["search_drug"] = "openfda_server"
+
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one() -> tuple:
+            start = time.perf_counter()
+            async with client.stream("POST", "/chat", json={"query": "What are the side effects of ibuprofen?"}) as response:
+                await response.aread()
+                return response.status_code, response.headers.get("Retry-After"), time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one() for _ in range(args.chats)))
+        elapsed = time.perf_counter() - start
+    served = sorted(seconds for status, _, seconds in results if status == 200)
+    return {
+        "chats": args.chats,
+        "served": len(served),
+        "rejected": sum(1 for status, _, _ in results if status == 503),
+        "retry_after": sorted({int(value) for status, value, _ in results if status == 503}),
+        "served_p50_ms": served[len(served) // 2] * 1000 if served else None,
+        "served_max_ms": served[-1] * 1000 if served else None,
+        "seconds": elapsed,
+        "admission": fastapi_app.admission.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="worker processes calling the upstream")
+    parser.add_argument("--requests", type=int, default=30, help="requests per worker")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight per worker")
+    parser.add_argument("--stub-rate", type=float, default=5.0, help="requests per second the stub serves")
+    parser.add_argument("--chats", type=int, default=200, help="concurrent /chat requests")
+    parser.add_argument("--active-chats", type=int, default=16)
+    parser.add_argument("--queued-chats", type=int, default=32)
+    parser.add_argument("--model-latency", type=float, default=0.1)
+    parser.add_argument("--worker", metavar="BASE_URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = asyncio.run(worker(args.worker, args.requests, args.concurrency))
+        print(json.dumps(result))
+        return
+
+    total = args.workers * args.requests
+    print(f"upstream: {args.workers} workers x {args.requests} requests against a stub serving {args.stub_rate:g}/s")
+    print(f"{'buckets':>8} {'seconds':>8} {'ok':>5} {'failed':>7} {'429s':>6}")
+    for limited in (False, True):
+        row = run_upstream(args, limited)
+        print(f"{'on' if limited else 'off':>8} {row['seconds']:>8.1f} {row['ok']:>5} {row['failed']:>7} {row['stub_429s']:>6}")
+    print(f"(ideal: {total} requests at {args.stub_rate:g}/s take {total / args.stub_rate:.1f}s)")
+
+    row = asyncio.run(run_admission(args))
+    print(f"\nadmission: {row['chats']} concurrent chats, {args.active_chats} active + {args.queued_chats} queued allowed")
+    print(f"served {row['served']} (p50 {row['served_p50_ms']:.0f} ms, max {row['served_max_ms']:.0f} ms), "
+          f"rejected {row['rejected']} with Retry-After {row['retry_after']}, in {row['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Concurrent /chat load test against GeminiChatBot.process_query with a stubbed model.
+
+The Gemini client and the MCP server pools are replaced by fakes that sleep for a
+fixed latency, so the numbers only reflect how well concurrent chats overlap.
+
+Usage (from the repository root):
+    python -m benchmarks.chat_load
+    python -m benchmarks.chat_load --levels 1 8 32 --model-latency 0.2 --blocking
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from google.genai import types
+from mcp.types import CallToolResult, TextContent
+from src.host.answer_cache import AnswerCache
+from src.host.gemini_chatbot import GeminiChatBot
+
+
+ANSWER = "Ibuprofen is a nonsteroidal anti-inflammatory drug. " * 20
+
+
+class StubModels:
+    """Answers the first turn with a tool call and the second with streamed text."""
+
+    def __init__(self, latency: float, blocking: bool, chunks: int = 10):
+        self.latency = latency
+        self.blocking = blocking
+        self.chunks = chunks
+
+    async def wait(self, seconds: float):
+        if self.blocking:
+            time.sleep(seconds)  # what a synchronous SDK call does to the loop
+        else:
+            await asyncio.sleep(seconds)
+
+    async def generate_content_stream(self, model, contents, config):
+        # time to first chunk is a fraction of the turn, the rest is spread over the chunks
+        await self.wait(self.latency / self.chunks)
+
+        async def stream():
+            if len(contents) == 1:
+                part = types.Part.from_function_call(name="search_drug", args={"drug_name": "ibuprofen"})
+                yield types.GenerateContentResponse(
+                    candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+                )
+                return
+            size = len(ANSWER) // self.chunks + 1
+            for i in range(0, len(ANSWER), size):
+                if i:
+                    await self.wait(self.latency / self.chunks)
+                part = types.Part.from_text(text=ANSWER[i:i + size])
+                yield types.GenerateContentResponse(
+                    candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+                )
+
+        return stream()
+
+
+class StubPool:
+    """Answers every tool call after a fixed latency, with the tool's entry in `results` or {}."""
+
+    def __init__(self, latency: float, results: Optional[dict] = None):
+        self.latency = latency
+        self.results = results or {}
+
+    async def call_tool(self, tool_name, arguments=None, progress_callback=None, retry=False):
+        await asyncio.sleep(self.latency)
+        return CallToolResult(content=[TextContent(type="text", text=json.dumps(self.results.get(tool_name, {})))])
+
+
+def make_chatbot(model_latency: float, tool_latency: float, blocking: bool, answer_cache: bool = False) -> GeminiChatBot:
+    chatbot = GeminiChatBot()
+    if not answer_cache:
+        # every chat asks the same question, which would otherwise be answered from the cache
+        chatbot.answers = AnswerCache(max_entries=0)
+    chatbot.gemini = SimpleNamespace(aio=SimpleNamespace(models=StubModels(model_latency, blocking)))
+    chatbot.gemini_client.pools["openfda_server"] = StubPool(tool_latency)
+    chatbot.gemini_client.tool_server_map["search_drug"] = "openfda_server"
+    return chatbot
+
+
+async def one_chat(chatbot: GeminiChatBot) -> tuple:
+    """Return (time to first answer byte, total latency) for one chat."""
+    start = time.perf_counter()
+    first_byte = None
+    async for chunk in chatbot.process_query("What are the side effects of ibuprofen?"):
+        if first_byte is None and not chunk.startswith("[CALLING TOOL"):
+            first_byte = time.perf_counter() - start
+    return first_byte, time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_level(chatbot: GeminiChatBot, concurrency: int, rounds: int) -> dict:
+    samples = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        samples += await asyncio.gather(*(one_chat(chatbot) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    first_bytes = [first for first, _ in samples]
+    latencies = [total for _, total in samples]
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "ttfb_p50_ms": percentile(first_bytes, 50) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput_rps": len(latencies) / elapsed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rounds", type=int, default=3, help="batches of concurrent chats per level")
+    parser.add_argument("--model-latency", type=float, default=0.1, help="seconds per streamed model turn")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="seconds per call_tool")
+    parser.add_argument("--blocking", action="store_true", help="simulate the old synchronous model call")
+    parser.add_argument("--answer-cache", action="store_true", help="serve repeated questions from the answer cache")
+    args = parser.parse_args()
+
+    chatbot = make_chatbot(args.model_latency, args.tool_latency, args.blocking, args.answer_cache)
+    print(f"{'concurrency':>11} {'requests':>8} {'ttfb p50':>9} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for level in args.levels:
+        row = await run_level(chatbot, level, args.rounds)
+        print(f"{row['concurrency']:>11} {row['requests']:>8} {row['ttfb_p50_ms']:>9.1f} {row['p50_ms']:>9.1f} "
+              f"{row['p99_ms']:>9.1f} {row['throughput_rps']:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
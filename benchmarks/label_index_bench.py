@@ -0,0 +1,125 @@
+"""
+Drug label lookups from the local index of label_index.py against the live API.
+
+A synthetic bulk dump is made by copying the labels of
+benchmarks/fixtures/openfda_labels.json under made-up brand and generic names.
+The index is built from it, then exact, prefix and misspelled names are looked
+up in it, and exact names are fetched from the stubbed openFDA API (uncached)
+for comparison.
+
+Usage (from the repository root):
+    python -m benchmarks.label_index_bench
+    python -m benchmarks.label_index_bench --labels 100000 --lookups 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(REPO_ROOT, "benchmarks", "fixtures", "openfda_labels.json")
+
+
+def synthetic_dump(path: str, labels: int, seed: int = 0) -> list:
+    """Write `labels` labels as one bulk file and return their brand names."""
+    random.seed(seed)
+    with open(FIXTURE) as file:
+        templates = json.load(file)
+    syllables = ["ad", "vil", "tra", "zo", "mex", "lin", "pro", "fen", "dol", "xa", "ri", "cor", "ta", "nib"]
+    results, brands = [], []
+    for number in range(labels):
+        label = json.loads(json.dumps(templates[number % len(templates)]))
+        brand = "".join(random.choice(syllables) for _ in range(3)) + str(number)
+        label["openfda"]["brand_name"] = [brand.capitalize()]
+        label["openfda"]["generic_name"] = [f"GENERIC {number}"]
+        label["id"] = f"synthetic-{number}"
+        results.append(label)
+        brands.append(brand)
+    with open(path, "w") as file:
+        json.dump({"results": results}, file)
+    return brands
+
+
+def misspell(name: str) -> str:
+    position = random.randrange(1, len(name))
+    return name[:position] + name[position + 1:]
+
+
+def timed(fn, names: list) -> float:
+    """Median milliseconds of fn(name) over names."""
+    latencies = []
+    for name in names:
+        start = time.perf_counter()
+        fn(name)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+async def live_lookups(base_url: str, names: list) -> float:
+    sys.path.insert(0, os.path.join(REPO_ROOT, "src", "mcp-server"))
+    import async_http
+    latencies = []
+    for name in names:
+        start = time.perf_counter()
+        await async_http.get(base_url + "/openfda/drug/label.json",
+                             params={"search": f"openfda.brand_name:{name}", "limit": 1})
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", type=int, default=20000, help="labels in the synthetic dump")
+    parser.add_argument("--lookups", type=int, default=2000, help="lookups timed per kind")
+    parser.add_argument("--live-lookups", type=int, default=100, help="requests timed against the stub API")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(REPO_ROOT, "src", "mcp-server"))
+    from label_index import LabelIndex, build
+
+    work_dir = tempfile.mkdtemp(prefix="label_index_bench_")
+    dump = os.path.join(work_dir, "drug-label-0001-of-0001.json")
+    brands = synthetic_dump(dump, args.labels)
+    start = time.perf_counter()
+    counts = build([dump], os.path.join(work_dir, "index"))
+    build_seconds = time.perf_counter() - start
+    sizes = {name: os.path.getsize(os.path.join(work_dir, "index", name)) / 1e6
+             for name in ("records.jsonl", "names.txt", "postings.bin")}
+
+    start = time.perf_counter()
+    index = LabelIndex.open(os.path.join(work_dir, "index"))
+    open_ms = (time.perf_counter() - start) * 1000
+    sample = random.sample(brands, min(args.lookups, len(brands)))
+    rows = [
+        ("exact, any case", timed(lambda name: index.get(name.upper()), sample)),
+        ("prefix", timed(lambda name: index.match(name[:4]), sample)),
+        ("misspelled", timed(lambda name: index.match(misspell(name)), sample)),
+    ]
+
+    stub = subprocess.Popen([sys.executable, "-m", "benchmarks.stub_upstreams"],
+                            cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    base_url = stub.stdout.readline().strip()
+    live_names = ["advil", "tylenol", "ibuprofen", "acetaminophen"] * (args.live_lookups // 4 + 1)
+    rows.append(("live API (stub)", asyncio.run(live_lookups(base_url, live_names[:args.live_lookups]))))
+    stub.terminate()
+    stub.wait()
+    index.close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"built {counts['names']} names over {counts['records']} labels in {build_seconds:.1f}s, "
+          f"opened in {open_ms:.0f} ms")
+    print("  ".join(f"{name} {size:.1f} MB" for name, size in sizes.items()))
+    print(f"{'lookup':>16} {'median ms':>10}")
+    for name, ms in rows:
+        print(f"{name:>16} {ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+"""
+End-to-end /chat benchmark that runs fully offline.
+
+The real FastAPI app, MCP client pools and the four Python MCP servers are used;
+only the edges are replaced:
+  * Gemini is swapped for a scripted model that replays the tool-call sequences
+    in benchmarks/fixtures/scenarios.json with configurable delays.
+  * The servers talk to benchmarks/stub_upstreams.py, which replays recorded
+    OpenFDA, ClinicalTrials, RCSB and arXiv responses.
+
+For each concurrency level it reports throughput, latency percentiles, a
+per-stage breakdown from the tracing histograms (host and servers) and the RSS of
+the host and every server process. Results are written as JSON so runs can be
+compared with --compare.
+
+Usage (from the repository root):
+    python -m benchmarks.offline_suite
+    python -m benchmarks.offline_suite --levels 1 8 32 --upstream-latency 0.1 --compare benchmarks/results/before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(REPO_ROOT, "src", "mcp-server")
+SCENARIOS_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "scenarios.json")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SERVERS = ("arxiv_server", "openfda_server", "clinicaltrials_server", "pdb_server")
+# labels that split a stage into too many series to be useful in a summary
+MERGED_LABELS = ("outcome", "worker")
+
+# the host reads these at import, so they are set before anything from src is imported
+WORK_DIR = tempfile.mkdtemp(prefix="offline_suite_")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ["MCP_SERVER_CONFIG"] = os.path.join(WORK_DIR, "server_config.json")
+os.environ["MCP_TOOL_CACHE"] = os.path.join(WORK_DIR, "tool_cache.json")
+
+import httpx
+import uvicorn
+from google.genai import types
+from benchmarks.chat_load import percentile
+from benchmarks.stub_upstreams import server_env
+
+
+class ScriptedModels:
+    """
+    Stands in for `client.aio.models`, replaying a scripted conversation per query.
+
+    The scenario is picked by the text of the latest user message and the turn by
+    the number of model turns since then. Each turn sleeps for its latency (scaled
+    by `scale`), spread over the streamed chunks of text turns.
+    """
+
+    def __init__(self, scenarios: dict, scale: float):
+        self.by_query = {scenario["query"]: scenario for scenario in scenarios["scenarios"]}
+        self.chunks = scenarios.get("chunks", 10)
+        self.scale = scale
+
+    def next_turn(self, contents) -> dict:
+        for index in range(len(contents) - 1, -1, -1):
+            content = contents[index]
+            if content.role == "user" and content.parts and content.parts[0].text:
+                scenario = self.by_query[content.parts[0].text]
+                done = sum(1 for c in contents[index + 1:] if c.role == "model")
+                return scenario["turns"][min(done, len(scenario["turns"]) - 1)]
+        raise ValueError("No user message in contents")
+
+    async def generate_content_stream(self, model, contents, config):
+        turn = self.next_turn(contents)
+        latency = turn["latency"] * self.scale
+        if "calls" in turn:
+            await asyncio.sleep(latency)
+            parts = [types.Part.from_function_call(name=call["name"], args=call["args"]) for call in turn["calls"]]
+        else:
+            await asyncio.sleep(latency / self.chunks)
+            parts = None
+
+        async def stream():
+            if parts:
+                yield types.GenerateContentResponse(
+                    candidates=[types.Candidate(content=types.Content(role="model", parts=parts))]
+                )
+                return
+            text = turn["text"] * turn.get("repeat", 1)
+            size = len(text) // self.chunks + 1
+            for i in range(0, len(text), size):
+                if i:
+                    await asyncio.sleep(latency / self.chunks)
+                part = types.Part.from_text(text=text[i:i + size])
+                yield types.GenerateContentResponse(
+                    candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+                )
+
+        return stream()
+
+
+def start_stub(latency: float, jitter: float) -> tuple:
+    """Run the stub upstreams in their own process so their memory and CPU stay out of the host's numbers."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_upstreams", "--latency", str(latency), "--jitter", str(jitter)],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True
+    )
+    return process, process.stdout.readline().strip()
+
+
+def write_server_config(base_url: str, workers: int, cache: bool) -> None:
+    env = dict(server_env(base_url), MCP_CACHE="1" if cache else "0")
+    config = {
+        "lazyStart": False,
+        "mcpServers": {
+            name: {
+                "command": sys.executable,
+                "args": [os.path.join(SERVER_DIR, name + ".py")],
+                # arxiv_papers/ and mcp_cache/ are created in the working directory
+                "cwd": WORK_DIR,
+                "env": env,
+                "workers": workers,
+            }
+            for name in SERVERS
+        },
+    }
+    with open(os.environ["MCP_SERVER_CONFIG"], "w") as file:
+        json.dump(config, file, indent=2)
+
+
+class HostThread(threading.Thread):
+    """Serves the FastAPI app with uvicorn on its own event loop, like a separate server."""
+
+    def __init__(self, app, port: int):
+        super().__init__(daemon=True)
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        self.loop.run_until_complete(self.server.serve())
+
+    def call(self, coro, timeout: float = 30):
+        """Run a coroutine on the host's loop, e.g. to read the MCP server metrics."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.join(30)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_status(pid) -> dict:
+    """VmRSS and VmHWM (peak RSS) of a process in MB, from /proc."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def child_pids(pid: int) -> list:
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as file:
+                pids += [int(child) for child in file.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def memory_usage(exclude: int) -> dict:
+    """RSS of the host process and of each MCP server process below it (Linux only)."""
+    host = read_status("self")
+    if not host:
+        import resource
+        return {"host_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    servers = {}
+    stack = [pid for pid in child_pids(os.getpid()) if pid != exclude]
+    while stack:
+        pid = stack.pop()
+        stack += child_pids(pid)
+        try:
+            with open(f"/proc/{pid}/cmdline") as file:
+                cmdline = file.read().split("\0")
+        except OSError:
+            continue
+        name = next((os.path.basename(arg)[:-3] for arg in cmdline if arg.endswith("_server.py")), None)
+        if name:
+            servers[name] = servers.get(name, 0.0) + read_status(pid).get("VmRSS", 0.0)
+    return {
+        "host_mb": host.get("VmRSS"),
+        "host_peak_mb": host.get("VmHWM"),
+        "servers_mb": {name: round(mb, 1) for name, mb in sorted(servers.items())},
+        "total_mb": round(host.get("VmRSS", 0.0) + sum(servers.values()), 1),
+    }
+
+
+def histogram_quantile(bounds, counts, q: float) -> float:
+    """Estimate a quantile from bucket counts by interpolating inside the bucket it falls in."""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if cumulative + count >= rank and count:
+            lower = bounds[index - 1] if index else 0.0
+            upper = bounds[index] if index < len(bounds) else bounds[-1]
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return bounds[-1]
+
+
+def stage_breakdown(before: list, after: list) -> dict:
+    """Per-stage count, mean and estimated percentiles of what was recorded between two snapshots."""
+    import tracing
+
+    def key(entry):
+        labels = ",".join(f"{k}={v}" for k, v in sorted(entry["labels"].items()) if k not in MERGED_LABELS)
+        return f"{entry['name']}{{{labels}}}" if labels else entry["name"]
+
+    def series_id(entry):
+        return entry["name"], tuple(sorted(entry["labels"].items()))
+
+    previous = {series_id(entry): entry for entry in before}
+    stages = {}
+    for entry in after:
+        old = previous.get(series_id(entry))
+        counts = [c - (old["counts"][i] if old else 0) for i, c in enumerate(entry["counts"])]
+        count = entry["count"] - (old["count"] if old else 0)
+        if not count:
+            continue
+        stage = stages.setdefault(key(entry), {"counts": [0] * len(counts), "sum": 0.0, "count": 0, "errors": 0})
+        stage["counts"] = [a + b for a, b in zip(stage["counts"], counts)]
+        stage["sum"] += entry["sum"] - (old["sum"] if old else 0.0)
+        stage["count"] += count
+        if entry["labels"].get("outcome") == "error":
+            stage["errors"] += count
+    return {
+        name: {
+            "count": stage["count"],
+            "errors": stage["errors"],
+            "mean_ms": round(stage["sum"] / stage["count"] * 1000, 2),
+            "p50_ms": round(histogram_quantile(tracing.BUCKETS, stage["counts"], 0.5) * 1000, 2),
+            "p95_ms": round(histogram_quantile(tracing.BUCKETS, stage["counts"], 0.95) * 1000, 2),
+        }
+        for name, stage in sorted(stages.items())
+    }
+
+
+async def one_chat(client: httpx.AsyncClient, url: str, query: str) -> tuple:
+    """Return (time to first answer byte, total latency, ok) for one streamed /chat request."""
+    start = time.perf_counter()
+    first_byte = None
+    received = ""
+    async with client.stream("POST", url, json={"query": query}) as response:
+        async for text in response.aiter_text():
+            received += text
+            if first_byte is None:
+                answer = [line for line in received.splitlines() if not line.startswith("[CALLING TOOL")]
+                if any(answer):
+                    first_byte = time.perf_counter() - start
+        ok = response.status_code == 200
+    total = time.perf_counter() - start
+    return first_byte if first_byte is not None else total, total, ok
+
+
+async def run_level(url: str, queries: list, concurrency: int, rounds: int) -> dict:
+    samples = []
+
+    async def client_loop(client, worker: int):
+        for i in range(rounds):
+            query = queries[(worker + i) % len(queries)]
+            try:
+                samples.append(await one_chat(client, url, query))
+            except httpx.HTTPError:
+                samples.append((None, None, False))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, worker) for worker in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    completed = [sample for sample in samples if sample[2]]
+    latencies = [total for _, total, _ in completed] or [0.0]
+    first_bytes = [first for first, _, _ in completed] or [0.0]
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": len(samples) - len(completed),
+        "throughput_rps": round(len(completed) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p90": round(percentile(latencies, 90) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "mean": round(statistics.mean(latencies) * 1000, 1),
+        },
+        "ttfb_ms": {
+            "p50": round(percentile(first_bytes, 50) * 1000, 1),
+            "p99": round(percentile(first_bytes, 99) * 1000, 1),
+        },
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_level(row: dict) -> None:
+    latency, ttfb = row["latency_ms"], row["ttfb_ms"]
+    print(f"{row['concurrency']:>11} {row['requests']:>8} {row['errors']:>6} {ttfb['p50']:>9.1f} {latency['p50']:>9.1f} "
+          f"{latency['p99']:>9.1f} {row['throughput_rps']:>8.2f} {row['rss_mb'].get('total_mb', 0):>9.1f}")
+
+
+def print_stages(stages: dict) -> None:
+    for name, stage in stages.items():
+        print(f"    {name:<70} n={stage['count']:<6} mean={stage['mean_ms']:>8.1f}ms "
+              f"p50={stage['p50_ms']:>8.1f}ms p95={stage['p95_ms']:>8.1f}ms errors={stage['errors']}")
+
+
+def compare(baseline_path: str, result: dict) -> None:
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    old_levels = {row["concurrency"]: row for row in baseline["levels"]}
+    print(f"\nCompared with {baseline_path} ({baseline.get('git_commit') or 'unknown commit'}):")
+    print(f"{'concurrency':>11} {'p50 ms':>16} {'p99 ms':>16} {'req/s':>16} {'RSS MB':>16}")
+
+    def delta(old, new):
+        change = (new - old) / old * 100 if old else 0.0
+        return f"{new:>8.1f} ({change:+5.1f}%)"
+
+    for row in result["levels"]:
+        old = old_levels.get(row["concurrency"])
+        if old is None:
+            continue
+        print(f"{row['concurrency']:>11} {delta(old['latency_ms']['p50'], row['latency_ms']['p50'])} "
+              f"{delta(old['latency_ms']['p99'], row['latency_ms']['p99'])} "
+              f"{delta(old['throughput_rps'], row['throughput_rps'])} "
+              f"{delta(old['rss_mb'].get('total_mb', 0), row['rss_mb'].get('total_mb', 0))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rounds", type=int, default=3, help="chats each concurrent client sends per level")
+    parser.add_argument("--model-scale", type=float, default=1.0, help="multiplier for the scripted model latencies (0 = instant)")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="seconds the stub APIs take per request")
+    parser.add_argument("--upstream-jitter", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes per MCP server")
+    parser.add_argument("--cache", action="store_true", help="keep the host's answer cache and the servers' response cache on")
+    parser.add_argument("--scenarios", default=SCENARIOS_PATH)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/offline_suite-<time>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    with open(args.scenarios) as file:
+        scenarios = json.load(file)
+    stub, base_url = start_stub(args.upstream_latency, args.upstream_jitter)
+    write_server_config(base_url, args.workers, args.cache)
+
+    from src import fastapi_app
+    from src.host.answer_cache import AnswerCache
+    import tracing
+    chatbot = fastapi_app.chatbot
+    chatbot.gemini = SimpleNamespace(aio=SimpleNamespace(models=ScriptedModels(scenarios, args.model_scale)))
+    if not args.cache:
+        # the scenarios repeat, so with the cache on nearly every chat would be a hit
+        chatbot.answers = AnswerCache(max_entries=0)
+
+    port = free_port()
+    host = HostThread(fastapi_app.app, port)
+    started = time.perf_counter()
+    host.start()
+    while not host.server.started:
+        if not host.is_alive():
+            raise SystemExit("The host failed to start.")
+        time.sleep(0.05)
+    startup_seconds = time.perf_counter() - started
+    url = f"http://127.0.0.1:{port}/chat"
+    queries = [scenario["query"] for scenario in scenarios["scenarios"]]
+
+    def snapshot():
+        return tracing.registry.snapshot() + host.call(chatbot.gemini_client.collect_metrics())
+
+    result = {
+        "benchmark": "offline_suite",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "args": vars(args),
+        "startup_seconds": round(startup_seconds, 3),
+        "levels": [],
+    }
+    try:
+        # one pass over every scenario so imports, connections and schemas are warm
+        asyncio.run(run_level(url, queries, len(queries), 1))
+        print(f"Host and servers started in {startup_seconds:.2f}s; upstream stub at {base_url}")
+        print(f"{'concurrency':>11} {'requests':>8} {'errors':>6} {'ttfb p50':>9} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'RSS MB':>9}")
+        for level in args.levels:
+            before = snapshot()
+            row = asyncio.run(run_level(url, queries, level, args.rounds))
+            row["stages"] = stage_breakdown(before, snapshot())
+            row["rss_mb"] = memory_usage(exclude=stub.pid)
+            result["levels"].append(row)
+            print_level(row)
+            print_stages(row["stages"])
+    finally:
+        host.stop()
+        stub.terminate()
+        stub.wait()
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"offline_suite-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(result, file, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(args.compare, result)
+
+
+if __name__ == "__main__":
+    main()
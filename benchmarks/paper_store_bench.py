@@ -0,0 +1,103 @@
+"""
+Benchmark the SQLite paper store used by arxiv_server with 100k saved papers.
+
+Measures bulk saving, extract_info-style lookups by paper id, papers://{topic}
+reads and search_local_papers full-text queries. With --legacy the same lookups are timed against the old per-topic
+papers_info.json layout for comparison.
+
+Usage (from the repository root):
+    python -m benchmarks.paper_store_bench
+    python -m benchmarks.paper_store_bench --papers 20000 --legacy
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "mcp-server"))
+from paper_store import PaperStore
+
+
+# a Zipf-like vocabulary so full-text queries have realistic selectivity
+VOCABULARY = [f"term{n}" for n in range(20_000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+
+def make_paper(i: int) -> dict:
+    rng = random.Random(i)
+    return {
+        "title": " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=8)),
+        "authors": [f"Author {i % 97}", f"Author {i % 89}"],
+        "summary": " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=150)),
+        "pdf_url": f"http://arxiv.org/pdf/{i:07d}v1",
+        "published": "2024-01-01",
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    """Mean milliseconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def legacy_extract_info(paper_dir: str, paper_id: str):
+    for item in os.listdir(paper_dir):
+        file_path = os.path.join(paper_dir, item, "papers_info.json")
+        if os.path.isfile(file_path):
+            with open(file_path, "r") as json_file:
+                papers_info = json.load(json_file)
+                if paper_id in papers_info:
+                    return papers_info[paper_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--papers", type=int, default=100_000)
+    parser.add_argument("--per-topic", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--legacy", action="store_true", help="also time the per-topic JSON layout")
+    args = parser.parse_args()
+
+    topics = [f"topic_{t}" for t in range(args.papers // args.per_topic)]
+    ids = [f"{i:07d}" for i in range(args.papers)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PaperStore(os.path.join(tmp, "papers.sqlite"))
+        elapsed = 0.0
+        for t, topic in enumerate(topics):
+            batch = ids[t * args.per_topic:(t + 1) * args.per_topic]
+            papers_info = {paper_id: make_paper(int(paper_id)) for paper_id in batch}
+            start = time.perf_counter()
+            store.save_papers(topic, papers_info)
+            elapsed += time.perf_counter() - start
+        print(f"saved {args.papers} papers in {len(topics)} topics: {elapsed:.1f}s")
+        print(f"database size: {os.path.getsize(store.path) / 1e6:.1f} MB")
+
+        sample = random.sample(ids, args.lookups)
+        lookups = iter(sample * 2)
+        print(f"extract_info lookup:  {timed(lambda: store.get_paper(next(lookups)), args.lookups):.3f} ms")
+        topic_sample = iter(random.choices(topics, k=100))
+        print(f"papers://{{topic}} read: {timed(lambda: store.get_topic_papers(next(topic_sample)), 100):.3f} ms")
+        print(f"papers://folders:     {timed(store.list_topics, 10):.3f} ms")
+        queries = iter([" ".join(random.choices(VOCABULARY[100:5000], k=3)) for _ in range(100)])
+        print(f"search_local_papers:  {timed(lambda: store.search(next(queries)), 100):.3f} ms")
+
+        if args.legacy:
+            legacy_dir = os.path.join(tmp, "legacy")
+            for t, topic in enumerate(topics):
+                os.makedirs(os.path.join(legacy_dir, topic))
+                batch = ids[t * args.per_topic:(t + 1) * args.per_topic]
+                with open(os.path.join(legacy_dir, topic, "papers_info.json"), "w") as json_file:
+                    json.dump({paper_id: make_paper(int(paper_id)) for paper_id in batch}, json_file, indent=2)
+            legacy_sample = iter(random.sample(ids, 5))
+            print(f"legacy extract_info:  {timed(lambda: legacy_extract_info(legacy_dir, next(legacy_sample)), 5):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Model calls and latency of a query needing several tool calls, answered step by
+step and in plan mode, with a stubbed model and stubbed MCP servers.
+
+The question needs four drug label lookups, a PDB search, and a summary of the
+structures that search finds, which depends on it. Step by step, the scripted
+model asks for one tool call per turn, the way models often work through such a
+list. In plan mode it returns the six calls as one plan and answers once. A third
+run gets a plan naming an unknown tool and falls back to the step-by-step loop.
+
+Usage (from the repository root):
+    python -m benchmarks.plan_bench
+    python -m benchmarks.plan_bench --model-latency 1.0 --tool-latency 0.5 --chats 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from google.genai import types
+from benchmarks.chat_load import StubPool
+from src.host.answer_cache import AnswerCache
+from src.host.gemini_chatbot import GeminiChatBot
+
+QUERY = "Compare the warnings for ibuprofen, naproxen, aspirin and acetaminophen, and summarize COX-2 structures."
+CALLS = [
+    ("search_drug", {"drug_name": "ibuprofen"}),
+    ("search_drug", {"drug_name": "naproxen"}),
+    ("search_drug", {"drug_name": "aspirin"}),
+    ("search_drug", {"drug_name": "acetaminophen"}),
+    ("search_pdb_ids", {"query": "cyclooxygenase-2", "max_results": 3}),
+    ("extract_pdb_data_batch", {"pdb_ids": ["5KIR", "5F19", "3LN1"]}),
+]
+PLAN = {"steps": [
+    {"id": f"s{number + 1}", "tool": name, "args": args} for number, (name, args) in enumerate(CALLS[:5])
+] + [{"id": "s6", "tool": "extract_pdb_data_batch", "args": {"pdb_ids": "$s5"}, "depends_on": ["s5"]}]}
+ANSWER = "Ibuprofen, naproxen and aspirin are NSAIDs with gastrointestinal warnings. " * 10
+RESULTS = {
+    "search_drug": {"warnings": ["Stomach bleeding warning."]},
+    "search_pdb_ids": ["5KIR", "5F19", "3LN1"],
+    "extract_pdb_data_batch": [{"pdb_id": "5KIR", "title": "Cyclooxygenase-2"}],
+}
+
+
+class ScriptedModels:
+    """Plans, calls tools one per turn, or answers, depending on the request; counts its calls."""
+
+    def __init__(self, latency: float, plan: dict):
+        self.latency = latency
+        self.plan = plan
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        part = types.Part.from_text(text=json.dumps(self.plan))
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+        )
+
+    async def generate_content_stream(self, model, contents, config):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        tool_turns = sum(1 for content in contents if content.role == "tool")
+        answering = config.tool_config is not None or tool_turns >= len(CALLS)
+
+        async def stream():
+            if answering:
+                part = types.Part.from_text(text=ANSWER)
+            else:
+                name, args = CALLS[tool_turns]
+                part = types.Part.from_function_call(name=name, args=args)
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+            )
+
+        return stream()
+
+
+async def run(args, plan, plan_reply: dict) -> dict:
+    chatbot = GeminiChatBot()
+    chatbot.answers = AnswerCache(max_entries=0)
+    models = ScriptedModels(args.model_latency, plan_reply)
+    chatbot.gemini = SimpleNamespace(aio=SimpleNamespace(models=models))
+    pool = StubPool(args.tool_latency, RESULTS)
+    for name, _ in CALLS:
+        chatbot.gemini_client.pools[name] = pool
+        chatbot.gemini_client.tool_server_map[name] = name
+
+    async def one_chat() -> tuple:
+        start = time.perf_counter()
+        tools = 0
+        async for kind, data in chatbot.process_events(QUERY, plan=plan):
+            tools += kind == "tool_end"
+        return time.perf_counter() - start, tools
+
+    results = await asyncio.gather(*(one_chat() for _ in range(args.chats)))
+    return {
+        "model_calls": models.calls / args.chats,
+        "tool_calls": sum(tools for _, tools in results) / args.chats,
+        "seconds": statistics.median(seconds for seconds, _ in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-latency", type=float, default=0.5, help="seconds per model call")
+    parser.add_argument("--tool-latency", type=float, default=0.3, help="seconds per tool call")
+    parser.add_argument("--chats", type=int, default=4, help="chats run at once per mode")
+    args = parser.parse_args()
+
+    bad_plan = {"steps": [{"id": "s1", "tool": "no_such_tool", "args": {}}]}
+    rows = [
+        ("step by step", asyncio.run(run(args, False, PLAN))),
+        ("plan", asyncio.run(run(args, True, PLAN))),
+        ("plan, fallback", asyncio.run(run(args, True, bad_plan))),
+    ]
+    print(f"{len(CALLS)} tool calls, model {args.model_latency * 1000:.0f} ms, tool {args.tool_latency * 1000:.0f} ms")
+    print(f"{'mode':>16} {'model calls':>11} {'tool calls':>10} {'p50 s':>6}")
+    for name, row in rows:
+        print(f"{name:>16} {row['model_calls']:>11.0f} {row['tool_calls']:>10.0f} {row['seconds']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Sequence similarity searches against the local k-mer index of sequence_index.py.
+
+A synthetic pdb_seqres.txt of random protein chains is indexed, then fragments of
+indexed sequences with some residues mutated are searched for, with and without
+the alignment pass, one at a time and through search_similar_sequences_batch.
+The same number of searches against the stubbed RCSB Search API (uncached, at the
+given upstream latency) is timed for comparison.
+
+Usage (from the repository root):
+    python -m benchmarks.sequence_index_bench
+    python -m benchmarks.sequence_index_bench --sequences 100000 --queries 500
+    python -m benchmarks.sequence_index_bench --long-chains 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def random_protein(length: int) -> str:
+    return "".join(random.choice(AMINO_ACIDS) for _ in range(length))
+
+
+def synthetic_seqres(path: str, sequences: int, long_chains: int = 0) -> list:
+    """
+    Write `sequences` random chains (some entries with two identical ones) and return
+    the sequences. `long_chains` more entries of 3,000-30,000 residues each contain a
+    stretch of one of the first sequences, so they are candidates for its queries.
+    """
+    written = []
+    with open(path, "w") as file:
+        for number in range(sequences):
+            sequence = random_protein(random.randint(80, 400))
+            for chain in "AB"[:random.randint(1, 2)]:
+                file.write(f">{number:05d}_{chain} mol:protein length:{len(sequence)}  SYNTHETIC {number}\n")
+                file.write(sequence + "\n")
+            written.append(sequence)
+        for number in range(long_chains):
+            sequence = random_protein(random.randint(3000, 30000)) + written[number][:150] + random_protein(2000)
+            file.write(f">L{number:04d}_A mol:protein length:{len(sequence)}  SYNTHETIC LONG {number}\n")
+            file.write(sequence + "\n")
+    return written
+
+
+def query_from(sequence: str, mutations: float) -> str:
+    """A fragment of a sequence with a share of its residues replaced."""
+    start = random.randrange(0, len(sequence) // 4)
+    fragment = list(sequence[start:start + random.randint(60, 200)])
+    for position in random.sample(range(len(fragment)), int(len(fragment) * mutations)):
+        fragment[position] = random.choice(AMINO_ACIDS)
+    return "".join(fragment)
+
+
+async def run(args, queries: list, expected: list) -> list:
+    import pdb_server
+
+    rows = []
+    for align in (False, True):
+        start = time.perf_counter()
+        found = 0
+        for query, entry in zip(queries, expected):
+            found += entry in await pdb_server.search_similar_sequence(query, align=align)
+        rows.append((f"local, {'aligned' if align else 'k-mers only'}", time.perf_counter() - start, found))
+
+    start = time.perf_counter()
+    results = await pdb_server.search_similar_sequences_batch(queries)
+    found = sum(entry in result.get("pdb_ids", []) for result, entry in zip(results, expected))
+    rows.append(("local, batch", time.perf_counter() - start, found))
+
+    indexes = dict(pdb_server.sequence_indexes)
+    pdb_server.sequence_indexes.clear()
+    start = time.perf_counter()
+    for query in queries[:args.remote_queries]:
+        await pdb_server.search_similar_sequence(query)
+    elapsed = (time.perf_counter() - start) * len(queries) / min(len(queries), args.remote_queries)
+    rows.append((f"remote (stub, {args.upstream_latency * 1000:.0f} ms)", elapsed, None))
+    pdb_server.sequence_indexes.update(indexes)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sequences", type=int, default=20000, help="distinct sequences indexed")
+    parser.add_argument("--queries", type=int, default=200, help="sequences searched for")
+    parser.add_argument("--long-chains", type=int, default=0,
+                        help="extra chains of 3,000-30,000 residues sharing a stretch with an indexed sequence")
+    parser.add_argument("--mutations", type=float, default=0.2, help="share of each query's residues mutated")
+    parser.add_argument("--remote-queries", type=int, default=10, help="searches timed against the stub")
+    parser.add_argument("--upstream-latency", type=float, default=0.5, help="seconds the stub takes per request")
+    args = parser.parse_args()
+    random.seed(0)
+
+    work_dir = tempfile.mkdtemp(prefix="sequence_index_bench_")
+    # read when sequence_index is imported
+    os.environ.update(MCP_CACHE="0", PDB_SEQUENCE_INDEX=os.path.join(work_dir, "index"))
+    sys.path.insert(0, os.path.join(REPO_ROOT, "src", "mcp-server"))
+    from sequence_index import build
+
+    fasta = os.path.join(work_dir, "pdb_seqres.txt")
+    sequences = synthetic_seqres(fasta, args.sequences, args.long_chains)
+    start = time.perf_counter()
+    counts = build(fasta)["protein"]
+    print(f"indexed {counts['sequences']} sequences of {counts['chains']} chains "
+          f"({counts['postings']} postings) in {time.perf_counter() - start:.1f}s")
+    # the sequences sharing a stretch with a long chain are searched for first
+    numbers = list(range(min(args.long_chains, args.queries)))
+    numbers += random.sample(range(len(numbers), len(sequences)), args.queries - len(numbers))
+    queries = [query_from(sequences[number], args.mutations) for number in numbers]
+    expected = [f"{number:05d}" for number in numbers]
+
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_upstreams", "--latency", str(args.upstream_latency)],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True
+    )
+    base_url = stub.stdout.readline().strip()
+    from benchmarks.stub_upstreams import server_env
+    os.environ.update(server_env(base_url))
+    try:
+        rows = asyncio.run(run(args, queries, expected))
+    finally:
+        stub.terminate()
+        stub.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{len(queries)} queries, {args.mutations:.0%} of residues mutated")
+    print(f"{'search':>24} {'seconds':>8} {'ms/query':>9} {'source found':>13}")
+    for name, seconds, found in rows:
+        print(f"{name:>24} {seconds:>8.2f} {seconds / len(queries) * 1000:>9.1f} "
+              f"{'-' if found is None else f'{found}/{len(queries)}':>13}")
+    print("remote: extrapolated from --remote-queries searches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Cold start and memory of the four Python MCP servers, run three ways:
+
+separate:   one stdio process per server, as in the default server_config.json
+combined:   src/mcp-server/combined_server.py as a single stdio process
+in-process: the combined server inside the host, over an in-memory transport
+
+Each setup runs in a fresh host process, against the local upstream stub. It is
+timed from spawning to the tools being listed (the host's startup) and again to
+the first call of one tool per server (which imports every module of the combined
+server). Memory is the resident set size of the host plus its server processes,
+read from /proc (Linux only). The last column is the median of repeated calls to
+a cached tool, which shows the cost of the transport itself.
+
+Usage (from the repository root):
+    python -m benchmarks.server_startup
+    python -m benchmarks.server_startup --calls 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = ["arxiv_server", "openfda_server", "clinicaltrials_server", "pdb_server"]
+# one call per server module
+FIRST_CALLS = [
+    ("search_drug", {"drug_name": "advil"}),
+    ("search_clinical_trials", {"cond": "melanoma", "intr": "pembrolizumab", "max_results": 5}),
+    ("search_pdb_ids", {"query": "hemoglobin", "max_results": 5}),
+    ("search_papers", {"topic": "protein structure prediction", "max_results": 5}),
+]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def descendants(pid: int) -> list:
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as file:
+                    parent = int(file.read().rsplit(")", 1)[1].split()[1])
+            except OSError:
+                continue
+            children.setdefault(parent, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def memory() -> dict:
+    servers = descendants(os.getpid())
+    return {"host_mb": rss_mb(os.getpid()), "servers_mb": sum(rss_mb(pid) for pid in servers)}
+
+
+async def run_mode(mode: str, calls: int) -> dict:
+    """Runs in a fresh process per setup."""
+    sys.path.insert(0, REPO_ROOT)
+    from mcp import StdioServerParameters
+    from src.client.gemini_client import GeminiClient
+    from src.client.session_pool import ServerPool
+
+    # the host's own imports are not counted
+    baseline = memory()
+    start = time.perf_counter()
+    if mode == "separate":
+        configs = {name: ["src/mcp-server/" + name + ".py"] for name in SERVERS}
+    else:
+        configs = {"combined": ["src/mcp-server/combined_server.py"]}
+    server = GeminiClient.in_process_server("combined_server") if mode == "in-process" else None
+    pools = {
+        name: ServerPool(name, StdioServerParameters(command=sys.executable, args=args, env=dict(os.environ)),
+                         server=server)
+        for name, args in configs.items()
+    }
+    await asyncio.gather(*(pool.start() for pool in pools.values()))
+    listed = await asyncio.gather(*(pool.session().list_tools() for pool in pools.values()))
+    owner = {tool.name: pool for pool, result in zip(pools.values(), listed) for tool in result.tools}
+    started = time.perf_counter() - start
+    after_start = memory()
+
+    await asyncio.gather(*(owner[name].call_tool(name, arguments) for name, arguments in FIRST_CALLS))
+    first_calls = time.perf_counter() - start
+    after_calls = memory()
+
+    latencies = []
+    for _ in range(calls):
+        call_start = time.perf_counter()
+        await owner["search_drug"].call_tool("search_drug", {"drug_name": "advil"})
+        latencies.append(time.perf_counter() - call_start)
+
+    await asyncio.gather(*(pool.stop() for pool in pools.values()))
+    return {
+        "mode": mode,
+        "tools": len(owner),
+        "started_s": started,
+        "first_calls_s": first_calls,
+        "start_mb": after_start["host_mb"] + after_start["servers_mb"] - baseline["host_mb"],
+        "loaded_mb": after_calls["host_mb"] + after_calls["servers_mb"] - baseline["host_mb"],
+        "processes": 0 if server else len(pools),
+        "call_ms": statistics.median(latencies) * 1000,
+    }
+
+
+def run(mode: str, args, env: dict) -> dict:
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.server_startup", "--mode", mode, "--calls", str(args.calls)],
+        cwd=args.work_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="cached tool calls timed per setup")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_mode(args.mode, args.calls))))
+        return
+
+    from benchmarks.stub_upstreams import server_env
+    stub = subprocess.Popen([sys.executable, "-m", "benchmarks.stub_upstreams"],
+                            cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    base_url = stub.stdout.readline().strip()
+    # the servers keep their caches and paper store under the working directory
+    args.work_dir = tempfile.mkdtemp(prefix="server_startup_")
+    os.symlink(os.path.join(REPO_ROOT, "src"), os.path.join(args.work_dir, "src"))
+    env = dict(os.environ, **server_env(base_url), PYTHONPATH=REPO_ROOT)
+
+    rows = [
+        run("separate", args, env),
+        # the first combined run writes the manifest, later ones list tools from it
+        dict(run("combined", args, env), mode="combined (no manifest)"),
+        run("combined", args, env),
+        run("in-process", args, env),
+    ]
+    stub.terminate()
+    stub.wait()
+    shutil.rmtree(args.work_dir, ignore_errors=True)
+
+    print(f"{'setup':>22} {'processes':>9} {'tools':>5} {'start s':>8} {'start MB':>9} "
+          f"{'+4 calls s':>10} {'loaded MB':>9} {'call ms':>8}")
+    for row in rows:
+        print(f"{row['mode']:>22} {row['processes']:>9} {row['tools']:>5} {row['started_s']:>8.2f} "
+              f"{row['start_mb']:>9.0f} {row['first_calls_s']:>10.2f} {row['loaded_mb']:>9.0f} {row['call_ms']:>8.2f}")
+    print("MB: resident memory added by the MCP servers, host growth plus server processes")
+
+
+if __name__ == "__main__":
+    main()
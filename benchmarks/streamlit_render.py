@@ -0,0 +1,165 @@
+"""
+Time the Streamlit client's handling of one streamed /chat answer: the old loop
+(a fresh requests.post per prompt, 32-byte reads, a full re-render plus a 10 ms
+sleep per chunk) against streamlit_app/chat_client.py (pooled session, server-sent
+events read as they arrive, time-throttled re-renders).
+
+A local server streams a tool call followed by the answer in model-sized
+chunks, as plain text or as events depending on the Accept header, like /chat.
+Each re-render is charged the cost of rendering the accumulated markdown to
+HTML, which is the work the page repeats on every update.
+
+Usage (from the repository root):
+    python -m benchmarks.streamlit_render
+    python -m benchmarks.streamlit_render --answer-kb 20 --chunk-delay 0.002 --rounds 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from markdown_it import MarkdownIt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "streamlit_app"))
+from chat_client import make_session, render_stream, stream_chat  # noqa: E402
+
+PARAGRAPH = (
+    "**Ibuprofen** is a nonsteroidal anti-inflammatory drug used to treat pain, fever "
+    "and inflammation. Common adverse reactions include:\n\n"
+    "- nausea and dyspepsia\n- dizziness\n- rash\n\n"
+)
+
+
+def make_answer(size_kb: int) -> str:
+    repeats = size_kb * 1024 // len(PARAGRAPH) + 1
+    return (PARAGRAPH * repeats)[:size_kb * 1024]
+
+
+def start_server(answer: str, chunk_size: int, chunk_delay: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def write_chunk(self, text: str):
+            data = text.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def write_event(self, event: str, data: dict):
+            self.write_chunk(f"event: {event}\ndata: {json.dumps(data)}\n\n")
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            sse = "text/event-stream" in self.headers.get("Accept", "")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream" if sse else "text/plain; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("X-Session-Id", "benchmark")
+            self.end_headers()
+            tool = {"id": 0, "name": "search_drug", "args": {"brand_name": "ibuprofen"}}
+            if sse:
+                self.write_event("tool_start", tool)
+                self.write_event("tool_end", {"id": 0, "name": "search_drug", "seconds": 0.1, "error": False})
+            else:
+                self.write_chunk(f"[CALLING TOOL: {tool['name']} with args {tool['args']}]\n")
+            for start in range(0, len(answer), chunk_size):
+                time.sleep(chunk_delay)
+                text = answer[start:start + chunk_size]
+                if sse:
+                    self.write_event("token", {"text": text})
+                else:
+                    self.write_chunk(text)
+            if sse:
+                self.write_event("done", {"session_id": "benchmark", "seconds": 0.0})
+            self.wfile.write(b"0\r\n\r\n")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Renderer:
+    """Stands in for st.empty().markdown: renders the full text each call and counts the work."""
+
+    def __init__(self):
+        self.markdown = MarkdownIt()
+        self.renders = 0
+        self.rendered_chars = 0
+
+    def __call__(self, text: str):
+        self.markdown.render(text)
+        self.renders += 1
+        self.rendered_chars += len(text)
+
+
+def legacy(url: str, renderer: Renderer) -> str:
+    response = requests.post(url, json={"query": "ibuprofen", "session_id": None}, stream=True)
+    text_accum = ""
+    for chunk in response.iter_content(chunk_size=32, decode_unicode=True):
+        if not chunk: continue
+        text_accum += chunk
+        renderer(text_accum)
+        time.sleep(0.01)
+    renderer(text_accum)
+    return text_accum
+
+
+def pooled(url: str, renderer: Renderer, session: requests.Session, interval: float) -> str:
+    _, events = stream_chat(session, "ibuprofen", None, url)
+    return render_stream(events, renderer, lambda event, data: None, interval)
+
+
+def measure(run, rounds: int) -> dict:
+    times, renderer = [], None
+    for _ in range(rounds):
+        renderer = Renderer()
+        start = time.perf_counter()
+        run(renderer)
+        times.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(times),
+        "renders": renderer.renders,
+        "rendered_kb": renderer.rendered_chars / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answer-kb", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=200, help="characters per streamed model chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.002, help="seconds between streamed chunks")
+    parser.add_argument("--interval", type=float, default=0.1, help="render interval of the new client")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    answer = make_answer(args.answer_kb)
+    server = start_server(answer, args.chunk_size, args.chunk_delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}/chat"
+    session = make_session()
+    stream_s = len(answer) / args.chunk_size * args.chunk_delay
+
+    # both clients must end up with the same answer
+    assert legacy(url, Renderer()).endswith(answer)
+    assert pooled(url, Renderer(), session, args.interval) == answer
+
+    results = {
+        "legacy": measure(lambda r: legacy(url, r), args.rounds),
+        "pooled": measure(lambda r: pooled(url, r, session, args.interval), args.rounds),
+    }
+    print(f"{args.answer_kb} KB answer in {args.chunk_size}-char chunks, server streams for ~{stream_s:.2f}s")
+    print(f"{'client':>8} {'median s':>9} {'renders':>8} {'rendered KB':>12}")
+    for name, row in results.items():
+        print(f"{name:>8} {row['median_s']:>9.3f} {row['renders']:>8} {row['rendered_kb']:>12.0f}")
+    print(f"pooled takes {results['pooled']['median_s'] / results['legacy']['median_s']:.1%} of the legacy time")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
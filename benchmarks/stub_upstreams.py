@@ -0,0 +1,273 @@
+"""
+Local stand-ins for the upstream APIs the MCP servers call, replaying the
+responses recorded in benchmarks/fixtures so that benchmarks run offline and
+are not skewed by network jitter or rate limits.
+
+Each API is served under its own path prefix:
+    /openfda/drug/label.json          OpenFDA drug labels
+    /clinicaltrials/api/v2/studies    ClinicalTrials.gov v2 (with page tokens)
+    /rcsb-search/rcsbsearch/v2/...    RCSB Search API queries and attribute schemas
+    /rcsb-data/graphql                RCSB Data API, a GraphQL endpoint over the recorded entries
+    /arxiv/api/query                  arXiv Atom API
+
+Point the servers at it with the environment from `server_env()`.
+
+With --rate-limit, each API answers 429 with a Retry-After header once it gets
+more requests per second than that, like the real ones do under load.
+GET /stats reports how many requests each API served and refused.
+
+Usage (from the repository root):
+    python -m benchmarks.stub_upstreams --port 8700 --latency 0.05
+    python -m benchmarks.stub_upstreams --rate-limit 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from graphql import build_schema, graphql_sync
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURE_DIR, name), "r") as file:
+        return json.load(file) if name.endswith(".json") else file.read()
+
+
+def server_env(base_url: str) -> dict:
+    """Environment that points the MCP servers at a stub listening on base_url."""
+    return {
+        "OPENFDA_URL": base_url + "/openfda/drug/label.json",
+        "CLINICALTRIALS_URL": base_url + "/clinicaltrials/api/v2/studies",
+        "RCSB_SEARCH_URL": base_url + "/rcsb-search",
+        "RCSB_DATA_URL": base_url + "/rcsb-data",
+        "ARXIV_API_URL": base_url + "/arxiv/api/query",
+    }
+
+
+class Fixtures:
+    def __init__(self):
+        self.labels = load_fixture("openfda_labels.json")
+        self.studies = load_fixture("clinicaltrials_studies.json")["studies"]
+        self.search_schema = load_fixture("rcsb_search_schema.json")
+        self.entries = {entry["rcsb_id"]: entry for entry in load_fixture("rcsb_entries.json")}
+        self.data_schema = build_schema(load_fixture("rcsb_data_schema.graphql"))
+        self.papers = load_fixture("arxiv_papers.json")
+
+    def find_label(self, search: str):
+        # search looks like "openfda.brand_name:ibuprofen"
+        field, _, value = search.partition(":")
+        field = field.removeprefix("openfda.")
+        value = value.strip('"').casefold()
+        for label in self.labels:
+            if value in (name.casefold() for name in label["openfda"].get(field, [])):
+                return label
+        return None
+
+    def find_studies(self, params: dict) -> list:
+        def module(study, name):
+            return study["protocolSection"].get(name, {})
+
+        studies = self.studies
+        if params.get("query.cond"):
+            cond = params["query.cond"].casefold()
+            studies = [s for s in studies if any(cond in c.casefold() for c in module(s, "conditionsModule").get("conditions", []))]
+        if params.get("query.intr"):
+            intr = params["query.intr"].casefold()
+            studies = [s for s in studies if any(
+                intr in i["name"].casefold() for i in module(s, "armsInterventionsModule").get("interventions", [])
+            )]
+        if params.get("query.id"):
+            ids = {i.strip().upper() for i in params["query.id"].split(",")}
+            studies = [s for s in studies if module(s, "identificationModule")["nctId"] in ids]
+        return studies
+
+    def atom_feed(self, start: int, max_results: int) -> str:
+        entries = []
+        for paper in self.papers[start:start + max_results]:
+            authors = "".join(f"<author><name>{escape(name)}</name></author>" for name in paper["authors"])
+            entries.append(
+                f"<entry><id>http://arxiv.org/abs/{paper['id']}</id>"
+                f"<updated>{paper['published']}</updated><published>{paper['published']}</published>"
+                f"<title>{escape(paper['title'])}</title><summary>{escape(paper['summary'])}</summary>{authors}"
+                f"<link href=\"http://arxiv.org/abs/{paper['id']}\" rel=\"alternate\" type=\"text/html\"/>"
+                f"<link title=\"pdf\" href=\"http://arxiv.org/pdf/{paper['id']}\" rel=\"related\" type=\"application/pdf\"/>"
+                f"<arxiv:primary_category term=\"{paper['category']}\" scheme=\"http://arxiv.org/schemas/atom\"/>"
+                f"<category term=\"{paper['category']}\" scheme=\"http://arxiv.org/schemas/atom\"/></entry>"
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" '
+            'xmlns:arxiv="http://arxiv.org/schemas/atom">'
+            '<title type="html">ArXiv Query</title><id>http://arxiv.org/api/stub</id><updated>2025-01-01T00:00:00-05:00</updated>'
+            f'<opensearch:totalResults>{len(self.papers)}</opensearch:totalResults>'
+            f'<opensearch:startIndex>{start}</opensearch:startIndex>'
+            f'<opensearch:itemsPerPage>{max_results}</opensearch:itemsPerPage>'
+            + "".join(entries) + "</feed>"
+        )
+
+
+class RateLimits:
+    """A token bucket per API (first path segment) that refuses requests beyond `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.buckets = {}
+        self.stats = {"served": Counter(), "throttled": Counter()}
+        self.lock = threading.Lock()
+
+    def allow(self, api: str) -> bool:
+        with self.lock:
+            if self.rate:
+                now = time.monotonic()
+                tokens, updated = self.buckets.get(api, (self.rate, now))
+                tokens = min(self.rate, tokens + (now - updated) * self.rate)
+                if tokens < 1:
+                    self.buckets[api] = (tokens, now)
+                    self.stats["throttled"][api] += 1
+                    return False
+                self.buckets[api] = (tokens - 1, now)
+            self.stats["served"][api] += 1
+            return True
+
+    def retry_after(self) -> int:
+        return max(1, round(1 / self.rate))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fixtures: Fixtures
+    limits: RateLimits
+    latency = 0.0
+    jitter = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status: int, body, content_type: str = "application/json", headers: dict = None) -> None:
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def throttled(self, path: str) -> bool:
+        """Answer 429 if this request goes over its API's rate limit."""
+        if self.limits.allow(path.split("/")[1]):
+            return False
+        self.respond(429, {"error": "Too Many Requests"}, headers={"Retry-After": str(self.limits.retry_after())})
+        return True
+
+    def wait(self) -> None:
+        if self.latency:
+            time.sleep(max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path = url.path
+        if path.startswith("/rcsb-search/rcsbsearch/v2/metadata/"):
+            # attribute schemas are fetched once at server start-up, not per query
+            kind = "chemical" if "/chemical/" in path else "structure"
+            return self.respond(200, self.fixtures.search_schema[kind])
+        if path == "/stats":
+            return self.respond(200, self.limits.stats)
+        if self.throttled(path):
+            return
+        self.wait()
+        if path == "/openfda/drug/label.json":
+            label = self.fixtures.find_label(params.get("search", ""))
+            if label is None:
+                return self.respond(404, {"error": {"code": "NOT_FOUND", "message": "No matches found!"}})
+            return self.respond(200, {"meta": {"results": {"skip": 0, "limit": 1, "total": 1}}, "results": [label]})
+        if path == "/clinicaltrials/api/v2/studies":
+            studies = self.fixtures.find_studies(params)
+            start = int(params.get("pageToken") or 0)
+            size = int(params.get("pageSize") or 10)
+            body = {"studies": studies[start:start + size]}
+            if params.get("countTotal") == "true" and not start:
+                body["totalCount"] = len(studies)
+            if start + size < len(studies):
+                body["nextPageToken"] = str(start + size)
+            return self.respond(200, body)
+        if path == "/rcsb-search/rcsbsearch/v2/query":
+            request = json.loads(params.get("json", "{}"))
+            paginate = request.get("request_options", {}).get("paginate", {})
+            start, rows = paginate.get("start", 0), paginate.get("rows", 10)
+            ids = sorted(self.fixtures.entries)
+            if start >= len(ids):
+                return self.respond(204, "")
+            return self.respond(200, {
+                "query_id": request.get("request_info", {}).get("query_id"),
+                "result_type": request.get("return_type", "entry"),
+                "total_count": len(ids),
+                "result_set": ids[start:start + rows],
+            })
+        if path == "/arxiv/api/query":
+            start = int(params.get("start", 0))
+            max_results = int(params.get("max_results", 10))
+            return self.respond(200, self.fixtures.atom_feed(start, max_results), "application/atom+xml")
+        self.respond(404, {"error": f"No stub for {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        query = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        if url.path != "/rcsb-data/graphql":
+            return self.respond(404, {"error": f"No stub for {url.path}"})
+        if "__schema" not in query:
+            if self.throttled(url.path):
+                return
+            self.wait()
+        entries = self.fixtures.entries
+        root = {
+            "entry": lambda info, entry_id: entries.get(entry_id.upper()),
+            "entries": lambda info, entry_ids: [entries.get(i.upper()) for i in entry_ids],
+        }
+        result = graphql_sync(self.fixtures.data_schema, query, root_value=root)
+        self.respond(200, result.formatted)
+
+
+def serve(port: int = 0, latency: float = 0.0, jitter: float = 0.0, rate_limit: float = 0.0) -> ThreadingHTTPServer:
+    """Create the stub server (not yet serving); port 0 picks a free port."""
+    handler = type("Handler", (StubHandler,), {
+        "fixtures": Fixtures(), "limits": RateLimits(rate_limit), "latency": latency, "jitter": jitter
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every upstream request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency varies uniformly by +/- this many seconds")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second per API before 429s (0: no limit)")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.jitter, args.rate_limit)
+    # the benchmark harness reads the address from this first line
+    print(f"http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
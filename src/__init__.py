@@ -0,0 +1,8 @@
+import os
+import sys
+
+# helpers shared with the MCP servers (tracing, ...) live next to them in src/mcp-server,
+# which is not a package because the servers run as plain scripts
+MCP_SERVER_DIR = os.path.join(os.path.dirname(__file__), "mcp-server")
+if MCP_SERVER_DIR not in sys.path:
+    sys.path.append(MCP_SERVER_DIR)
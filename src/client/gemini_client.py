@@ -1,68 +1,169 @@
+import asyncio
+import importlib
 import json
-from contextlib import AsyncExitStack
-from typing import List, Dict
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from typing import List, Dict, Optional, Set
+from mcp import StdioServerParameters
+from mcp.shared.session import ProgressFnT
 from google.genai import types
+from .session_pool import ServerPool
+from .result_compaction import ResultCompactor, READ_RESULT_TOOL, READ_RESULT_DECLARATION
 import os
+import tracing
+
+CONFIG_PATH = os.environ.get(
+    "MCP_SERVER_CONFIG", os.path.join(os.path.dirname(__file__), "server_config.json")
+)
+# tool schemas from the last eager start, used to advertise tools without spawning servers
+TOOL_CACHE_PATH = os.environ.get(
+    "MCP_TOOL_CACHE", os.path.join(os.path.dirname(__file__), "tool_cache.json")
+)
+# server_config.json keys that configure the worker pool rather than the stdio process
+POOL_OPTIONS = ("workers", "maxInFlight", "inProcess")
 
 class GeminiClient:
     def __init__(self):
-        self.sessions: List[ClientSession] = [] # each client session establishes a 1-to-1 connection to each server
-        self.exit_stack = AsyncExitStack() # context manager that manage the mcp client objects
+        self.pools: Dict[str, ServerPool] = {} # supervised worker sessions for each configured server
         self.available_tools: List[types.Tool] = []
-        self.tool_session_map: Dict[str, ClientSession] = {} #maps the tool name to the corresponding client session
+        self.tool_server_map: Dict[str, str] = {} #maps the tool name to the server that provides it
+        self.server_tools: Dict[str, types.Tool] = {}
+        self.idempotent_tools: Set[str] = set() # tools safe to send again when a worker dies mid-call
+        self.tool_cache: Dict[str, dict] = {}
+        self.compactor = ResultCompactor()
 
     async def connect_to_servers(self): 
-        """Connect to all configured MCP servers."""
+        """Connect to all configured MCP servers concurrently."""
         try:
-            config_path = os.path.join(os.path.dirname(__file__), "server_config.json")
-            with open(config_path, "r") as file:
+            with open(CONFIG_PATH, "r") as file:
                 data = json.load(file)
             servers = data.get("mcpServers", {})
-            
-            for server_name, server_config in servers.items():
-                await self.connect_to_server(server_name, server_config)
+            lazy = data.get("lazyStart", False)
+            if lazy:
+                self.tool_cache = self.load_tool_cache()
+
+            await asyncio.gather(*(
+                self.connect_to_server(server_name, server_config, lazy=lazy)
+                for server_name, server_config in servers.items()
+            ))
+            # keep the tool order stable regardless of which server finished first
+            self.available_tools = [self.server_tools[name] for name in servers if name in self.server_tools]
+            # host-side tool for paging through results the compactor shortened
+            self.available_tools.append(types.Tool(function_declarations=[READ_RESULT_DECLARATION]))
+            self.save_tool_cache()
         except Exception as e:
             print(f"Error loading server configuration: {e}")
             raise
 
-    async def connect_to_server(self, server_name: str, server_config: dict) -> None:
-        """Connect to a single MCP server."""
+    async def connect_to_server(self, server_name: str, server_config: dict, lazy: bool = False) -> None:
+        """
+        Connect to a single MCP server.
+
+        In lazy mode the server's tools are registered from the on-disk cache and the
+        process is only spawned by the first call to one of its tools.
+        """
         try:
-            server_params = StdioServerParameters(**server_config)
-            read, write = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
+            server_params = StdioServerParameters(
+                **{k: v for k, v in server_config.items() if k not in POOL_OPTIONS}
             )
-            session = await self.exit_stack.enter_async_context(
-                ClientSession(read, write)
-            )
-            await session.initialize()
-            self.sessions.append(session)
-            # list available tools for this session
-            response = await session.list_tools()
-            tools = response.tools
-            print(f"\nConnected to {server_name} with tools:", [t.name for t in tools])
-            
-            fc_decl_list = []
-            for tool in tools:
-                self.tool_session_map[tool.name] = session
-                clean_schema = self.clean_schema(tool.inputSchema) # Remove unsupported keys from inputSchema
-                fn_decl = types.FunctionDeclaration(
-                    name=tool.name,
-                    description=tool.description,
-                    parameters=clean_schema
-                )
-                fc_decl_list.append(fn_decl)
-
-            self.available_tools.append(
-                types.Tool(function_declarations=fc_decl_list)
+            pool = ServerPool(
+                server_name,
+                server_params,
+                workers=server_config.get("workers", 1),
+                max_in_flight=server_config.get("maxInFlight", 8),
+                server=self.in_process_server(server_config.get("inProcess"))
             )
+            self.pools[server_name] = pool
+
+            cached = self.tool_cache.get(server_name)
+            if lazy and cached and cached.get("config") == server_config:
+                self.register_tools(server_name, cached["tools"])
+                print(f"Registered {server_name} from cache (lazy start).", flush=True)
+                return
+
+            await pool.start()
+            # list available tools for this server
+            response = await pool.session().list_tools()
+            tools = [
+                {"name": t.name, "description": t.description, "inputSchema": t.inputSchema,
+                 "annotations": t.annotations.model_dump(exclude_none=True) if t.annotations else {}}
+                for t in response.tools
+            ]
+            print(f"\nConnected to {server_name} with tools:", [t["name"] for t in tools])
+            self.register_tools(server_name, tools)
+            self.tool_cache[server_name] = {"config": server_config, "tools": tools}
             print(f"Finished connecting to {server_name}.", flush=True)
 
         except Exception as e:
             print(f"Failed to connect to {server_name}: {e}")
 
+    @staticmethod
+    def in_process_server(module: Optional[str]):
+        """
+        The MCP server of a module in src/mcp-server (e.g. "combined_server"), to be
+        run inside the host instead of as a subprocess; None when not configured.
+        """
+        if not module:
+            return None
+        return importlib.import_module(module).mcp._mcp_server
+
+    def register_tools(self, server_name: str, tools: List[dict]) -> None:
+        """Declare a server's tools to Gemini and route their names to the server."""
+        fc_decl_list = []
+        for tool in tools:
+            self.tool_server_map[tool["name"]] = server_name
+            annotations = tool.get("annotations") or {}
+            if annotations.get("readOnlyHint") or annotations.get("idempotentHint"):
+                self.idempotent_tools.add(tool["name"])
+            clean_schema = self.clean_schema(tool["inputSchema"]) # Remove unsupported keys from inputSchema
+            fn_decl = types.FunctionDeclaration(
+                name=tool["name"],
+                description=tool["description"],
+                parameters=clean_schema
+            )
+            fc_decl_list.append(fn_decl)
+
+        self.server_tools[server_name] = types.Tool(function_declarations=fc_decl_list)
+
+    async def call_tool(self, tool_name: str, arguments: Optional[dict] = None,
+                        progress_callback: Optional[ProgressFnT] = None):
+        """
+        Call a tool on the pool of the server that provides it, spawning the pool on first use.
+
+        The result is compacted to fit the model context; see ResultCompactor. Progress
+        notifications the tool sends go to `progress_callback`.
+        """
+        if tool_name == READ_RESULT_TOOL:
+            return self.compactor.read(**(arguments or {}))
+        server_name = self.tool_server_map[tool_name]
+        with tracing.span("mcp_tool_call_seconds", tool=tool_name, server=server_name):
+            # tools the server marks read-only or idempotent are retried if their worker dies
+            result = await self.pools[server_name].call_tool(tool_name, arguments=arguments,
+                                                             progress_callback=progress_callback,
+                                                             retry=tool_name in self.idempotent_tools)
+        return self.compactor.compact(tool_name, result)
+
+    async def collect_metrics(self) -> List[dict]:
+        """Histogram snapshots from every running MCP server worker."""
+        snapshots = await asyncio.gather(*(pool.collect_metrics() for pool in self.pools.values()))
+        return [entry for snapshot in snapshots for entry in snapshot]
+
+    def pool_stats(self) -> Dict[str, dict]:
+        """Per-server pool statistics."""
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def load_tool_cache(self) -> Dict[str, dict]:
+        try:
+            with open(TOOL_CACHE_PATH, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_tool_cache(self) -> None:
+        try:
+            with open(TOOL_CACHE_PATH, "w") as file:
+                json.dump(self.tool_cache, file, indent=2)
+        except OSError as e:
+            print(f"Could not write tool cache {TOOL_CACHE_PATH}: {e}")
+
     def clean_schema(self, obj):
         """Recursively remove 'additionalProperties' and '$schema' from dicts."""
         if isinstance(obj, dict):
@@ -74,5 +175,5 @@ class GeminiClient:
             return obj
     
     async def cleanup(self):
-        """Cleanly close all resources using AsyncExitStack."""
-        await self.exit_stack.aclose()
\ No newline at end of file
+        """Stop every server pool."""
+        await asyncio.gather(*(pool.stop() for pool in self.pools.values()))
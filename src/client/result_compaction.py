@@ -0,0 +1,215 @@
+import json
+import os
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+from mcp import types as mcp_types
+from google.genai import types
+
+# characters of JSON a single tool result may add to the model context
+RESULT_BUDGET = int(os.environ.get("TOOL_RESULT_BUDGET", "8000"))
+# longer strings (label sections, trial summaries, ...) are cut to this many characters
+MAX_TEXT_CHARS = int(os.environ.get("TOOL_RESULT_MAX_TEXT", "1200"))
+# full payloads kept for read_tool_result
+MAX_STORED_RESULTS = 256
+
+READ_RESULT_TOOL = "read_tool_result"
+
+# Fields kept per tool, as dotted paths. Lists are traversed transparently, so
+# "studies.protocolSection.statusModule" keeps that module for every study.
+PROJECTIONS: Dict[str, List[str]] = {
+    "search_clinical_trials": [
+        "studies.protocolSection.identificationModule.nctId",
+        "studies.protocolSection.identificationModule.briefTitle",
+        "studies.protocolSection.statusModule.overallStatus",
+        "studies.protocolSection.statusModule.startDateStruct",
+        "studies.protocolSection.statusModule.completionDateStruct",
+        "studies.protocolSection.sponsorCollaboratorsModule.leadSponsor.name",
+        "studies.protocolSection.descriptionModule.briefSummary",
+        "studies.protocolSection.conditionsModule.conditions",
+        "studies.protocolSection.designModule.phases",
+        "studies.protocolSection.designModule.enrollmentInfo",
+        "studies.protocolSection.armsInterventionsModule.interventions.type",
+        "studies.protocolSection.armsInterventionsModule.interventions.name",
+        "studies.protocolSection.outcomesModule.primaryOutcomes.measure",
+        "nextPageToken",
+        "error",
+    ],
+    "search_drug": [
+        "openfda.brand_name",
+        "openfda.generic_name",
+        "openfda.manufacturer_name",
+        "openfda.route",
+        "openfda.substance_name",
+        "boxed_warning",
+        "indications_and_usage",
+        "dosage_and_administration",
+        "contraindications",
+        "warnings",
+        "warnings_and_cautions",
+        "adverse_reactions",
+        "drug_interactions",
+        "matched_name",
+        "error",
+    ],
+    "extract_pdb_data": [
+        "data.entries.rcsb_id",
+        "data.entries.struct.title",
+        "data.entries.struct.pdbx_descriptor",
+        "data.entries.exptl.method",
+        "data.entries.polymer_entities.entity_poly.type",
+        "data.entries.polymer_entities.entity_poly.rcsb_entity_polymer_type",
+        "data.entries.polymer_entities.entity_poly.rcsb_sample_sequence_length",
+        "data.entries.polymer_entities.entity_poly.pdbx_seq_one_letter_code_can",
+    ],
+}
+
+# Tools that return a list. FastMCP sends each item as its own content block, so a
+# one-item list arrives looking like a single value and is wrapped back into a list.
+LIST_RESULTS = {
+    "search_papers",
+    "search_papers_batch",
+    "search_local_papers",
+    "match_drug_names",
+    "search_pdb_ids",
+    "extract_pdb_data_batch",
+    "search_similar_sequence",
+    "search_similar_sequences_batch",
+}
+
+READ_RESULT_DECLARATION = types.FunctionDeclaration(
+    name=READ_RESULT_TOOL,
+    description=(
+        "Page through the full, uncompacted result of an earlier tool call. Tool results "
+        "that were shortened carry a handle; pass it here with an offset to read the raw "
+        "JSON text from that character position."
+    ),
+    parameters={
+        "type": "object",
+        "properties": {
+            "handle": {"type": "string", "description": "Handle returned with the compacted result"},
+            "offset": {"type": "integer", "description": "Character offset to start reading at (default: 0)"},
+            "length": {"type": "integer", "description": f"Characters to read (default: {RESULT_BUDGET})"},
+        },
+        "required": ["handle"],
+    },
+)
+
+def build_tree(paths: List[str]) -> dict:
+    tree: dict = {}
+    for path in paths:
+        node = tree
+        for key in path.split("."):
+            node = node.setdefault(key, {})
+    return tree
+
+def project(value: Any, tree: dict) -> Any:
+    """Keep only the branches of `value` named in `tree`; an empty subtree keeps everything below it."""
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+def truncate_text(value: Any, limit: int = MAX_TEXT_CHARS) -> Any:
+    """Recursively cut long strings, noting how much was dropped."""
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit] + f"... [{len(value) - limit} more characters]"
+    if isinstance(value, list):
+        return [truncate_text(item, limit) for item in value]
+    if isinstance(value, dict):
+        return {key: truncate_text(item, limit) for key, item in value.items()}
+    return value
+
+def content_value(content: List[Any], is_list: bool = False) -> Any:
+    """
+    Turn MCP result content into plain JSON values, parsing JSON objects, arrays and
+    strings. FastMCP sends other strings as they are, so text such as the PDB id
+    "1E10" is kept rather than read as a number. A single content block is
+    unwrapped unless the tool is known to return a list.
+    """
+    values = []
+    for item in content:
+        if isinstance(item, mcp_types.TextContent):
+            if not item.text.lstrip().startswith(("{", "[", '"')):
+                values.append(item.text)
+                continue
+            try:
+                values.append(json.loads(item.text))
+            except json.JSONDecodeError:
+                values.append(item.text)
+        else:
+            values.append({"type": item.type, "note": "non-text content omitted"})
+    return values[0] if len(values) == 1 and not is_list else values
+
+class ResultCompactor:
+    """
+    Shrinks tool results before they enter the model context.
+
+    Results within the budget are passed through unchanged. Larger ones are
+    projected onto their tool's configured fields, long strings are truncated, and
+    anything still over the budget is cut to a preview. The full payload is kept
+    under a handle that the model can page through with the read_tool_result tool.
+    """
+    def __init__(self, projections: Dict[str, List[str]] = PROJECTIONS, budget: int = RESULT_BUDGET,
+                 list_results: Set[str] = LIST_RESULTS):
+        self.trees = {tool: build_tree(paths) for tool, paths in projections.items()}
+        self.list_results = list_results
+        self.budget = budget
+        self.stored: "OrderedDict[str, str]" = OrderedDict()
+
+    def compact(self, tool_name: str, result: mcp_types.CallToolResult) -> Any:
+        if result.isError:
+            # FastMCP reports a raised exception as text; it is not a payload to project
+            text = "\n".join(item.text for item in result.content if isinstance(item, mcp_types.TextContent))
+            return {"error": truncate_text(text or "Tool call failed.", self.budget)}
+        value = content_value(result.content, tool_name in self.list_results)
+        full_text = json.dumps(value, ensure_ascii=False)
+        if len(full_text) <= self.budget:
+            return value
+
+        compacted = truncate_text(project(value, self.trees.get(tool_name, {})))
+        compacted_text = json.dumps(compacted, ensure_ascii=False)
+        handle = self.store(full_text)
+        response = {
+            "compacted": True,
+            "handle": handle,
+            "total_chars": len(full_text),
+            "note": f"Result shortened. Call {READ_RESULT_TOOL} with this handle to read the full payload.",
+        }
+        if len(compacted_text) <= self.budget:
+            response["content"] = compacted
+        else:
+            response["preview"] = compacted_text[:self.budget]
+        return response
+
+    def store(self, text: str) -> str:
+        handle = uuid.uuid4().hex[:12]
+        self.stored[handle] = text
+        while len(self.stored) > MAX_STORED_RESULTS:
+            self.stored.popitem(last=False)
+        return handle
+
+    def full(self, value: Any) -> Any:
+        """The uncompacted payload behind a compacted result, if it is still stored."""
+        if isinstance(value, dict) and value.get("compacted") and value.get("handle") in self.stored:
+            return json.loads(self.stored[value["handle"]])
+        return value
+
+    def read(self, handle: str, offset: int = 0, length: Optional[int] = None) -> dict:
+        """A page of a stored payload, for the read_tool_result tool."""
+        text = self.stored.get(handle)
+        if text is None:
+            return {"error": f"Unknown or expired handle {handle}."}
+        self.stored.move_to_end(handle)
+        offset = max(0, int(offset))
+        end = offset + min(int(length or self.budget), self.budget)
+        return {
+            "handle": handle,
+            "offset": offset,
+            "text": text[offset:end],
+            "next_offset": end if end < len(text) else None,
+            "total_chars": len(text),
+        }
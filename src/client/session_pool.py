@@ -0,0 +1,322 @@
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.server.lowlevel import Server
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.shared.session import ProgressFnT
+from pydantic import AnyUrl
+import tracing
+
+# seconds a server may take to spawn and answer initialize()
+STARTUP_TIMEOUT = float(os.environ.get("MCP_STARTUP_TIMEOUT", "60"))
+# how often idle workers are pinged, and how long a ping may take before the worker is restarted
+PING_INTERVAL = float(os.environ.get("MCP_PING_INTERVAL", "15"))
+PING_TIMEOUT = float(os.environ.get("MCP_PING_TIMEOUT", "5"))
+# restart delays grow 1s, 2s, 4s, ... up to this cap while a worker keeps failing
+MAX_RESTART_BACKOFF = float(os.environ.get("MCP_MAX_RESTART_BACKOFF", "60"))
+# errors that mean the worker's pipe is gone, as opposed to the tool itself failing
+CONNECTION_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, BrokenPipeError)
+
+class WatchedSession(ClientSession):
+    """
+    A ClientSession that fails its pending requests as soon as the server's output
+    ends, e.g. because the process died. A plain ClientSession leaves them waiting
+    for responses that can no longer arrive.
+    """
+    def __init__(self, read, write, on_close: Callable[[], None]):
+        super().__init__(read, write)
+        self.on_close = on_close
+
+    async def _receive_loop(self) -> None:
+        try:
+            await super()._receive_loop()
+        finally:
+            # the waiting requests see EndOfStream, one of CONNECTION_ERRORS
+            for stream in list(self._response_streams.values()):
+                stream.close()
+            self._response_streams.clear()
+            self.on_close()
+
+class ServerConnection:
+    """
+    A stdio MCP server whose transport and session live in a dedicated task.
+
+    stdio_client and ClientSession must be exited by the task that entered them,
+    so each server gets its own task. That lets servers start concurrently and
+    be stopped independently.
+
+    Given an in-process `server`, the session talks to it over memory streams
+    instead, and no process is spawned.
+    """
+    def __init__(self, name: str, params: StdioServerParameters, server: Optional[Server] = None):
+        self.name = name
+        self.params = params
+        self.server = server
+        self.session: Optional[ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self._lock = asyncio.Lock()
+        # called when the connection is lost other than by stop()
+        self.on_lost: Optional[Callable[[], None]] = None
+        # bookkeeping used by ServerPool
+        self.healthy = False
+        self.in_flight = 0
+        self.failures = 0
+        self.retry_at = 0.0
+
+    async def start(self) -> ClientSession:
+        """Spawn the server (once) and return its initialized session."""
+        async with self._lock:
+            if self.session is None:
+                ready = asyncio.get_running_loop().create_future()
+                self._stop.clear()
+                self._task = asyncio.create_task(self._serve(ready), name=f"mcp:{self.name}")
+                try:
+                    self.session = await asyncio.wait_for(ready, timeout=STARTUP_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # a server that dies before answering initialize() never closes the pipe
+                    self._task.cancel()
+                    await asyncio.gather(self._task, return_exceptions=True)
+                    self._task = None
+                    raise TimeoutError(f"{self.name} did not start within {STARTUP_TIMEOUT:g} seconds")
+            return self.session
+
+    async def stop(self) -> None:
+        """Close the session and terminate the server process."""
+        self._stop.set()
+        if self._task is not None:
+            try:
+                # shielded: a cancelled caller (the supervisor, when the pool stops while it
+                # restarts this worker) must not leave the process half shut down
+                await asyncio.shield(self._task)
+            except Exception as e:
+                print(f"Error while stopping {self.name}: {e}")
+        self._task = None
+        self.session = None
+
+    async def _serve(self, ready: asyncio.Future) -> None:
+        if self.server is not None:
+            return await self._serve_in_process(ready)
+        try:
+            async with stdio_client(self.params) as (read, write):
+                async with WatchedSession(read, write, self._closed) as session:
+                    await session.initialize()
+                    ready.set_result(session)
+                    await self._stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+                return
+            raise
+        finally:
+            if not ready.done():
+                ready.cancel()
+
+    def _closed(self) -> None:
+        if not self._stop.is_set() and self.on_lost is not None:
+            self.on_lost()
+
+    async def _serve_in_process(self, ready: asyncio.Future) -> None:
+        try:
+            # messages are passed as objects, without the JSON encoding of stdio
+            async with create_connected_server_and_client_session(self.server) as session:
+                ready.set_result(session)
+                await self._stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+                return
+            raise
+        finally:
+            if not ready.done():
+                ready.cancel()
+
+class ServerPool:
+    """
+    A supervised pool of workers for one MCP server.
+
+    Tool calls go to the least-loaded healthy worker. A background task pings
+    the workers and restarts dead ones with exponential backoff.
+    """
+    def __init__(self, name: str, params: StdioServerParameters, workers: int = 1, max_in_flight: int = 8,
+                 server: Optional[Server] = None):
+        self.name = name
+        self.workers: List[ServerConnection] = [
+            ServerConnection(name if workers == 1 else f"{name}#{i}", params, server) for i in range(workers)
+        ]
+        for worker in self.workers:
+            worker.on_lost = lambda worker=worker: self.mark_dead(worker)
+        self.max_in_flight = max_in_flight # calls sent to one worker at the same time
+        self.started = False
+        self.restarts = 0
+        self.waiting = 0
+        self._start_lock = asyncio.Lock()
+        self._available = asyncio.Condition()
+        self._wake = asyncio.Event()
+        self._supervisor: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Spawn every worker concurrently; succeeds if at least one comes up."""
+        async with self._start_lock:
+            if self.started:
+                return
+            results = await asyncio.gather(*(w.start() for w in self.workers), return_exceptions=True)
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if len(errors) == len(self.workers):
+                await asyncio.gather(*(w.stop() for w in self.workers))
+                raise errors[0]
+            for worker, result in zip(self.workers, results):
+                if isinstance(result, BaseException):
+                    print(f"Worker {worker.name} failed to start: {result}")
+                    self.mark_dead(worker)
+                else:
+                    worker.healthy = True
+            self.started = True
+            self._supervisor = asyncio.create_task(self._supervise(), name=f"mcp-supervisor:{self.name}")
+
+    def session(self) -> ClientSession:
+        """Return the session of a healthy worker, e.g. to list the server's tools."""
+        for worker in self.workers:
+            if worker.healthy:
+                return worker.session
+        raise RuntimeError(f"No healthy worker for {self.name}")
+
+    async def call_tool(self, tool_name: str, arguments: Optional[dict] = None,
+                        progress_callback: Optional[ProgressFnT] = None, retry: bool = False):
+        """
+        Call a tool on the least-loaded healthy worker, starting the pool if needed.
+        `progress_callback(progress, total, message)` receives the tool's progress notifications.
+
+        A call whose worker dies fails at once. With `retry` (for tools that are safe
+        to run twice), it is sent once more, to another worker when there is one.
+        """
+        await self.start()
+        for attempt in range(2 if retry else 1):
+            worker = await self._acquire()
+            try:
+                return await worker.session.call_tool(tool_name, arguments=arguments,
+                                                      progress_callback=progress_callback)
+            except CONNECTION_ERRORS as e:
+                self.mark_dead(worker)
+                if not retry or attempt:
+                    raise
+                print(f"Worker {worker.name} lost during {tool_name} ({e!r}), retrying.")
+            finally:
+                # A cancelled call (tool timeout, chat client gone) frees its slot right away.
+                # The server is not told: mcp 1.9 servers tear down their session on
+                # notifications/cancelled. The abandoned call runs to completion there and
+                # its result still lands in the server's response cache.
+                worker.in_flight -= 1
+                async with self._available:
+                    self._available.notify()
+
+    async def _acquire(self) -> ServerConnection:
+        async with self._available:
+            self.waiting += 1
+            try:
+                while True:
+                    ready = [w for w in self.workers if w.healthy and w.in_flight < self.max_in_flight]
+                    if ready:
+                        worker = min(ready, key=lambda w: w.in_flight)
+                        worker.in_flight += 1
+                        return worker
+                    await self._available.wait()
+            finally:
+                self.waiting -= 1
+
+    def mark_dead(self, worker: ServerConnection) -> None:
+        """Take a worker out of rotation and let the supervisor restart it."""
+        worker.healthy = False
+        self._wake.set()
+
+    async def _supervise(self) -> None:
+        while True:
+            interval = PING_INTERVAL if all(w.healthy for w in self.workers) else 1.0
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # wait_for of Python < 3.12 drops a cancellation that arrives as the event is set
+            if not self.started:
+                return
+            await asyncio.gather(*(self._check(w) for w in self.workers))
+
+    async def _check(self, worker: ServerConnection) -> None:
+        if worker.healthy:
+            try:
+                await asyncio.wait_for(worker.session.send_ping(), timeout=PING_TIMEOUT)
+                return
+            except Exception as e:
+                print(f"Worker {worker.name} failed health check: {e!r}")
+                worker.healthy = False
+        if time.monotonic() < worker.retry_at:
+            return
+
+        await worker.stop()
+        try:
+            await worker.start()
+        except Exception as e:
+            worker.failures += 1
+            backoff = min(MAX_RESTART_BACKOFF, 2 ** (worker.failures - 1))
+            worker.retry_at = time.monotonic() + backoff
+            print(f"Restart of {worker.name} failed, retrying in {backoff:g}s: {e}")
+            return
+        worker.healthy = True
+        worker.failures = 0
+        self.restarts += 1
+        print(f"Restarted {worker.name}.", flush=True)
+        async with self._available:
+            self._available.notify_all()
+
+    async def collect_metrics(self) -> List[dict]:
+        """
+        Histograms recorded inside each healthy worker, labelled with server and worker.
+
+        Servers that don't expose the metrics resource (e.g. filesystem) are skipped, and
+        so are in-process ones, which record into the host's own registry.
+        """
+        async def read(index: int, worker: ServerConnection) -> List[dict]:
+            try:
+                result = await asyncio.wait_for(
+                    worker.session.read_resource(AnyUrl(tracing.METRICS_RESOURCE)), timeout=PING_TIMEOUT
+                )
+                entries = json.loads(result.contents[0].text)
+            except Exception:
+                return []
+            for entry in entries:
+                entry["labels"].update(server=self.name, worker=str(index))
+            return entries
+
+        results = await asyncio.gather(*(
+            read(index, worker) for index, worker in enumerate(self.workers)
+            if worker.healthy and worker.server is None
+        ))
+        return [entry for entries in results for entry in entries]
+
+    def stats(self) -> Dict[str, int]:
+        """In-flight calls, restarts and queue depth for this server."""
+        return {
+            "workers": len(self.workers),
+            "healthy": sum(w.healthy for w in self.workers),
+            "in_flight": sum(w.in_flight for w in self.workers),
+            "queue_depth": self.waiting,
+            "restarts": self.restarts,
+            "started": self.started,
+        }
+
+    async def stop(self) -> None:
+        """Stop the supervisor and every worker."""
+        self.started = False
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+            self._supervisor = None
+        await asyncio.gather(*(w.stop() for w in self.workers))
+        for worker in self.workers:
+            worker.healthy = False
@@ -1,10 +1,23 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import json
+import os
+import time
 from .host.gemini_chatbot import GeminiChatBot 
-from fastapi.responses import StreamingResponse
+from .host.admission import PriorityLimiter, QueueFull, Slot, MAX_ACTIVE_CHATS, MAX_QUEUED_CHATS, CHAT_QUEUE_TIMEOUT
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.background import BackgroundTask
+import tracing
 
 chatbot = GeminiChatBot()
+# chats are answered MAX_ACTIVE_CHATS at a time; beyond MAX_QUEUED_CHATS waiting, /chat answers 503
+admission = PriorityLimiter(MAX_ACTIVE_CHATS, MAX_QUEUED_CHATS)
+# seconds of silence (e.g. while a tool runs) after which an event stream gets a comment line,
+# so that proxies neither buffer the stream nor time it out
+SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT", "10"))
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize the chatbot when the server starts."""
@@ -22,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Id"],
 )
 
 # @app.post("/connect")
@@ -35,9 +49,152 @@ app.add_middleware(
 
 @app.post("/chat")
 async def chat(request: Request):
-    """Stream chat queries from the front-end."""
+    """
+    Stream chat queries from the front-end.
+
+    Pass the `session_id` returned in the X-Session-Id header of an earlier
+    response to continue that conversation. Without one, or with one that is unknown
+    or has expired, a new session is started under a fresh id.
+
+    The answer is streamed as plain text with "[CALLING TOOL: ...]" lines, or, when
+    the request accepts `text/event-stream`, as server-sent events: `token`,
+    `tool_start`, `tool_progress`, `tool_end` (with its duration), then `done` or `error`.
+
+    When too many chats are already running or queued, the answer is 503 with a
+    Retry-After header.
+
+    `"plan": true` (or false) overrides PLAN_MODE for this query: the tool calls are
+    planned up front and run concurrently, followed by a single answering turn.
+    """
     data = await request.json()
     query = data.get("query", "")
+    plan = data.get("plan")
+    try:
+        slot = await admission.acquire(timeout=CHAT_QUEUE_TIMEOUT)
+    except QueueFull as e:
+        return JSONResponse(
+            {"error": "Too many chats in progress, please retry later."},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    conversation = chatbot.conversations.get(data.get("session_id"))
+    headers = {"X-Session-Id": conversation.session_id}
+    # released when the stream ends; the background task covers responses that never start streaming
+    release = BackgroundTask(slot.release)
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        events = relay(request, chatbot.process_events(query, conversation, plan), slot, heartbeat=SSE_HEARTBEAT)
+        return StreamingResponse(
+            sse_stream(events, conversation.session_id),
+            media_type="text/event-stream",
+            headers={**headers, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=release
+        )
+    generator = relay(request, chatbot.process_query(query, conversation, plan), slot)
+    return StreamingResponse(
+        generator,
+        media_type="text/plain; charset=utf-8",
+        headers=headers,
+        background=release
+    )
+
+async def relay(request: Request, stream, slot: Slot, heartbeat: Optional[float] = None):
+    """
+    Run `stream` in its own task and yield what it produces, plus None after every
+    `heartbeat` seconds without output. The chat's admission slot is released at the end.
+
+    The task is cancelled as soon as the client disconnects, rather than when the next
+    write fails, so an abandoned chat stops its model stream and tool calls right away.
+    """
+    queue = asyncio.Queue()
+    end = object()
+
+    async def produce():
+        try:
+            async for item in stream:
+                queue.put_nowait(item)
+            queue.put_nowait(end)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    async def watch():
+        # the request body has been read, so the next message is the disconnect
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+        if not producer.done():
+            print("Client disconnected, cancelling its chat.")
+            producer.cancel()
+        queue.put_nowait(end)
+
+    producer = asyncio.create_task(produce())
+    watcher = asyncio.create_task(watch())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is end:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        watcher.cancel()
+        slot.release()
+
+def sse_event(event: str, data: dict) -> str:
+    # ASCII only: clients that split lines with str.splitlines also break on U+2028, U+2029 and U+0085
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def sse_stream(events, session_id: str):
+    """Format chat events as server-sent events, ending with `done` or `error`."""
+    start = time.perf_counter()
+    try:
+        async for event in events:
+            if event is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield sse_event(*event)
+    except Exception as e:
+        print(f"Error in chat {session_id}: {e!r}")
+        yield sse_event("error", {"message": str(e)})
+        return
+    yield sse_event("done", {"session_id": session_id, "seconds": round(time.perf_counter() - start, 3)})
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a conversation."""
+    return {"deleted": chatbot.conversations.delete(session_id)}
+
+@app.get("/answer-cache")
+async def answer_cache_stats():
+    """Hit/miss counters and size of the answer cache."""
+    return chatbot.answers.stats()
+
+@app.delete("/answer-cache")
+async def invalidate_answers(tool: Optional[str] = None):
+    """Drop cached answers, or only those that used `tool`, e.g. after its upstream data changed."""
+    return {"invalidated": chatbot.answers.invalidate(tool)}
+
+@app.get("/admission")
+async def admission_stats():
+    """Running and queued chats, rejections, and the same for Gemini generation slots."""
+    return {"chats": admission.stats(), "generations": chatbot.generation_slots.stats()}
+
+@app.get("/pools")
+async def pools():
+    """Report in-flight calls, restarts and queue depth of each MCP server pool."""
+    return chatbot.gemini_client.pool_stats()
+
 
-    generator = chatbot.process_query(query)
-    return StreamingResponse(generator, media_type="text/plain; charset=utf-8")
\ No newline at end of file
+@app.get("/metrics")
+async def metrics():
+    """Latency histograms of the chat pipeline and the MCP servers, in Prometheus text format."""
+    snapshots = tracing.registry.snapshot() + await chatbot.gemini_client.collect_metrics()
+    return PlainTextResponse(
+        tracing.render_prometheus(snapshots),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,110 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+# chats answered at once, and how many more may wait for a turn before /chat answers 503
+MAX_ACTIVE_CHATS = int(os.environ.get("MAX_ACTIVE_CHATS", "32"))
+MAX_QUEUED_CHATS = int(os.environ.get("MAX_QUEUED_CHATS", "64"))
+# seconds a queued chat waits for a turn before it is turned away too
+CHAT_QUEUE_TIMEOUT = float(os.environ.get("CHAT_QUEUE_TIMEOUT", "30"))
+
+# lower goes first: work for chats already under way beats starting new ones
+IN_PROGRESS = 0
+NEW = 1
+
+class QueueFull(Exception):
+    """No slot is free and the queue is full (or waiting took too long)."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too busy, retry after {retry_after} seconds.")
+        self.retry_after = retry_after
+
+class Slot:
+    """A held place in a PriorityLimiter. release() may be called more than once."""
+    __slots__ = ("limiter", "started", "held")
+
+    def __init__(self, limiter: "PriorityLimiter"):
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self.held = True
+
+    def release(self) -> None:
+        if self.held:
+            self.held = False
+            self.limiter._release(time.monotonic() - self.started)
+
+class PriorityLimiter:
+    """
+    Lets at most `limit` holders in at once.
+
+    Waiters are let in by priority (lower first), then in arrival order. A freed
+    slot passes straight to the next waiter, so a newcomer cannot overtake the
+    queue. With `max_waiting` set, acquire() raises QueueFull instead of queueing
+    more; its retry_after is estimated from how long slots have been held lately.
+    """
+    def __init__(self, limit: int, max_waiting: Optional[int] = None):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiters: List[list] = [] # heap of [priority, arrival, future]
+        self.mean_hold = 1.0 # seconds, moving average
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+        self._arrivals = itertools.count()
+
+    def retry_after(self) -> int:
+        """Seconds until a request queued now would likely get its turn."""
+        return max(1, math.ceil(self.mean_hold * (len(self.waiters) + 1) / self.limit))
+
+    async def acquire(self, priority: int = IN_PROGRESS, timeout: Optional[float] = None) -> Slot:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.counters["admitted"] += 1
+            return Slot(self)
+        if self.max_waiting is not None and len(self.waiters) >= self.max_waiting:
+            self.counters["rejected"] += 1
+            raise QueueFull(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._arrivals), future]
+        heapq.heappush(self.waiters, entry)
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # the slot was handed over just as we gave up
+                self._release(0.0)
+            else:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                self.counters["timed_out"] += 1
+                raise QueueFull(self.retry_after())
+            raise
+        self.counters["admitted"] += 1
+        return Slot(self)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = IN_PROGRESS):
+        held = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            held.release()
+
+    def _release(self, held_for: float) -> None:
+        self.mean_hold = 0.8 * self.mean_hold + 0.2 * held_for
+        while self.waiters:
+            future = heapq.heappop(self.waiters)[2]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return dict(self.counters, active=self.active, waiting=len(self.waiters), limit=self.limit,
+                    max_waiting=self.max_waiting, mean_hold_seconds=round(self.mean_hold, 3))
@@ -0,0 +1,190 @@
+import difflib
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from response_cache import TOOL_TTLS as SERVER_TOOL_TTLS
+
+# answers kept at most; 0 turns the cache off
+ANSWER_CACHE_ENTRIES = int(os.environ.get("ANSWER_CACHE_ENTRIES", "1024"))
+# seconds an answer is served for, at most
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", str(60 * 60)))
+# cosine similarity a query needs with a cached one to reuse its answer; 1 allows exact matches only
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0.9"))
+# size of the hashed character n-gram vectors
+VECTOR_DIM = 2048
+NGRAM = 3
+
+# How long the data behind each tool stays valid, shared with the MCP servers' response
+# caches. An answer expires with the shortest-lived tool it used; answers that used a
+# tool not listed here (e.g. filesystem or fetch) are never cached.
+TOOL_TTLS: Dict[str, float] = {
+    **SERVER_TOOL_TTLS,
+    # pages of a result of one of the tools above
+    "read_tool_result": max(SERVER_TOOL_TTLS.values()),
+}
+
+# words that do not change what is being asked
+STOPWORDS = frozenset("""
+a an and are as at be by can could do does for from give how i in is it me of on or
+please show tell the to what whats which who with you about list find get
+""".split())
+
+def normalize_query(query: str) -> str:
+    """
+    Casefold and drop punctuation and filler words, so rephrasings share a key. The
+    remaining words keep their order: "aspirin increase warfarin" is not
+    "warfarin increase aspirin".
+    """
+    words = re.findall(r"\w+", query.casefold())
+    kept = [word for word in words if word not in STOPWORDS] or words
+    return " ".join(kept)
+
+# words that turn a question around ("is X safe" / "is X not safe")
+NEGATIONS = frozenset("""
+not no never nor without cannot cant dont doesnt didnt isnt arent wasnt wont shouldnt
+""".split())
+# prefixes that negate the word they are put in front of ("safe" / "unsafe")
+NEGATING_PREFIXES = ("un", "in", "im", "ir", "il", "non", "dis", "anti")
+# how alike two words must be to count as the same word spelled or inflected differently
+WORD_SIMILARITY = 0.8
+
+def negates(word: str, other: str) -> bool:
+    """Whether a word is a negation, or the negated form of `other`."""
+    return word in NEGATIONS or any(
+        word.startswith(prefix) and word[len(prefix):] == other for prefix in NEGATING_PREFIXES
+    )
+
+def same_word(a: str, b: str) -> bool:
+    """
+    Whether two words are the same word spelled or inflected differently. Words
+    with digits (ids, phases, years, doses) must match exactly.
+    """
+    if a == b:
+        return True
+    if any(ch.isdigit() for ch in a + b) or negates(a, b) or negates(b, a):
+        return False
+    return difflib.SequenceMatcher(None, a, b).ratio() >= WORD_SIMILARITY
+
+def same_question(a: str, b: str) -> bool:
+    """
+    Whether two normalized queries with similar vectors ask the same thing: word
+    for word in the same order, each pair the same word up to spelling or
+    inflection ("warning", "warnings"), but not differing in a number, an id or a
+    negation.
+    """
+    words_a, words_b = a.split(), b.split()
+    return len(words_a) == len(words_b) and all(map(same_word, words_a, words_b))
+
+def embed(text: str) -> np.ndarray:
+    """Unit-length hashed character n-gram vector of normalized text."""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for word in text.split():
+        padded = f" {word} "
+        grams = [padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))]
+        hashes = np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint32, count=len(grams))
+        # the top bit picks a sign so that colliding n-grams tend to cancel out
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % VECTOR_DIM, signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class CachedAnswer:
+    __slots__ = ("query", "answer", "tools", "expires_at", "row", "hits")
+
+    def __init__(self, query: str, answer: str, tools: Tuple[str, ...], expires_at: float, row: int):
+        self.query = query
+        self.answer = answer
+        self.tools = tools
+        self.expires_at = expires_at
+        self.row = row
+        self.hits = 0
+
+class AnswerCache:
+    """
+    Final answers to first questions of a conversation, keyed by normalized query.
+
+    A lookup first tries the exact normalized text, then the most similar cached
+    query by cosine similarity of hashed n-gram vectors, kept as rows of one NumPy
+    matrix so a lookup is a single matrix-vector product. Entries expire with the
+    data of the tools they used and the least recently used are evicted beyond
+    `max_entries`.
+    """
+    def __init__(self, max_entries: int = ANSWER_CACHE_ENTRIES, ttl: float = ANSWER_CACHE_TTL,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self.vectors = np.zeros((max_entries, VECTOR_DIM), dtype=np.float32)
+        self.row_keys: List[Optional[str]] = [None] * max_entries
+        self.free_rows = list(range(max_entries - 1, -1, -1))
+        self.counters = {"hits": 0, "similar_hits": 0, "misses": 0, "stored": 0, "evictions": 0, "invalidated": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, query: str) -> Optional[str]:
+        """The cached answer for a query or a near-duplicate of it, if any."""
+        if not self.enabled:
+            return None
+        normalized = normalize_query(query)
+        key = normalized
+        entry = self.entries.get(key)
+        if entry is None and self.similarity < 1 and self.entries:
+            scores = self.vectors @ embed(normalized)
+            row = int(np.argmax(scores))
+            similar = self.row_keys[row]
+            if scores[row] >= self.similarity and similar is not None and same_question(similar, normalized):
+                key = similar
+                entry = self.entries[key]
+        if entry is None or entry.expires_at <= time.time():
+            if entry is not None:
+                self._remove(key)
+            self.counters["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        entry.hits += 1
+        self.counters["hits" if key == normalized else "similar_hits"] += 1
+        return entry.answer
+
+    def set(self, query: str, answer: str, tools: Iterable[str] = ()) -> bool:
+        """Cache an answer unless it relied on a tool whose data cannot be cached."""
+        tools = tuple(sorted(set(tools)))
+        if not self.enabled or not answer.strip() or any(tool not in TOOL_TTLS for tool in tools):
+            return False
+        key = normalize_query(query)
+        if key in self.entries:
+            self._remove(key)
+        while not self.free_rows:
+            self._remove(next(iter(self.entries)))
+            self.counters["evictions"] += 1
+        row = self.free_rows.pop()
+        expires_at = time.time() + min([self.ttl] + [TOOL_TTLS[tool] for tool in tools])
+        self.entries[key] = CachedAnswer(query, answer, tools, expires_at, row)
+        self.vectors[row] = embed(key)
+        self.row_keys[row] = key
+        self.counters["stored"] += 1
+        return True
+
+    def invalidate(self, tool: Optional[str] = None) -> int:
+        """Drop every answer, or those that used a given tool (e.g. after its data was refreshed)."""
+        keys = [key for key, entry in self.entries.items() if tool is None or tool in entry.tools]
+        for key in keys:
+            self._remove(key)
+        self.counters["invalidated"] += len(keys)
+        return len(keys)
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key)
+        self.vectors[entry.row] = 0
+        self.row_keys[entry.row] = None
+        self.free_rows.append(entry.row)
+
+    def stats(self) -> dict:
+        return dict(self.counters, entries=len(self.entries), max_entries=self.max_entries,
+                    similarity=self.similarity, ttl=self.ttl)
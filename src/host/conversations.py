@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+from google.genai import types
+
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "1000"))
+# seconds a conversation may sit idle before it is forgotten
+SESSION_IDLE_TTL = float(os.environ.get("SESSION_IDLE_TTL", "3600"))
+# approximate tokens of history kept per conversation
+SESSION_TOKEN_BUDGET = int(os.environ.get("SESSION_TOKEN_BUDGET", "32000"))
+# older tool results are cut to this many characters once the budget is exceeded
+SHORTENED_RESULT_CHARS = 600
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    """Rough token count (4 characters per token) of serialized contents."""
+    return sum(len(content.model_dump_json(exclude_none=True)) for content in contents) // 4
+
+def shorten_tool_results(content: types.Content) -> types.Content:
+    """Replace large function responses in a tool turn with a short preview."""
+    parts = []
+    for part in content.parts or []:
+        response = part.function_response
+        if response is not None:
+            text = json.dumps(response.response, ensure_ascii=False, default=str)
+            if len(text) > SHORTENED_RESULT_CHARS:
+                part = types.Part.from_function_response(
+                    name=response.name,
+                    response={
+                        "summary": text[:SHORTENED_RESULT_CHARS] + "...",
+                        "note": "Older tool result shortened to save context; call the tool again for full data.",
+                    },
+                )
+        parts.append(part)
+    return types.Content(role=content.role, parts=parts)
+
+class Conversation:
+    """The Gemini `contents` history of one chat session."""
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.contents: List[types.Content] = []
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock() # one query at a time per conversation
+
+    def exchanges(self) -> List[List[types.Content]]:
+        """Split the history into exchanges, each starting at a user message."""
+        exchanges: List[List[types.Content]] = []
+        for content in self.contents:
+            if content.role == 'user' or not exchanges:
+                exchanges.append([])
+            exchanges[-1].append(content)
+        return exchanges
+
+    def trim(self, token_budget: int = SESSION_TOKEN_BUDGET) -> None:
+        """
+        Keep the history under the token budget.
+
+        Tool results of earlier exchanges are shortened first, then whole exchanges
+        are dropped oldest first. The latest exchange is always kept intact.
+        """
+        if estimate_tokens(self.contents) <= token_budget:
+            return
+        exchanges = self.exchanges()
+        for exchange in exchanges[:-1]:
+            exchange[:] = [shorten_tool_results(c) if c.role == 'tool' else c for c in exchange]
+        while len(exchanges) > 1 and estimate_tokens([c for e in exchanges for c in e]) > token_budget:
+            exchanges.pop(0)
+        self.contents = [content for exchange in exchanges for content in exchange]
+
+class ConversationStore:
+    """
+    Server-side conversations keyed by session id.
+
+    Memory stays bounded: idle conversations expire after `idle_ttl` seconds, the
+    least recently used ones are evicted beyond `max_sessions`, and each history
+    is trimmed to a token budget after every query.
+    """
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_ttl: float = SESSION_IDLE_TTL):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+
+    def get(self, session_id: Optional[str] = None) -> Conversation:
+        """
+        Return the conversation for a session id, starting a new one if it is unknown
+        or expired. New conversations always get a fresh id: a client-chosen one could
+        be guessed, or reused by another client.
+        """
+        self.evict()
+        conversation = self.conversations.get(session_id) if session_id else None
+        if conversation is None:
+            conversation = Conversation(uuid.uuid4().hex)
+            self.conversations[conversation.session_id] = conversation
+        self.conversations.move_to_end(conversation.session_id)
+        conversation.last_used = time.monotonic()
+        self.evict()
+        return conversation
+
+    def delete(self, session_id: str) -> bool:
+        return self.conversations.pop(session_id, None) is not None
+
+    def evict(self) -> None:
+        # the dict is in least-recently-used order, so expired sessions are at the front
+        deadline = time.monotonic() - self.idle_ttl
+        while self.conversations:
+            oldest = next(iter(self.conversations.values()))
+            if oldest.last_used >= deadline and len(self.conversations) <= self.max_sessions:
+                break
+            self.conversations.popitem(last=False)
@@ -1,12 +1,40 @@
 from dotenv import load_dotenv
+import json
 import os
 from google import genai
 from google.genai import types
 from ..client.gemini_client import GeminiClient
+from .conversations import Conversation, ConversationStore
+from .answer_cache import AnswerCache
+from .admission import PriorityLimiter, IN_PROGRESS, NEW
+from .planner import PLAN_INSTRUCTION, PlanError, Step, parse_plan, resolve_args
+from ..client.result_compaction import READ_RESULT_TOOL
+from typing import Dict, List, Optional
 import asyncio
+import time
+import tracing
 
 load_dotenv()
 GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
+GEMINI_MODEL = "gemini-2.5-flash-preview-04-17"
+# upper bound on generate_content round-trips in flight across all chats
+MAX_CONCURRENT_GENERATIONS = int(os.environ.get("MAX_CONCURRENT_GENERATIONS", "32"))
+# seconds a single tool call may take before its result is replaced by an error
+TOOL_CALL_TIMEOUT = float(os.environ.get("TOOL_CALL_TIMEOUT", "60"))
+# longer budgets for the batch tools, whose upstream requests are paced by the shared rate
+# limits; TOOL_TIMEOUTS='{"search_drug": 20}' sets or overrides the budget of any tool
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "search_similar_sequences_batch": 300,  # 500 sequences may each need RCSB at 5 requests/s
+    "search_papers_batch": 120,             # 10 topics at one arXiv request every 3 s
+    "harvest_clinical_trials": 300,         # pages of 1000 studies at about 50 requests/min
+    **json.loads(os.environ.get("TOOL_TIMEOUTS", "{}")),
+}
+# streamed text is coalesced until it reaches this size or has waited this long
+STREAM_CHUNK_CHARS = 64
+STREAM_FLUSH_SECONDS = 0.05
+# answer by planning all tool calls up front and running them as a graph (see planner.py),
+# unless a request says otherwise
+PLAN_MODE = os.environ.get("PLAN_MODE", "0") == "1"
 
 client = genai.Client(
     api_key=GEMINI_API_KEY,
@@ -17,6 +45,9 @@ class GeminiChatBot:
     def __init__(self):
         self.gemini = client
         self.gemini_client = GeminiClient()
+        self.generation_slots = PriorityLimiter(MAX_CONCURRENT_GENERATIONS)
+        self.conversations = ConversationStore()
+        self.answers = AnswerCache()
 
     async def __aenter__(self):
         await self.gemini_client.connect_to_servers()
@@ -25,72 +56,310 @@ class GeminiChatBot:
     async def __aexit__(self, exc_type, exc_value, traceback):
         await self.gemini_client.cleanup()
 
-    async def process_query(self, query:str):
+    async def stream_turn(self, contents, config, function_calls: list, priority: int = IN_PROGRESS):
         """
-        Send user's query to Gemini, handle any requested tool calls,
-        and print the model's final response.
+        Stream one model turn, yielding coalesced text as it arrives.
+
+        Function-call parts are collected into `function_calls`, and the complete
+        model turn is appended to `contents` once the stream ends. When generation
+        slots are short, turns that follow tool results go before the opening turns
+        of new queries (`priority`).
         """
-        contents = [types.Content(
-            role='user',
-            parts=[types.Part.from_text(text=query)]
-        )]
-
-        config = types.GenerateContentConfig(
-            tools=self.gemini_client.available_tools,
-            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
-            max_output_tokens=2048
+        text = ""
+        buffer = ""
+        last_flush = 0.0
+        async with self.generation_slots.slot(priority):
+            with tracing.span("gemini_generate_seconds", model=GEMINI_MODEL):
+                stream = await self.gemini.aio.models.generate_content_stream(
+                    model=GEMINI_MODEL,
+                    contents=contents,
+                    config=config
+                )
+                async for chunk in stream:
+                    if not chunk.candidates or not chunk.candidates[0].content:
+                        continue
+                    for part in chunk.candidates[0].content.parts or []:
+                        if part.function_call:
+                            function_calls.append(part)
+                        elif part.text and not part.thought:
+                            text += part.text
+                            buffer += part.text
+                    now = time.monotonic()
+                    if buffer and (len(buffer) >= STREAM_CHUNK_CHARS or now - last_flush >= STREAM_FLUSH_SECONDS):
+                        yield buffer
+                        buffer = ""
+                        last_flush = now
+        if buffer:
+            yield buffer
+
+        parts = [types.Part.from_text(text=text)] if text else []
+        contents.append(types.Content(role='model', parts=parts + function_calls))
+
+    async def call_tool(self, fc: types.FunctionCall, progress_callback=None) -> types.Part:
+        """
+        Call the MCP tool requested by the model and wrap the outcome as a function response.
+        The call is given up after the tool's entry in TOOL_TIMEOUTS, or TOOL_CALL_TIMEOUT.
+        """
+        timeout = TOOL_TIMEOUTS.get(fc.name, TOOL_CALL_TIMEOUT)
+        try:
+            result = await asyncio.wait_for(
+                self.gemini_client.call_tool(fc.name, arguments=fc.args, progress_callback=progress_callback),
+                timeout=timeout
+            )
+            fc_response = {'result': result}
+        except asyncio.TimeoutError:
+            fc_response = {'error': f"Tool {fc.name} timed out after {timeout:g} seconds."}
+        except Exception as e:
+            # instead of raising the exception, you can let the model handle it
+            fc_response = {'error': str(e)}
+
+        return types.Part.from_function_response(
+            name=fc.name,
+            response=fc_response,
         )
 
-        response: types.GenerateContentResponse = self.gemini.models.generate_content(
-            model="gemini-2.5-flash-preview-04-17",
-            contents=contents,
-            config=config
+    async def run_tool(self, call_id: int, fc: types.FunctionCall, updates: asyncio.Queue) -> types.Part:
+        """Call a tool, putting its progress and its end on `updates` as events."""
+        async def progress(progress: float, total: Optional[float], message: Optional[str]):
+            await updates.put(("tool_progress", {
+                "id": call_id, "name": fc.name, "progress": progress, "total": total, "message": message
+            }))
+
+        start = time.perf_counter()
+        part = await self.call_tool(fc, progress)
+        await updates.put(("tool_end", {
+            "id": call_id, "name": fc.name,
+            "seconds": round(time.perf_counter() - start, 3), "error": self.is_error(part)
+        }))
+        return part
+
+    async def make_plan(self, contents, config) -> List[Step]:
+        """Ask the model for the tool calls needed to answer, as a plan. Raises PlanError."""
+        plan_config = types.GenerateContentConfig(
+            tools=config.tools,
+            # the tools are declared so that the model knows them, but not called yet
+            tool_config=types.ToolConfig(function_calling_config=types.FunctionCallingConfig(mode="NONE")),
+            system_instruction=PLAN_INSTRUCTION,
+            max_output_tokens=2048
         )
+        try:
+            async with self.generation_slots.slot(NEW):
+                with tracing.span("gemini_generate_seconds", model=GEMINI_MODEL):
+                    response = await self.gemini.aio.models.generate_content(
+                        model=GEMINI_MODEL,
+                        contents=contents,
+                        config=plan_config
+                    )
+        except Exception as e:
+            raise PlanError(f"Planning failed: {e}")
+        tools = list(self.gemini_client.tool_server_map) + [READ_RESULT_TOOL]
+        return parse_plan(response.text or "", tools)
+
+    async def run_plan(self, steps: List[Step], first_id: int, updates: asyncio.Queue) -> list:
+        """
+        Run the steps of a plan, each as soon as the steps it depends on are done,
+        putting their events on `updates` and ("step_done", None) after each step.
+        Returns (function call, response part) for every step, in plan order, or None
+        for a step that was not run because a step it depends on failed or its
+        references do not resolve.
+        """
+        outputs: Dict[str, object] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run(step: Step, call_id: int):
+            try:
+                for dependency in step.depends_on:
+                    await tasks[dependency]
+                if any(dependency not in outputs for dependency in step.depends_on):
+                    return None
+                try:
+                    args = resolve_args(step.args, outputs)
+                except PlanError as e:
+                    print(f"Plan step {step.id} not run: {e}")
+                    return None
+                fc = types.FunctionCall(name=step.tool, args=args)
+                await updates.put(("tool_start", {"id": call_id, "name": fc.name, "args": fc.args}))
+                part = await self.run_tool(call_id, fc, updates)
+                if not self.is_error(part):
+                    outputs[step.id] = self.gemini_client.compactor.full(part.function_response.response["result"])
+                return fc, part
+            finally:
+                await updates.put(("step_done", None))
+
+        for number, step in enumerate(steps):
+            tasks[step.id] = asyncio.create_task(run(step, first_id + number))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return [task.result() for task in tasks.values()]
 
-        while True:
-            if response.function_calls:
-                fc = response.function_calls[0]
-                contents.append(response.candidates[0].content)
+    async def process_query(self, query:str, conversation: Optional[Conversation] = None,
+                            plan: Optional[bool] = None):
+        """
+        Send user's query to Gemini, handle any requested tool calls,
+        and print the model's final response.
 
-                fc_name = fc.name
-                fc_args = fc.args
+        With a conversation, the query is answered in the context of its earlier
+        exchanges (including their tool results) and the history is kept for the
+        next query. Tool calls are announced inline as "[CALLING TOOL: ...]" lines;
+        process_events yields the same stream as typed events. `plan` turns plan
+        mode on or off for this query (default PLAN_MODE); see respond.
+        """
+        async for kind, data in self.process_events(query, conversation, plan):
+            if kind == "token":
+                yield data["text"]
+            elif kind == "tool_start":
+                yield f"[CALLING TOOL: {data['name']} with args {data['args']}]\n"
 
-                try: 
-                    yield f"[CALLING TOOL: {fc_name} with args {fc_args}]\n"
-                    session = self.gemini_client.tool_session_map[fc_name]
-                    result = await session.call_tool(fc_name, arguments=fc_args)
+    async def process_events(self, query: str, conversation: Optional[Conversation] = None,
+                             plan: Optional[bool] = None):
+        """
+        Answer a query as (kind, data) events:
 
-                    fc_response = {'result': result.content}
-                except Exception as e:
-                    # instead of raising the exception, you can let the model handle it
-                    fc_response = {'error': str(e)}
+            ("token", {"text"})                              a piece of the answer
+            ("tool_start", {"id", "name", "args"})           a tool call was requested
+            ("tool_progress", {"id", "name", "progress", "total", "message"})
+                                                             the tool reported progress, e.g. partial results
+            ("tool_end", {"id", "name", "seconds", "error"}) that call finished
+        """
+        start = time.perf_counter()
+        first_event = True
+        with tracing.span("chat_request_seconds"):
+            async for event in self.respond(query, conversation, plan):
+                if first_event:
+                    tracing.observe("chat_first_byte_seconds", time.perf_counter() - start)
+                    first_event = False
+                yield event
 
-                fc_response_part = types.Part.from_function_response(
-                    name=fc.name,
-                    response=fc_response,
-                )
-                function_response_content = types.Content(
-                    role='tool', parts=[fc_response_part]
-                )
-                contents.append(function_response_content)
+    async def respond(self, query: str, conversation: Optional[Conversation] = None,
+                      plan: Optional[bool] = None):
+        """
+        The tool-calling loop behind process_events.
 
-                response = self.gemini.models.generate_content(
-                    model="gemini-2.5-flash-preview-04-17",
-                    contents=contents,
-                    config=config
-                )
-                    
-                if not response.function_calls:
-                    # No more function calls → stream out the final text
-                    if response.text:
-                        for word in response.text:
-                            yield word
-                            await asyncio.sleep(0)  # flush to the client immediately
+        The opening question of a conversation is answered from the answer cache
+        when it (or a near-duplicate) was answered before, without calling the model.
+
+        In plan mode the model is first asked for every tool call it needs as a graph
+        (see planner.py). The calls run concurrently as their inputs become available,
+        and one more model turn, with tool calls switched off, writes the answer. If
+        no usable plan comes back, the loop runs as usual. If a planned call fails,
+        the loop continues from the results so far, so the model can recover.
+        """
+        conversation = conversation or Conversation("one-off")
+        async with conversation.lock:
+            user_content = types.Content(
+                role='user',
+                parts=[types.Part.from_text(text=query)]
+            )
+            # later questions depend on the conversation so far, only opening ones are cached
+            opening = not conversation.contents
+            if opening:
+                cached = self.answers.get(query)
+                if cached is not None:
+                    yield "token", {"text": cached}
+                    conversation.contents = [
+                        user_content, types.Content(role='model', parts=[types.Part.from_text(text=cached)])
+                    ]
+                    return
+
+            contents = conversation.contents + [user_content]
+            config = types.GenerateContentConfig(
+                tools=self.gemini_client.available_tools,
+                automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
+                max_output_tokens=2048
+            )
+            answer = []
+            tools_used = set()
+            cacheable = opening
+            calls_made = 0
+            turn_config = config
+
+            if PLAN_MODE if plan is None else plan:
+                try:
+                    steps = await self.make_plan(contents, config)
+                except PlanError as e:
+                    print(f"{e} Answering step by step.")
+                    steps = None
+                if steps is not None:
+                    updates = asyncio.Queue()
+                    task = asyncio.create_task(self.run_plan(steps, calls_made, updates))
+                    try:
+                        running = len(steps)
+                        while running:
+                            kind, data = await updates.get()
+                            if kind == "step_done":
+                                running -= 1
+                            else:
+                                yield kind, data
+                        results = await task
+                    finally:
+                        task.cancel()
+                    calls_made += len(steps)
+                    done = [result for result in results if result is not None]
+                    if done:
+                        contents.append(types.Content(role='model', parts=[
+                            types.Part(function_call=fc) for fc, _ in done
+                        ]))
+                        contents.append(types.Content(role='tool', parts=[part for _, part in done]))
+                        tools_used.update(fc.name for fc, _ in done)
+                    if len(done) == len(steps) and not any(self.is_error(part) for _, part in done):
+                        turn_config = config.model_copy(update={"tool_config": types.ToolConfig(
+                            function_calling_config=types.FunctionCallingConfig(mode="NONE")
+                        )})
+                    else:
+                        print("Not every planned call succeeded, continuing step by step.")
+                        cacheable = False
+
+            while True:
+                fc_parts = []
+                priority = IN_PROGRESS if calls_made else NEW
+                async for text in self.stream_turn(contents, turn_config, fc_parts, priority):
+                    answer.append(text)
+                    yield "token", {"text": text}
+                turn_config = config
+                if not fc_parts:
                     break
-            else:
-                # Pure text response
-                if response.text:
-                    for word in response.text:
-                        yield word
-                        await asyncio.sleep(0)  # flush to the client immediately
-                break
\ No newline at end of file
+
+                function_calls = [part.function_call for part in fc_parts]
+                ids = range(calls_made, calls_made + len(function_calls))
+                calls_made += len(function_calls)
+                for call_id, fc in zip(ids, function_calls):
+                    yield "tool_start", {"id": call_id, "name": fc.name, "args": fc.args}
+                # run every call of this turn at once and answer them in a single tool turn
+                updates = asyncio.Queue()
+                tasks = [
+                    asyncio.create_task(self.run_tool(call_id, fc, updates))
+                    for call_id, fc in zip(ids, function_calls)
+                ]
+                try:
+                    running = len(tasks)
+                    while running:
+                        kind, data = await updates.get()
+                        if kind == "tool_end":
+                            running -= 1
+                        yield kind, data
+                    fc_response_parts = [task.result() for task in tasks]
+                finally:
+                    # a chat that is abandoned mid-turn (client gone) stops its tool calls too
+                    for task in tasks:
+                        task.cancel()
+                contents.append(types.Content(
+                    role='tool', parts=list(fc_response_parts)
+                ))
+                tools_used.update(fc.name for fc in function_calls)
+                # an answer built on a failed tool call is not worth repeating
+                cacheable = cacheable and not any(self.is_error(part) for part in fc_response_parts)
+
+            # only completed exchanges are kept, so the history never ends in an unanswered call
+            conversation.contents = contents
+            conversation.trim()
+            if cacheable:
+                self.answers.set(query, "".join(answer), tools_used)
+
+    @staticmethod
+    def is_error(part: types.Part) -> bool:
+        response = part.function_response.response or {}
+        result = response.get('result')
+        return 'error' in response or (isinstance(result, dict) and 'error' in result)
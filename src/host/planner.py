@@ -0,0 +1,131 @@
+import json
+import os
+import re
+from typing import Any, Dict, List
+
+# most tool calls a plan may contain
+MAX_PLAN_STEPS = int(os.environ.get("MAX_PLAN_STEPS", "16"))
+
+PLAN_INSTRUCTION = """\
+Do not answer yet. Plan the tool calls needed to answer the user's last message and
+reply with only a JSON object of this form:
+
+{"steps": [{"id": "s1", "tool": "<tool name>", "args": {...}, "depends_on": []}, ...]}
+
+Steps run at the same time unless one depends on another, so make independent lookups
+separate steps and prefer batch tools over many calls to the same tool. An argument
+may use the output of an earlier step: "$s1" is the whole output of step s1, and
+"$s1.key", "$s1.0" and "$s1.*.key" pick a field, an item, or a field of every item.
+A step that uses another step's output lists it in depends_on. Reply {"steps": []}
+when no tool is needed.
+"""
+
+# a whole argument value such as "$s1" or "$s1.*.pdb_id"
+REFERENCE = re.compile(r"^\$([A-Za-z0-9_-]+)((?:\.[^.]+)*)$")
+
+class PlanError(Exception):
+    """The model's plan cannot be run; the host falls back to calling tools turn by turn."""
+
+class Step:
+    """One tool call of a plan."""
+    __slots__ = ("id", "tool", "args", "depends_on")
+
+    def __init__(self, id: str, tool: str, args: dict, depends_on: List[str]):
+        self.id = id
+        self.tool = tool
+        self.args = args
+        self.depends_on = depends_on
+
+def references(value: Any) -> List[str]:
+    """Ids of the steps an argument value refers to."""
+    if isinstance(value, str):
+        match = REFERENCE.match(value)
+        return [match.group(1)] if match else []
+    if isinstance(value, dict):
+        return [ref for item in value.values() for ref in references(item)]
+    if isinstance(value, list):
+        return [ref for item in value for ref in references(item)]
+    return []
+
+def parse_plan(text: str, tools: List[str]) -> List[Step]:
+    """
+    The steps of a plan in the model's reply, in an order where every step comes after
+    the ones it depends on. Raises PlanError for anything that cannot be run.
+    """
+    text = text.strip()
+    # models like to wrap JSON in a code fence
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise PlanError(f"Plan is not JSON: {e}")
+    raw_steps = data.get("steps") if isinstance(data, dict) else None
+    if not isinstance(raw_steps, list):
+        raise PlanError("Plan has no list of steps.")
+    if len(raw_steps) > MAX_PLAN_STEPS:
+        raise PlanError(f"Plan has {len(raw_steps)} steps, more than {MAX_PLAN_STEPS}.")
+
+    steps: Dict[str, Step] = {}
+    for number, raw in enumerate(raw_steps):
+        if not isinstance(raw, dict):
+            raise PlanError(f"Step {number} is not an object.")
+        step_id = str(raw.get("id") or f"s{number + 1}")
+        tool = raw.get("tool")
+        args = raw.get("args") or {}
+        if step_id in steps:
+            raise PlanError(f"Step id {step_id} is used twice.")
+        if tool not in tools:
+            raise PlanError(f"Step {step_id} calls unknown tool {tool!r}.")
+        if not isinstance(args, dict):
+            raise PlanError(f"Step {step_id} has arguments that are not an object.")
+        depends_on = list(dict.fromkeys([str(d) for d in raw.get("depends_on") or []] + references(args)))
+        steps[step_id] = Step(step_id, tool, args, depends_on)
+
+    for step in steps.values():
+        unknown = [d for d in step.depends_on if d not in steps]
+        if unknown:
+            raise PlanError(f"Step {step.id} depends on unknown steps {', '.join(unknown)}.")
+
+    ordered: List[Step] = []
+    placed = set()
+    while len(ordered) < len(steps):
+        ready = [s for s in steps.values() if s.id not in placed and all(d in placed for d in s.depends_on)]
+        if not ready:
+            raise PlanError("Plan has a dependency cycle.")
+        ordered += ready
+        placed.update(s.id for s in ready)
+    return ordered
+
+def pick(value: Any, path: List[str]) -> Any:
+    """The part of a step's output a reference path names."""
+    if not path:
+        return value
+    key, rest = path[0], path[1:]
+    if key == "*":
+        if not isinstance(value, list):
+            raise PlanError(f"Cannot take every item of a {type(value).__name__}.")
+        return [pick(item, rest) for item in value]
+    if isinstance(value, list):
+        try:
+            return pick(value[int(key)], rest)
+        except (ValueError, IndexError):
+            raise PlanError(f"No item {key} in a list of {len(value)}.")
+    if isinstance(value, dict):
+        if key not in value:
+            raise PlanError(f"No field {key!r} in the output.")
+        return pick(value[key], rest)
+    raise PlanError(f"Cannot pick {key!r} from a {type(value).__name__}.")
+
+def resolve_args(value: Any, outputs: Dict[str, Any]) -> Any:
+    """Arguments with every reference replaced by the output it names."""
+    if isinstance(value, str):
+        match = REFERENCE.match(value)
+        if match is None:
+            return value
+        path = [key for key in match.group(2).split(".") if key]
+        return pick(outputs[match.group(1)], path)
+    if isinstance(value, dict):
+        return {key: resolve_args(item, outputs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_args(item, outputs) for item in value]
+    return value
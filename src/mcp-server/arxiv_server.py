@@ -1,16 +1,96 @@
 import arxiv
+import asyncio
 import json
 import os
+import sys
+import threading
 from typing import List
-from mcp.server.fastmcp import FastMCP
+from urllib.parse import urlsplit
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import ToolAnnotations
+from paper_store import PaperStore
+from rate_limit import limiter
+import tracing
 
-PAPER_DIR = "arxiv_papers"
+ARXIV_API_URL = os.environ.get("ARXIV_API_URL", "https://export.arxiv.org/api/query")
+ARXIV_HOST = urlsplit(ARXIV_API_URL).hostname
+MAX_BATCH_TOPICS = 10
+
+store = PaperStore()
+# saves still running in the background
+saves = set()
+# one arxiv client per worker thread, kept open so its connections are reused
+clients = threading.local()
 
 # Initialize FastMCP server
 mcp = FastMCP("arxiv_paper")
+tracing.expose(mcp)
+
+class PacedClient(arxiv.Client):
+    """
+    An arxiv.Client whose every page request, retries included, waits for the shared
+    rate limit (3 s between requests to arXiv) instead of keeping its own delay.
 
-@mcp.tool()
-def search_papers(topic: str, max_results: int = 5) -> List[str]:
+    arxiv.Client is not thread-safe, so each thread has its own; see get_client.
+    """
+    def __init__(self, **options):
+        super().__init__(delay_seconds=0, **options)
+        self.query_url_format = ARXIV_API_URL + "?{}"
+
+    def _parse_feed(self, url: str, first_page: bool = True, _try_index: int = 0):
+        limiter.wait_sync(ARXIV_HOST)
+        return super()._parse_feed(url, first_page, _try_index)
+
+def get_client() -> PacedClient:
+    """This thread's client, created on first use and kept for later searches."""
+    client = getattr(clients, "client", None)
+    if client is None:
+        client = clients.client = PacedClient()
+    return client
+
+def fetch_topic(topic: str, max_results: int) -> dict:
+    """Fetch the most relevant papers on a topic from arXiv, as {paper_id: paper_info}."""
+    # Search for the most relevant articles matching the queried topic
+    search = arxiv.Search(
+        query = topic,
+        max_results = max_results,
+        sort_by = arxiv.SortCriterion.Relevance
+    )
+
+    papers = get_client().results(search)
+    
+    # Process each paper and add to papers_info  
+    papers_info = {}
+    with tracing.span("upstream_request_seconds", upstream="export.arxiv.org"):
+        for paper in papers:
+            paper_info = {
+                'title': paper.title,
+                'authors': [author.name for author in paper.authors],
+                'summary': paper.summary,
+                'pdf_url': paper.pdf_url,
+                'published': str(paper.published.date())
+            }
+            papers_info[paper.get_short_id()] = paper_info
+    return papers_info
+
+def save_in_background(topic: str, papers_info: dict) -> None:
+    """Save papers and link them to this topic in one transaction, after the tool has answered."""
+    task = asyncio.create_task(asyncio.to_thread(store.save_papers, topic, papers_info))
+    saves.add(task)
+    task.add_done_callback(saves.discard)
+    task.add_done_callback(report_save)
+
+def report_save(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Saving papers failed: {task.exception()!r}", file=sys.stderr)
+
+async def flush_saves() -> None:
+    """Wait for pending saves, so reads see every paper already returned."""
+    if saves:
+        await asyncio.gather(*list(saves), return_exceptions=True)
+
+@mcp.tool(annotations=ToolAnnotations(idempotentHint=True))
+async def search_papers(topic: str, max_results: int = 5) -> List[str]:
     """
     Search for papers on arXiv based on a topic and store their information.
     
@@ -21,57 +101,51 @@ def search_papers(topic: str, max_results: int = 5) -> List[str]:
     Returns:
         List of paper IDs found in the search
     """
+    papers_info = await asyncio.to_thread(fetch_topic, topic, max_results)
+    save_in_background(topic, papers_info)
     
-    # Use arxiv to find the papers 
-    client = arxiv.Client()
-
-    # Search for the most relevant articles matching the queried topic
-    search = arxiv.Search(
-        query = topic,
-        max_results = max_results,
-        sort_by = arxiv.SortCriterion.Relevance
-    )
-
-    papers = client.results(search)
+    print(f"Saving results to: {store.path}", file=sys.stderr)
     
-    # Create directory for this topic
-    path = os.path.join(PAPER_DIR, topic.lower().replace(" ", "_"))
-    os.makedirs(path, exist_ok=True)
+    return list(papers_info)
+
+@mcp.tool(annotations=ToolAnnotations(idempotentHint=True))
+async def search_papers_batch(topics: List[str], max_results: int = 5, ctx: Context = None) -> List[dict]:
+    """
+    Search arXiv for several topics at once and store the papers found. Prefer this
+    over calling search_papers per topic; each topic's ids are reported as progress
+    as soon as they arrive.
     
-    file_path = os.path.join(path, "papers_info.json")
+    Args:
+        topics: The topics to search for (at most 10 per call)
+        max_results: Maximum number of results to retrieve per topic (default: 5)
+        
+    Returns:
+        A list with one entry per topic, in the order given, with the topic and its
+        paper_ids. Topics whose search failed have an "error" field instead.
+    """
+    topics = list(dict.fromkeys(topics))[:MAX_BATCH_TOPICS]
+    results = {}
 
-    # Try to load existing papers info
-    try:
-        with open(file_path, "r") as json_file:
-            papers_info = json.load(json_file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        papers_info = {}
+    async def fetch(topic: str) -> str:
+        try:
+            papers_info = await asyncio.to_thread(fetch_topic, topic, max_results)
+        except Exception as e:
+            results[topic] = {"topic": topic, "error": str(e)}
+            return f"{topic}: search failed"
+        save_in_background(topic, papers_info)
+        results[topic] = {"topic": topic, "paper_ids": list(papers_info)}
+        return f"{topic}: {', '.join(papers_info) or 'no papers'}"
 
-    # Process each paper and add to papers_info  
-    paper_ids = []
-    for paper in papers:
-        paper_ids.append(paper.get_short_id())
-        paper_info = {
-            'title': paper.title,
-            'authors': [author.name for author in paper.authors],
-            'summary': paper.summary,
-            'pdf_url': paper.pdf_url,
-            'published': str(paper.published.date())
-        }
-        papers_info[paper.get_short_id()] = paper_info
-    
-    # Save updated papers_info to json file
-    with open(file_path, "w") as json_file:
-        json.dump(papers_info, json_file, indent=2)
-    
-    print(f"Results are saved in: {file_path}")
-    
-    return paper_ids
-
-@mcp.tool()
-def extract_info(paper_id: str) -> str:
+    for finished in asyncio.as_completed([fetch(topic) for topic in topics]):
+        message = await finished
+        if ctx is not None:
+            await ctx.report_progress(len(results), len(topics), message)
+    return [results[topic] for topic in topics]
+
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+async def extract_info(paper_id: str) -> str:
     """
-    Search for information about a specific paper across all topic directories.
+    Search for information about a specific paper across all saved topics.
     
     Args:
         paper_id: The ID of the paper to look for
@@ -79,40 +153,39 @@ def extract_info(paper_id: str) -> str:
     Returns:
         JSON string with paper information if found, error message if not found
     """
- 
-    for item in os.listdir(PAPER_DIR):
-        item_path = os.path.join(PAPER_DIR, item)
-        if os.path.isdir(item_path):
-            file_path = os.path.join(item_path, "papers_info.json")
-            if os.path.isfile(file_path):
-                try:
-                    with open(file_path, "r") as json_file:
-                        papers_info = json.load(json_file)
-                        if paper_id in papers_info:
-                            return json.dumps(papers_info[paper_id], indent=2)
-                except (FileNotFoundError, json.JSONDecodeError) as e:
-                    print(f"Error reading {file_path}: {str(e)}")
-                    continue
+    await flush_saves()
+    paper_info = store.get_paper(paper_id)
+    if paper_info is not None:
+        return json.dumps(paper_info, indent=2)
     
     return f"There's no saved information related to paper {paper_id}."
 
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+async def search_local_papers(query: str, max_results: int = 10, topic: str = None) -> List[dict]:
+    """
+    Full-text search over papers already saved by search_papers, without calling arXiv.
+    
+    Args:
+        query: Free-text query matched against title, authors and summary
+        max_results: Maximum number of results to return (default: 10)
+        topic: Only search papers saved under this topic (optional)
+        
+    Returns:
+        List of matching papers ranked by relevance (BM25), each with paper_id, title,
+        authors, published date, score and a summary snippet
+    """
+    await flush_saves()
+    return store.search(query, max_results=max_results, topic=topic)
+
 @mcp.resource("papers://folders")
-def get_available_folders() -> str:
+async def get_available_folders() -> str:
     """
     List all available topic folders in the papers directory.
     
     This resource provides a simple list of all available topic folders.
     """
-    folders = []
-    
-    # Get all topic directories
-    if os.path.exists(PAPER_DIR):
-        for topic_dir in os.listdir(PAPER_DIR):
-            topic_path = os.path.join(PAPER_DIR, topic_dir)
-            if os.path.isdir(topic_path):
-                papers_file = os.path.join(topic_path, "papers_info.json")
-                if os.path.exists(papers_file):
-                    folders.append(topic_dir)
+    await flush_saves()
+    folders = store.list_topics()
     
     # Create a simple markdown list
     content = "# Available Topics\n\n"
@@ -126,39 +199,33 @@ def get_available_folders() -> str:
     return content
 
 @mcp.resource("papers://{topic}")
-def get_topic_papers(topic: str) -> str:
+async def get_topic_papers(topic: str) -> str:
     """
     Get detailed information about papers on a specific topic.
     
     Args:
         topic: The research topic to retrieve papers for
     """
-    topic_dir = topic.lower().replace(" ", "_")
-    papers_file = os.path.join(PAPER_DIR, topic_dir, "papers_info.json")
+    await flush_saves()
+    papers_data = store.get_topic_papers(topic)
     
-    if not os.path.exists(papers_file):
+    if not papers_data:
         return f"# No papers found for topic: {topic}\n\nTry searching for papers on this topic first."
     
-    try:
-        with open(papers_file, 'r') as f:
-            papers_data = json.load(f)
-        
-        # Create markdown content with paper details
-        content = f"# Papers on {topic.replace('_', ' ').title()}\n\n"
-        content += f"Total papers: {len(papers_data)}\n\n"
-        
-        for paper_id, paper_info in papers_data.items():
-            content += f"## {paper_info['title']}\n"
-            content += f"- **Paper ID**: {paper_id}\n"
-            content += f"- **Authors**: {', '.join(paper_info['authors'])}\n"
-            content += f"- **Published**: {paper_info['published']}\n"
-            content += f"- **PDF URL**: [{paper_info['pdf_url']}]({paper_info['pdf_url']})\n\n"
-            content += f"### Summary\n{paper_info['summary'][:500]}...\n\n"
-            content += "---\n\n"
-        
-        return content
-    except json.JSONDecodeError:
-        return f"# Error reading papers data for {topic}\n\nThe papers data file is corrupted."
+    # Create markdown content with paper details
+    content = f"# Papers on {topic.replace('_', ' ').title()}\n\n"
+    content += f"Total papers: {len(papers_data)}\n\n"
+    
+    for paper_id, paper_info in papers_data.items():
+        content += f"## {paper_info['title']}\n"
+        content += f"- **Paper ID**: {paper_id}\n"
+        content += f"- **Authors**: {', '.join(paper_info['authors'])}\n"
+        content += f"- **Published**: {paper_info['published']}\n"
+        content += f"- **PDF URL**: [{paper_info['pdf_url']}]({paper_info['pdf_url']})\n\n"
+        content += f"### Summary\n{paper_info['summary'][:500]}...\n\n"
+        content += "---\n\n"
+    
+    return content
     
 @mcp.prompt()
 def generate_search_prompt(topic: str, num_papers: int = 5) -> str:
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlsplit
+import httpx
+from rate_limit import limiter
+import tracing
+
+TIMEOUT = float(os.environ.get("MCP_HTTP_TIMEOUT", "20"))
+MAX_RETRIES = int(os.environ.get("MCP_HTTP_RETRIES", "3"))
+# full-jitter exponential backoff: attempt n sleeps uniformly in [0, min(cap, base * 2**n)]
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+# never honour a Retry-After longer than this; the tool call would time out anyway
+MAX_RETRY_AFTER = 30.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+# httpx logs every request at INFO, which floods the servers' stderr under FastMCP's logging setup
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+def get_client() -> httpx.AsyncClient:
+    """The process-wide client, so connections to each upstream API are kept alive and reused."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60),
+            headers={"User-Agent": "ai-agent-mcp/1.0"},
+            follow_redirects=True,
+        )
+    return _client
+
+def backoff(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), if any."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+async def get(url: str, params: Optional[dict] = None, retries: int = MAX_RETRIES) -> httpx.Response:
+    """
+    GET with timeouts and retries.
+
+    Transport errors and 429/5xx responses are retried with jittered exponential
+    backoff, waiting for Retry-After instead when the server sends it. The last
+    response is returned as-is so callers keep handling status codes themselves.
+    Every attempt first waits for the upstream's rate limit (see rate_limit.py).
+    """
+    client = get_client()
+    with tracing.span("upstream_request_seconds", upstream=urlsplit(url).netloc):
+        return await _get_with_retries(client, url, params, retries)
+
+async def _get_with_retries(client: httpx.AsyncClient, url: str, params: Optional[dict], retries: int) -> httpx.Response:
+    host = urlsplit(url).hostname
+    for attempt in range(retries + 1):
+        await limiter.wait(host)
+        try:
+            response = await client.get(url, params=params)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            delay = backoff(attempt)
+        else:
+            if response.status_code not in RETRY_STATUS or attempt == retries:
+                return response
+            delay = retry_after(response)
+            if delay is None:
+                delay = backoff(attempt)
+            # on 429, slow down every worker calling this upstream, not just this request;
+            # the next attempt then waits in limiter.wait() instead
+            if response.status_code == 429 and await limiter.throttle_async(host, delay):
+                continue
+        await asyncio.sleep(delay)
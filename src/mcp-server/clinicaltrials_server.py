@@ -1,10 +1,33 @@
-import requests
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import AsyncIterator, List, Optional
+import async_http
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import ToolAnnotations
+from response_cache import cache
+from trial_store import TrialStore
+import tracing
+
+CLINICALTRIALS_URL = os.environ.get("CLINICALTRIALS_URL", "https://clinicaltrials.gov/api/v2/studies")
+# studies per page when harvesting (the API allows up to 1000)
+HARVEST_PAGE_SIZE = int(os.environ.get("CLINICALTRIALS_PAGE_SIZE", "1000"))
+# only the modules the trial store keeps are requested
+HARVEST_FIELDS = ",".join(f"protocolSection.{module}" for module in (
+    "identificationModule", "statusModule", "sponsorCollaboratorsModule",
+    "conditionsModule", "designModule", "armsInterventionsModule",
+))
+
+store = TrialStore()
 
 mcp = FastMCP("ClinicalTrials")
+tracing.expose(mcp)
 
-@mcp.tool()
-def search_clinical_trials(
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+@cache.cached()
+async def search_clinical_trials(
     cond: str = None, 
     intr: str = None,
     ids: str = None,
@@ -23,7 +46,7 @@ def search_clinical_trials(
     """
     
     # Define the API endpoint and parameters
-    url = "https://clinicaltrials.gov/api/v2/studies"
+    url = CLINICALTRIALS_URL
     params = {}
     if cond:
         params["query.cond"] = cond
@@ -33,14 +56,161 @@ def search_clinical_trials(
         params["query.id"] = ids
     params["pageSize"] = max_results
 
-    response = requests.get(url, params=params)
-    print("Final URL:", response.url) 
+    response = await async_http.get(url, params=params)
+    print("Final URL:", response.url, file=sys.stderr)
     if response.status_code == 200:
         data = response.json()
         return data
     else:
         return {"error": f"Failed to fetch data: {response.status_code}"}
 
+async def iter_pages(params: dict, limit: Optional[int] = None) -> AsyncIterator[dict]:
+    """
+    Yield the pages of a study search one at a time, following nextPageToken. With
+    `limit`, the last page is requested smaller so that no more studies than that are
+    fetched, and each page still ends where its nextPageToken resumes.
+    """
+    params = dict(params)
+    page_size = int(params.get("pageSize", 10))
+    fetched = 0
+    while limit is None or fetched < limit:
+        if limit is not None:
+            params["pageSize"] = min(page_size, limit - fetched)
+        response = await async_http.get(CLINICALTRIALS_URL, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to fetch data: {response.status_code}")
+        page = response.json()
+        yield page
+        fetched += len(page.get("studies", []))
+        if not page.get("nextPageToken"):
+            return
+        params["pageToken"] = page["nextPageToken"]
+
+@mcp.tool(annotations=ToolAnnotations(idempotentHint=True))
+async def harvest_clinical_trials(
+    cond: str = None,
+    intr: str = None,
+    term: str = None,
+    max_studies: int = 5000,
+    refresh: bool = False,
+    ctx: Context = None) -> dict:
+    """
+    Download every study matching a search into the local trial store, page by page,
+    so that query_clinical_trials can count and group them. Use this before questions
+    such as "how many phase 3 trials for a condition, by sponsor".
+    
+    Args:
+        cond: conditions or disease to search for
+        intr: intervention or treatment to search for
+        term: other search terms
+        max_studies: Stop after this many studies; calling again with the same
+            search continues where this one stopped (default: 5000)
+        refresh: Harvest again even if this search was already harvested completely (default: False)
+        
+    Returns:
+        Dictionary with the studies stored, the total the API reports for the search,
+        whether the harvest is complete, and the pages fetched by this call
+    """
+    search = {key: value for key, value in (("cond", cond), ("intr", intr), ("term", term)) if value}
+    if not search:
+        return {"error": "Give at least one of cond, intr or term."}
+    query = json.dumps(search, sort_keys=True)
+    harvest = await asyncio.to_thread(store.get_harvest, query)
+    if harvest and harvest["next_page_token"] is None and not refresh:
+        return {"studies": harvest["studies"], "total": harvest["total"], "complete": True, "pages_fetched": 0}
+
+    params = {f"query.{key}": value for key, value in search.items()}
+    params.update(pageSize=HARVEST_PAGE_SIZE, countTotal="true", fields=HARVEST_FIELDS)
+    resuming = bool(harvest and harvest["next_page_token"] and not refresh)
+    if resuming:
+        params["pageToken"] = harvest["next_page_token"]
+    already = harvest["studies"] if resuming else 0
+    done = already
+    total = harvest["total"] if resuming else None
+    pages = 0
+    saving = None
+    start = time.perf_counter()
+    try:
+        async for page in iter_pages(params, max(1, max_studies)):
+            total = page.get("totalCount", total)
+            studies = page.get("studies", [])
+            # the page is written while the next one is fetched
+            if saving is not None:
+                await saving
+            saving = asyncio.create_task(asyncio.to_thread(
+                store.save_page, query, studies, page.get("nextPageToken"), total, pages == 0 and not resuming
+            ))
+            pages += 1
+            done += len(studies)
+            if ctx is not None:
+                await ctx.report_progress(done, total, f"{done} studies harvested")
+        if saving is not None:
+            await saving
+    except Exception as e:
+        if saving is not None:
+            await asyncio.gather(saving, return_exceptions=True)
+        return {"error": f"Harvest stopped after {done} studies: {e}", "pages_fetched": pages}
+
+    harvest = await asyncio.to_thread(store.get_harvest, query)
+    # stdout carries the MCP messages
+    print(f"Harvested {pages} pages for {query} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return {
+        "studies": harvest["studies"],
+        "total": harvest["total"],
+        "complete": harvest["next_page_token"] is None,
+        "pages_fetched": pages,
+    }
+
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+async def query_clinical_trials(
+    group_by: List[str] = None,
+    cond: str = None,
+    intr: str = None,
+    phase: str = None,
+    status: str = None,
+    sponsor: str = None,
+    max_groups: int = 25) -> dict:
+    """
+    Count harvested studies, optionally grouped, without calling ClinicalTrials.gov.
+    Only studies stored by harvest_clinical_trials are counted.
+    
+    Args:
+        group_by: Fields to group the counts by, any of phase, condition, intervention,
+            intervention_type, status, sponsor, sponsor_class, study_type, start_year
+        cond: Only studies with a condition containing this text
+        intr: Only studies with an intervention containing this text
+        phase: Only studies in this phase, e.g. "phase 3" or "PHASE3"
+        status: Only studies with this overall status, e.g. "recruiting" or "COMPLETED"
+        sponsor: Only studies whose lead sponsor contains this text
+        max_groups: Maximum number of groups to return, largest first (default: 25)
+        
+    Returns:
+        Dictionary with the total number of matching studies and, when grouping,
+        the largest groups with their counts
+    """
+    try:
+        result = await asyncio.to_thread(
+            store.aggregate, group_by, cond=cond, intr=intr, phase=phase, status=status,
+            sponsor=sponsor, max_groups=max_groups
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+    # what the counts cover, most recent harvests first
+    result["harvests"] = (await asyncio.to_thread(store.list_harvests))[:10]
+    if not result["harvests"]:
+        result["note"] = "Nothing has been harvested yet; call harvest_clinical_trials first."
+    return result
+
+@mcp.resource("trials://harvests")
+def get_harvests() -> str:
+    """Searches harvested into the local trial store and the size of the store."""
+    return json.dumps({"harvests": store.list_harvests(), "rows": store.stats()}, indent=2)
+
+@mcp.resource("cache://stats")
+def get_cache_stats() -> str:
+    """Hit/miss counters and size of the response cache."""
+    return json.dumps(cache.stats(), indent=2)
+
 if __name__ == "__main__":
     # Initialize and run the server
     mcp.run(transport='stdio')
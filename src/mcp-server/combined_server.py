@@ -0,0 +1,198 @@
+"""
+One MCP server for the arXiv, OpenFDA, ClinicalTrials and PDB tools.
+
+Each module is imported the first time one of its tools, resources or prompts is
+used, so a host that only ever searches drug labels never loads arxiv or rcsbapi
+(whose import fetches both RCSB schemas). Until then its declarations are listed
+from a manifest written the last time the module was imported, which is refreshed
+when the module's source changes.
+
+Run it over stdio like the single servers, or let the host connect to `mcp`
+in-process (the "inProcess" option of server_config.json).
+"""
+import asyncio
+import importlib
+import importlib.util
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterable, List, Optional
+from mcp import types
+from mcp.server.fastmcp import FastMCP
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from response_cache import cache
+import tracing
+
+# the servers mounted here, by module name
+MODULES = ["arxiv_server", "openfda_server", "clinicaltrials_server", "pdb_server"]
+# declarations of each module, so they can be listed without importing it
+MANIFEST_PATH = os.environ.get("MCP_COMBINED_MANIFEST", os.path.join("mcp_cache", "combined_manifest.json"))
+# every module serves these for the whole process; the combined server serves them once
+SHARED_RESOURCES = ("cache://stats", tracing.METRICS_RESOURCE)
+
+def source_signature(module: str) -> list:
+    """Modification time and size of a module's source, to tell when its manifest entry is stale."""
+    stat = os.stat(importlib.util.find_spec(module).origin)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def template_pattern(uri_template: str) -> re.Pattern:
+    """A regex matching the URIs of a resource template such as papers://{topic}."""
+    parts = re.split(r"\{[^}]+\}", uri_template)
+    return re.compile("[^/]+".join(re.escape(part) for part in parts) + "$")
+
+def in_thread(fn):
+    """An async version of a sync tool function that runs it in a worker thread."""
+    async def run(**kwargs):
+        return await asyncio.to_thread(fn, **kwargs)
+    return run
+
+class CombinedServer(FastMCP):
+    """A FastMCP server that forwards each request to the module providing the tool, resource or prompt."""
+    def __init__(self, name: str, modules: List[str], manifest_path: str = MANIFEST_PATH):
+        super().__init__(name)
+        self.modules = modules
+        self.manifest_path = manifest_path
+        self.manifest: Optional[Dict[str, dict]] = None # checked against the sources on first use
+        self.loaded: Dict[str, FastMCP] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._checking: Optional[asyncio.Task] = None
+
+    async def load(self, module: str) -> FastMCP:
+        """Import a module (once, in a worker thread) and return its FastMCP server."""
+        if module in self.loaded:
+            return self.loaded[module]
+        if module not in self._loading:
+            self._loading[module] = asyncio.create_task(asyncio.to_thread(self._import, module))
+        try:
+            server = await asyncio.shield(self._loading[module])
+        except Exception:
+            self._loading.pop(module, None)
+            raise
+        self.loaded[module] = server
+        return server
+
+    def _import(self, module: str) -> FastMCP:
+        with tracing.span("module_import_seconds", module=module):
+            server = importlib.import_module(module).mcp
+        # A sync tool would hold up the calls to every other module (and, in-process,
+        # the host's event loop), so those run in worker threads here.
+        for tool in server._tool_manager.list_tools():
+            if not tool.is_async:
+                tool.fn = in_thread(tool.fn)
+                tool.is_async = True
+        return server
+
+    async def declarations(self) -> Dict[str, dict]:
+        """Every module's declarations, importing the modules whose manifest entry is missing or stale."""
+        if self.manifest is None:
+            if self._checking is None:
+                self._checking = asyncio.create_task(self._check_manifest())
+            await asyncio.shield(self._checking)
+        return self.manifest
+
+    async def _check_manifest(self) -> None:
+        try:
+            with open(self.manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            manifest = {}
+        stale = [m for m in self.modules if manifest.get(m, {}).get("signature") != source_signature(m)]
+        entries = await asyncio.gather(*(self.describe(module) for module in stale), return_exceptions=True)
+        for module, entry in zip(stale, entries):
+            if isinstance(entry, Exception):
+                # like a single server that fails to start, its tools are left out
+                print(f"Failed to load {module}: {entry!r}", file=sys.stderr)
+                manifest.pop(module, None)
+            else:
+                manifest[module] = entry
+        if stale:
+            self.save_manifest(manifest)
+        self.manifest = {m: manifest[m] for m in self.modules if m in manifest}
+
+    async def describe(self, module: str) -> dict:
+        """Import a module and record its declarations for the manifest."""
+        server = await self.load(module)
+        return {
+            "signature": source_signature(module),
+            "tools": [t.model_dump(mode="json") for t in await server.list_tools()],
+            "resources": [
+                r.model_dump(mode="json") for r in await server.list_resources() if str(r.uri) not in SHARED_RESOURCES
+            ],
+            "templates": [t.model_dump(mode="json") for t in await server.list_resource_templates()],
+            "prompts": [p.model_dump(mode="json") for p in await server.list_prompts()],
+        }
+
+    def save_manifest(self, manifest: Dict[str, dict]) -> None:
+        try:
+            if os.path.dirname(self.manifest_path):
+                os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            with open(self.manifest_path, "w") as file:
+                json.dump(manifest, file, indent=2)
+        except OSError as e:
+            print(f"Could not write manifest {self.manifest_path}: {e}", file=sys.stderr)
+
+    async def owner(self, kind: str, match) -> Optional[str]:
+        """The module with a declaration of `kind` for which `match` is true."""
+        for module, entry in (await self.declarations()).items():
+            if any(match(declaration) for declaration in entry[kind]):
+                return module
+        return None
+
+    async def list_tools(self) -> List[types.Tool]:
+        entries = (await self.declarations()).values()
+        return [types.Tool.model_validate(t) for entry in entries for t in entry["tools"]]
+
+    async def call_tool(self, name: str, arguments: dict):
+        module = await self.owner("tools", lambda t: t["name"] == name)
+        if module is None:
+            return await super().call_tool(name, arguments)
+        server = await self.load(module)
+        return await server.call_tool(name, arguments)
+
+    async def list_resources(self) -> List[types.Resource]:
+        entries = (await self.declarations()).values()
+        own = await super().list_resources()
+        return own + [types.Resource.model_validate(r) for entry in entries for r in entry["resources"]]
+
+    async def list_resource_templates(self) -> List[types.ResourceTemplate]:
+        entries = (await self.declarations()).values()
+        return [types.ResourceTemplate.model_validate(t) for entry in entries for t in entry["templates"]]
+
+    async def read_resource(self, uri) -> Iterable[ReadResourceContents]:
+        uri = str(uri)
+        module = await self.owner("resources", lambda r: r["uri"] == uri)
+        if module is None and uri not in SHARED_RESOURCES:
+            module = await self.owner("templates", lambda t: template_pattern(t["uriTemplate"]).match(uri))
+        if module is None:
+            return await super().read_resource(uri)
+        server = await self.load(module)
+        return await server.read_resource(uri)
+
+    async def list_prompts(self) -> List[types.Prompt]:
+        entries = (await self.declarations()).values()
+        return [types.Prompt.model_validate(p) for entry in entries for p in entry["prompts"]]
+
+    async def get_prompt(self, name: str, arguments: Optional[dict] = None) -> types.GetPromptResult:
+        module = await self.owner("prompts", lambda p: p["name"] == name)
+        if module is None:
+            raise ValueError(f"Unknown prompt: {name}")
+        server = await self.load(module)
+        return await server.get_prompt(name, arguments)
+
+mcp = CombinedServer("combined", MODULES)
+tracing.expose(mcp)
+
+@mcp.resource("cache://stats")
+def get_cache_stats() -> str:
+    """Hit/miss counters and size of the response cache."""
+    return json.dumps(cache.stats(), indent=2)
+
+@mcp.resource("modules://loaded")
+def get_loaded_modules() -> str:
+    """The mounted server modules and which of them have been imported so far."""
+    return json.dumps({"modules": mcp.modules, "loaded": list(mcp.loaded)}, indent=2)
+
+if __name__ == "__main__":
+    # Initialize and run the server
+    mcp.run(transport='stdio')
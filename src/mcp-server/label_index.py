@@ -0,0 +1,180 @@
+"""
+Local index of openFDA drug labels, built from the bulk downloads at
+https://open.fda.gov/apis/drug/label/download/ (drug-label-*-of-*.json.zip).
+
+The index directory holds three files:
+
+    records.jsonl  one label per line, compact JSON
+    names.txt      every brand, generic and substance name, case-folded, sorted
+    postings.bin   (offset, length) of each name's label in records.jsonl, as uint64
+
+Each name points at a single label: a brand name match beats a generic name,
+which beats a substance name, and among equals the most recent label wins. Only
+labels some name points at are written, so the records file is a fraction of the
+dumps. records.jsonl is memory-mapped, so a lookup is a bisect over the names and
+one json.loads of a slice.
+
+Build it with:
+    python3 src/mcp-server/label_index.py <dump files or directory> [index_dir]
+"""
+import bisect
+import difflib
+import json
+import mmap
+import os
+import re
+import sys
+import time
+import zipfile
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LABEL_INDEX_DIR = os.environ.get("OPENFDA_LABEL_INDEX", "openfda_labels")
+# openfda fields indexed, in order of preference when two labels share a name
+NAME_FIELDS = ("brand_name", "generic_name", "substance_name")
+# difflib similarity ratio a misspelled name needs to match
+FUZZY_CUTOFF = 0.8
+
+def normalize(name: str) -> str:
+    return re.sub(r"\s+", " ", name).strip().casefold()
+
+def iter_dump(path: str) -> Iterator[dict]:
+    """The labels in one bulk file, zipped as downloaded or unpacked."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                if member.endswith(".json"):
+                    with archive.open(member) as file:
+                        yield from json.load(file).get("results", [])
+    else:
+        with open(path, "rb") as file:
+            data = json.load(file)
+        yield from data.get("results", []) if isinstance(data, dict) else data
+
+def dump_files(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith((".json", ".json.zip"))
+            )
+        else:
+            files.append(path)
+    return files
+
+def build(paths: List[str], index_dir: str = LABEL_INDEX_DIR) -> Dict[str, int]:
+    """Build the index from bulk label files in two passes: pick a label per name, then write them."""
+    files = dump_files(paths)
+    # name -> (field rank, -effective_time, (file number, position)); smallest wins
+    best: Dict[str, Tuple[int, int, Tuple[int, int]]] = {}
+    labels = 0
+    for file_number, path in enumerate(files):
+        for position, label in enumerate(iter_dump(path)):
+            labels += 1
+            newest = -int(label.get("effective_time") or 0)
+            for rank, field in enumerate(NAME_FIELDS):
+                for name in label.get("openfda", {}).get(field, []):
+                    key = normalize(name)
+                    candidate = (rank, newest, (file_number, position))
+                    if key and (key not in best or candidate < best[key]):
+                        best[key] = candidate
+
+    winners: Dict[Tuple[int, int], List[str]] = {}
+    for key, (_, _, where) in best.items():
+        winners.setdefault(where, []).append(key)
+
+    os.makedirs(index_dir, exist_ok=True)
+    postings: Dict[str, Tuple[int, int]] = {}
+    with open(os.path.join(index_dir, "records.jsonl.tmp"), "wb") as records:
+        for file_number, path in enumerate(files):
+            for position, label in enumerate(iter_dump(path)):
+                keys = winners.get((file_number, position))
+                if not keys:
+                    continue
+                data = json.dumps(label, separators=(",", ":")).encode()
+                offset = records.tell()
+                records.write(data + b"\n")
+                for key in keys:
+                    postings[key] = (offset, len(data))
+
+    names = sorted(postings)
+    offsets = array("Q")
+    for name in names:
+        offsets.extend(postings[name])
+    with open(os.path.join(index_dir, "names.txt.tmp"), "w", encoding="utf-8") as file:
+        file.write("\n".join(names))
+    with open(os.path.join(index_dir, "postings.bin.tmp"), "wb") as file:
+        offsets.tofile(file)
+    # swap the files in only once all three are complete
+    for name in ("records.jsonl", "names.txt", "postings.bin"):
+        os.replace(os.path.join(index_dir, name + ".tmp"), os.path.join(index_dir, name))
+    return {"files": len(files), "labels": labels, "names": len(names), "records": len(winners)}
+
+class LabelIndex:
+    """Read side of the index: exact, prefix and fuzzy name lookups against the memory-mapped records."""
+    def __init__(self, index_dir: str = LABEL_INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "names.txt"), "r", encoding="utf-8") as file:
+            self.names = file.read().split("\n")
+        self.postings = array("Q")
+        with open(os.path.join(index_dir, "postings.bin"), "rb") as file:
+            self.postings.frombytes(file.read())
+        self._file = open(os.path.join(index_dir, "records.jsonl"), "rb")
+        self.records = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def open(cls, index_dir: str = LABEL_INDEX_DIR) -> Optional["LabelIndex"]:
+        """The index in index_dir, or None when it has not been built."""
+        records = os.path.join(index_dir, "records.jsonl")
+        if not os.path.exists(os.path.join(index_dir, "postings.bin")) or not os.path.getsize(records):
+            return None
+        return cls(index_dir)
+
+    def _record(self, position: int) -> dict:
+        offset, length = self.postings[2 * position], self.postings[2 * position + 1]
+        return json.loads(self.records[offset:offset + length])
+
+    def get(self, name: str) -> Optional[dict]:
+        """The label for a brand, generic or substance name, ignoring case."""
+        key = normalize(name)
+        position = bisect.bisect_left(self.names, key)
+        if position < len(self.names) and self.names[position] == key:
+            return self._record(position)
+        return None
+
+    def match(self, name: str, max_results: int = 10) -> List[str]:
+        """
+        Indexed names starting with `name`, shortest first, or else the names most
+        like it (e.g. misspellings).
+        """
+        key = normalize(name)
+        if not key:
+            return []
+        start = bisect.bisect_left(self.names, key)
+        end = bisect.bisect_left(self.names, key + "\uffff")
+        if start < end:
+            return sorted(self.names[start:end], key=len)[:max_results]
+        # misspellings rarely start with a different letter; compare within it
+        first = bisect.bisect_left(self.names, key[0])
+        last = bisect.bisect_left(self.names, key[0] + "\uffff")
+        return difflib.get_close_matches(key, self.names[first:last], n=max_results, cutoff=FUZZY_CUTOFF)
+
+    def closest(self, name: str) -> Optional[Tuple[str, dict]]:
+        """The best prefix or fuzzy match for a name and its label."""
+        matches = self.match(name, max_results=1)
+        if not matches:
+            return None
+        return matches[0], self.get(matches[0])
+
+    def close(self) -> None:
+        self.records.close()
+        self._file.close()
+
+if __name__ == "__main__":
+    # python3 src/mcp-server/label_index.py <dump files or directory> [index_dir]
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    start = time.perf_counter()
+    counts = build([sys.argv[1]], sys.argv[2] if len(sys.argv) > 2 else LABEL_INDEX_DIR)
+    print(f"Indexed {counts['names']} names over {counts['records']} of {counts['labels']} labels "
+          f"from {counts['files']} files in {time.perf_counter() - start:.1f}s")
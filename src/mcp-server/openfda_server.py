@@ -1,10 +1,25 @@
-import requests
+import asyncio
+import json
+import os
+from typing import List
+import async_http
+from label_index import LabelIndex
 from mcp.server.fastmcp import FastMCP
+from mcp.types import ToolAnnotations
+from response_cache import cache
+import tracing
+
+OPENFDA_URL = os.environ.get("OPENFDA_URL", "https://api.fda.gov/drug/label.json")
+
+# local index built from the bulk label downloads (see label_index.py); None until one is built
+index = LabelIndex.open()
 
 mcp = FastMCP("openFDA")
+tracing.expose(mcp)
 
-@mcp.tool()
-def search_drug(drug_name: str) -> dict:
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+@cache.cached()
+async def search_drug(drug_name: str) -> dict:
     """
     Search for drug information using the OpenFDA API.
     
@@ -12,36 +27,66 @@ def search_drug(drug_name: str) -> dict:
         drug_name: The name of the drug to search for.
         
     Returns:
-        A dictionary containing the drug information.
+        A dictionary containing the drug information. When only a similar name was
+        found, matched_name says which.
     """
-    
-    url = "https://api.fda.gov/drug/label.json"
-    params = {
-        "search": f"openfda.brand_name:{drug_name}",
-        "limit": 1
-    }
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        if data.get("results"):
-            return data["results"][0]
-        else:
-            return {"error": "No results found."}
-    else:
-        params = {
-            "search": f"openfda.generic_name:{drug_name}",
-            "limit": 1
-        }
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
+    # the local index answers known names without a request
+    if index is not None:
+        with tracing.span("label_index_seconds"):
+            label = index.get(drug_name)
+        if label is not None:
+            return label
+
+    # query the brand name and the generic name at the same time; a brand match wins
+    responses = await asyncio.gather(*(
+        async_http.get(OPENFDA_URL, params={"search": f"openfda.{field}:{drug_name}", "limit": 1})
+        for field in ("brand_name", "generic_name")
+    ), return_exceptions=True)
+
+    for response in responses:
+        if not isinstance(response, Exception) and response.status_code == 200:
             data = response.json()
             if data.get("results"):
                 return data["results"][0]
-            else:
-                return {"error": "No results found."}
-        else:
-            return {"error": f"Request failed with status code {response.status_code}."}
+
+    # a misspelled or partial name may still be close to an indexed one
+    if index is not None:
+        closest = index.closest(drug_name)
+        if closest is not None:
+            name, label = closest
+            return dict(label, matched_name=name)
+
+    # openFDA answers 404 when nothing matches
+    statuses = [r.status_code for r in responses if not isinstance(r, Exception)]
+    if any(status in (200, 404) for status in statuses):
+        return {"error": "No results found."}
+    if statuses:
+        return {"error": f"Request failed with status code {statuses[-1]}."}
+    return {"error": f"Request failed: {responses[-1]}"}
+
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+def match_drug_names(name: str, max_results: int = 10) -> List[str]:
+    """
+    Find drug names in the local label index that start with, or closely resemble,
+    the given text. Use it to correct a misspelled name or complete a partial one
+    before calling search_drug.
     
+    Args:
+        name: The (partial or misspelled) brand, generic or substance name.
+        max_results: Maximum number of names to return (default: 10)
+        
+    Returns:
+        Matching names in lower case, best first; empty when the index has not been built.
+    """
+    if index is None:
+        return []
+    return index.match(name, max_results=max_results)
+
+@mcp.resource("cache://stats")
+def get_cache_stats() -> str:
+    """Hit/miss counters and size of the response cache."""
+    return json.dumps(cache.stats(), indent=2)
+
 if __name__ == "__main__":
     # Initialize and run the server
     mcp.run(transport='stdio')
\ No newline at end of file
@@ -0,0 +1,246 @@
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+PAPER_DIR = "arxiv_papers"
+PAPER_DB = os.path.join(PAPER_DIR, "papers.sqlite")
+
+PAPERS_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    paper_id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    authors TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    pdf_url TEXT,
+    published TEXT
+)"""
+SCHEMA = PAPERS_TABLE.format(name="papers") + """;
+CREATE TABLE IF NOT EXISTS topic_papers (
+    topic TEXT NOT NULL,
+    paper_id TEXT NOT NULL REFERENCES papers (paper_id),
+    added_at INTEGER NOT NULL,
+    PRIMARY KEY (topic, paper_id)
+);
+CREATE INDEX IF NOT EXISTS topic_papers_paper ON topic_papers (paper_id);
+"""
+
+# full-text index over papers, kept in sync by triggers so every save updates it incrementally.
+# It refers to papers by their `id`, which unlike an implicit rowid survives a VACUUM.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title, authors, summary, content='papers', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS papers_fts_insert AFTER INSERT ON papers BEGIN
+    INSERT INTO papers_fts (rowid, title, authors, summary)
+    VALUES (new.id, new.title, new.authors, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_fts_delete AFTER DELETE ON papers BEGIN
+    INSERT INTO papers_fts (papers_fts, rowid, title, authors, summary)
+    VALUES ('delete', old.id, old.title, old.authors, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_fts_update AFTER UPDATE ON papers BEGIN
+    INSERT INTO papers_fts (papers_fts, rowid, title, authors, summary)
+    VALUES ('delete', old.id, old.title, old.authors, old.summary);
+    INSERT INTO papers_fts (rowid, title, authors, summary)
+    VALUES (new.id, new.title, new.authors, new.summary);
+END;
+"""
+# columns copied when a database from before the `id` column is migrated
+PAPER_COLUMNS = "paper_id, title, authors, summary, pdf_url, published"
+# bm25 column weights: a hit in the title counts more than one in the authors or summary
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+def topic_key(topic: str) -> str:
+    """Topics are stored under the same name the old per-topic folders used."""
+    return topic.lower().replace(" ", "_")
+
+class PaperStore:
+    """
+    SQLite store for saved arXiv papers.
+
+    Papers are keyed by their short arXiv id and linked to every topic they were
+    found under. Each write runs in one IMMEDIATE transaction, so concurrent
+    searches (also from other server processes) never leave partial data behind.
+    """
+    def __init__(self, path: str = PAPER_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            is_new = not os.path.exists(self.path)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._add_paper_ids(db)
+            db.executescript(SCHEMA)
+            has_fts = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'papers_fts'"
+            ).fetchone()
+            db.executescript(FTS_SCHEMA)
+            if not has_fts:
+                # databases created before the full-text index get it built once
+                db.execute("INSERT INTO papers_fts (papers_fts) VALUES ('rebuild')")
+            self._db = db
+            if is_new:
+                imported = self.import_json_dir(os.path.dirname(self.path) or ".")
+                if imported:
+                    print(f"Imported {imported} papers from legacy JSON folders into {self.path}", file=sys.stderr)
+        return self._db
+
+    @staticmethod
+    def _add_paper_ids(db: sqlite3.Connection) -> None:
+        """
+        Give a papers table from before the `id` column one, keeping the rows in their
+        order. The full-text index is dropped with the old table and rebuilt by `db`.
+        """
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in db.execute("PRAGMA table_info(papers)")]
+            if columns and "id" not in columns:
+                db.execute("DROP TABLE IF EXISTS papers_fts")
+                db.execute(PAPERS_TABLE.format(name="papers_new"))
+                db.execute(
+                    f"INSERT INTO papers_new ({PAPER_COLUMNS}) SELECT {PAPER_COLUMNS} FROM papers ORDER BY rowid"
+                )
+                # dropped before the rename, so topic_papers keeps referring to "papers"
+                db.execute("DROP TABLE papers")
+                db.execute("ALTER TABLE papers_new RENAME TO papers")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def save_papers(self, topic: str, papers_info: Dict[str, dict]) -> None:
+        """Insert or update papers and link them to a topic in a single transaction."""
+        rows = [
+            (paper_id, info["title"], json.dumps(info["authors"]), info["summary"],
+             info.get("pdf_url"), info.get("published"))
+            for paper_id, info in papers_info.items()
+        ]
+        # added_at keeps the order papers were first found in for a topic
+        now = time.time_ns()
+        links = [(topic_key(topic), paper_id, now + position) for position, paper_id in enumerate(papers_info)]
+        with self._lock:
+            db = self.db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # an upsert (not INSERT OR REPLACE) so the full-text update trigger fires
+                db.executemany(
+                    f"""INSERT INTO papers ({PAPER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (paper_id) DO UPDATE SET
+                           title = excluded.title, authors = excluded.authors,
+                           summary = excluded.summary, pdf_url = excluded.pdf_url,
+                           published = excluded.published""",
+                    rows
+                )
+                db.executemany("INSERT OR IGNORE INTO topic_papers VALUES (?, ?, ?)", links)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def get_paper(self, paper_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT title, authors, summary, pdf_url, published FROM papers WHERE paper_id = ?",
+                (paper_id,)
+            ).fetchone()
+        return self._paper_info(row) if row else None
+
+    def get_topic_papers(self, topic: str) -> Dict[str, dict]:
+        """All papers saved under a topic, in the order they were first found."""
+        with self._lock:
+            rows = self.db.execute(
+                """SELECT p.paper_id, p.title, p.authors, p.summary, p.pdf_url, p.published
+                   FROM topic_papers t JOIN papers p ON p.paper_id = t.paper_id
+                   WHERE t.topic = ? ORDER BY t.added_at""",
+                (topic_key(topic),)
+            ).fetchall()
+        return {row[0]: self._paper_info(row[1:]) for row in rows}
+
+    def search(self, query: str, max_results: int = 10, topic: Optional[str] = None) -> List[dict]:
+        """
+        Rank saved papers against a free-text query with BM25 over title, authors and summary.
+
+        Every word of the query is matched on its own, so papers matching more of
+        them rank higher. FTS syntax in the query is ignored.
+        """
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        sql = f"""SELECT p.paper_id, p.title, p.authors, p.published,
+                         bm25(papers_fts, {', '.join(map(str, BM25_WEIGHTS))}) AS rank,
+                         snippet(papers_fts, 2, '**', '**', '...', 24)
+                  FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid
+                  WHERE papers_fts MATCH ?"""
+        params: list = [match]
+        if topic:
+            sql += " AND p.paper_id IN (SELECT paper_id FROM topic_papers WHERE topic = ?)"
+            params.append(topic_key(topic))
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(max_results)
+        with self._lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [
+            {
+                'paper_id': paper_id,
+                'title': title,
+                'authors': json.loads(authors),
+                'published': published,
+                'score': round(-rank, 4),
+                'snippet': snippet
+            }
+            for paper_id, title, authors, published, rank, snippet in rows
+        ]
+
+    def list_topics(self) -> List[str]:
+        with self._lock:
+            rows = self.db.execute("SELECT DISTINCT topic FROM topic_papers ORDER BY topic").fetchall()
+        return [row[0] for row in rows]
+
+    def import_json_dir(self, paper_dir: str = PAPER_DIR) -> int:
+        """One-time import of legacy `<paper_dir>/<topic>/papers_info.json` files."""
+        imported = 0
+        if not os.path.isdir(paper_dir):
+            return imported
+        for topic in sorted(os.listdir(paper_dir)):
+            file_path = os.path.join(paper_dir, topic, "papers_info.json")
+            if not os.path.isfile(file_path):
+                continue
+            try:
+                with open(file_path, "r") as json_file:
+                    papers_info = json.load(json_file)
+            except json.JSONDecodeError as e:
+                print(f"Skipping {file_path}: {str(e)}", file=sys.stderr)
+                continue
+            self.save_papers(topic, papers_info)
+            imported += len(papers_info)
+        return imported
+
+    @staticmethod
+    def _paper_info(row: Iterable) -> dict:
+        title, authors, summary, pdf_url, published = row
+        return {
+            'title': title,
+            'authors': json.loads(authors),
+            'summary': summary,
+            'pdf_url': pdf_url,
+            'published': published
+        }
+
+if __name__ == "__main__":
+    # python3 src/mcp-server/paper_store.py [paper_dir]
+    source = sys.argv[1] if len(sys.argv) > 1 else PAPER_DIR
+    count = PaperStore().import_json_dir(source)
+    print(f"Imported {count} papers from {source} into {PAPER_DB}")
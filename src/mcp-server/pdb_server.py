@@ -1,25 +1,87 @@
+import asyncio
+import itertools
+import json
+import os
+from typing import List
+from urllib.parse import urlsplit
+from rcsbapi.const import const
+
+# Base URLs of the RCSB Search and Data APIs, e.g. to run against local stubs.
+# rcsbapi keeps its endpoints in a frozen constants object and fetches both API
+# schemas when rcsbapi.search and rcsbapi.data are imported, so the overrides are
+# applied before those imports.
+RCSB_SEARCH_URL = os.environ.get("RCSB_SEARCH_URL")
+RCSB_DATA_URL = os.environ.get("RCSB_DATA_URL")
+if RCSB_SEARCH_URL:
+    for name, path in (
+        ("RCSB_SEARCH_API_QUERY_URL", "/rcsbsearch/v2/query"),
+        ("SEARCH_API_STRUCTURE_ATTRIBUTE_SCHEMA_URL", "/rcsbsearch/v2/metadata/schema"),
+        ("SEARCH_API_CHEMICAL_ATTRIBUTE_SCHEMA_URL", "/rcsbsearch/v2/metadata/chemical/schema"),
+    ):
+        object.__setattr__(const, name, RCSB_SEARCH_URL.rstrip("/") + path)
+if RCSB_DATA_URL:
+    object.__setattr__(const, "DATA_API_ENDPOINT", RCSB_DATA_URL.rstrip("/") + "/graphql")
+
 from rcsbapi.search import TextQuery, SeqSimilarityQuery
 from rcsbapi.data import DataQuery
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import ToolAnnotations
+from response_cache import cache, TOOL_TTLS
+from rate_limit import limiter
+from sequence_index import MIN_SIMILARITY, molecule_type, open_indexes
+import tracing
+
+# rate limit buckets of the two APIs (see rate_limit.py)
+SEARCH_HOST = urlsplit(const.RCSB_SEARCH_API_QUERY_URL).hostname
+DATA_HOST = urlsplit(const.DATA_API_ENDPOINT).hostname
+
+# ids per multi-id DataQuery, and how many of those queries run at once
+BATCH_CHUNK_SIZE = 25
+MAX_CONCURRENT_CHUNKS = 4
+MAX_BATCH_IDS = 200
+# fields kept for each entry by extract_pdb_data_batch
+SUMMARY_FIELDS = [
+    "struct.title",
+    "exptl.method",
+    "rcsb_entry_info.resolution_combined",
+    "rcsb_accession_info.initial_release_date",
+    "polymer_entities.rcsb_polymer_entity.pdbx_description",
+    "polymer_entities.entity_poly.rcsb_entity_polymer_type",
+    "polymer_entities.entity_poly.rcsb_sample_sequence_length",
+]
+# sequences per search_similar_sequences_batch call, and how many are searched at once
+MAX_BATCH_SEQUENCES = 500
+MAX_CONCURRENT_SEQUENCES = 4
+# local k-mer indexes of the PDB sequences (see sequence_index.py), by molecule type;
+# empty until one is built
+sequence_indexes = open_indexes()
 
 mcp = FastMCP("PDB")
+tracing.expose(mcp)
 
-@mcp.tool()
-def search_pdb_ids(query: str) -> list:
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+@cache.cached()
+def search_pdb_ids(query: str, max_results: int = 25, offset: int = 0) -> list:
     """
-    Search for PDB ids using a text query.
+    Search for PDB ids using a text query, one page at a time.
     
     Args:
         query: The search query string.
+        max_results: Maximum number of ids to return (default: 25)
+        offset: Number of matching ids to skip, to fetch later pages (default: 0)
         
     Returns:
         A list containing matched PDB ids.
     """
     tq = TextQuery(value=query)
-    results = tq()
-    return list(results)
+    limiter.wait_sync(SEARCH_HOST)
+    # the session pages lazily, so only the rows up to offset + max_results are requested
+    results = tq(rows=offset + max_results)
+    with tracing.span("upstream_request_seconds", upstream="search.rcsb.org"):
+        return list(itertools.islice(results, offset, offset + max_results))
 
-@mcp.tool()
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+@cache.cached()
 def extract_pdb_data(pdb_id: str) -> dict:
     """
     Extract PDB data for a given PDB id.
@@ -35,17 +97,154 @@ def extract_pdb_data(pdb_id: str) -> dict:
         input_ids=[pdb_id],
         return_data_list=["struct", "exptl", "entity_poly"],
     )
-    results = dq.exec()
+    limiter.wait_sync(DATA_HOST)
+    with tracing.span("upstream_request_seconds", upstream="data.rcsb.org"):
+        results = dq.exec()
     return results
 
-@mcp.tool()
-def search_similar_sequence(
-    sequence: str, 
+def summarize_entry(entry: dict) -> dict:
+    """Flatten one Data API entry into the compact form returned by extract_pdb_data_batch."""
+    info = entry.get("rcsb_entry_info") or {}
+    resolution = info.get("resolution_combined") or []
+    entities = []
+    for entity in entry.get("polymer_entities") or []:
+        poly = entity.get("entity_poly") or {}
+        entities.append({
+            "description": (entity.get("rcsb_polymer_entity") or {}).get("pdbx_description"),
+            "type": poly.get("rcsb_entity_polymer_type"),
+            "length": poly.get("rcsb_sample_sequence_length"),
+        })
+    return {
+        "pdb_id": entry.get("rcsb_id"),
+        "title": (entry.get("struct") or {}).get("title"),
+        "methods": [e.get("method") for e in entry.get("exptl") or []],
+        "resolution": resolution[0] if resolution else None,
+        "released": (entry.get("rcsb_accession_info") or {}).get("initial_release_date"),
+        "entities": entities,
+    }
+
+def fetch_summaries(pdb_ids: List[str]) -> List[dict]:
+    """One multi-id DataQuery for a chunk of ids."""
+    dq = DataQuery(
+        input_type="entry",
+        input_ids=pdb_ids,
+        return_data_list=SUMMARY_FIELDS,
+    )
+    limiter.wait_sync(DATA_HOST)
+    with tracing.span("upstream_request_seconds", upstream="data.rcsb.org"):
+        results = dq.exec()
+    return [summarize_entry(entry) for entry in (results.get("data") or {}).get("entries") or [] if entry]
+
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+async def extract_pdb_data_batch(pdb_ids: List[str]) -> List[dict]:
+    """
+    Extract a compact summary (title, methods, resolution, release date and polymer
+    entities) for many PDB ids at once. Prefer this over calling extract_pdb_data per id.
+    
+    Args:
+        pdb_ids: The PDB ids to summarize (at most 200 per call).
+        
+    Returns:
+        A list with one summary per id, in the order given. Ids that could not be
+        fetched have an "error" field instead.
+    """
+    pdb_ids = list(dict.fromkeys(pdb_id.strip().upper() for pdb_id in pdb_ids))[:MAX_BATCH_IDS]
+    summaries = {}
+    missing = []
+    lookups = await asyncio.gather(*(
+        cache.get_async(cache.make_key("pdb_summary", {"pdb_id": pdb_id})) for pdb_id in pdb_ids
+    ))
+    for pdb_id, (hit, summary) in zip(pdb_ids, lookups):
+        if hit:
+            summaries[pdb_id] = summary
+        else:
+            missing.append(pdb_id)
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHUNKS)
+
+    async def fetch_chunk(chunk: List[str]) -> None:
+        async with semaphore:
+            try:
+                results = await asyncio.to_thread(fetch_summaries, chunk)
+            except Exception as e:
+                for pdb_id in chunk:
+                    summaries[pdb_id] = {"pdb_id": pdb_id, "error": str(e)}
+                return
+        for summary in results:
+            summaries[summary["pdb_id"]] = summary
+            await cache.set_async(cache.make_key("pdb_summary", {"pdb_id": summary["pdb_id"]}), "pdb_summary",
+                                  summary, TOOL_TTLS["extract_pdb_data_batch"])
+
+    await asyncio.gather(*(
+        fetch_chunk(missing[i:i + BATCH_CHUNK_SIZE]) for i in range(0, len(missing), BATCH_CHUNK_SIZE)
+    ))
+    return [summaries.get(pdb_id, {"pdb_id": pdb_id, "error": "Entry not found."}) for pdb_id in pdb_ids]
+
+@cache.cached(tool="search_similar_sequence")
+def remote_similar_sequence(
+    sequence: str,
     evalue_cutoff: float = 0.1,
     identity_cutoff: float = 0.0,
     sequence_type: str = "protein",
     max_results: int = 5
     ) -> list:
+    """The RCSB Search API's sequence similarity search."""
+    sq = SeqSimilarityQuery(
+        value=sequence, 
+        evalue_cutoff=evalue_cutoff,
+        identity_cutoff=identity_cutoff,
+        sequence_type=sequence_type
+    )
+    limiter.wait_sync(SEARCH_HOST)
+    results = sq()
+    res = []
+
+    with tracing.span("upstream_request_seconds", upstream="search.rcsb.org"):
+        for r in results:
+            res.append(r)
+            max_results -= 1
+            if max_results == 0:
+                break
+    return res
+
+def local_similar_sequence(sequence: str, identity_cutoff: float, sequence_type: str, max_results: int,
+                           align: bool) -> list:
+    """PDB ids with a sequence like this one in the local index, most similar first."""
+    index = sequence_indexes[molecule_type(sequence_type)]
+    with tracing.span("sequence_index_seconds"):
+        # several chains of an entry may match; fetch enough to fill max_results entries
+        hits = index.search(sequence, min_similarity=max(identity_cutoff, MIN_SIMILARITY), max_results=0, align=align)
+    pdb_ids = dict.fromkeys(chain.split("_")[0] for hit in hits for chain in hit["chains"])
+    return list(pdb_ids)[:max_results]
+
+async def similar_sequence(sequence: str, evalue_cutoff: float, identity_cutoff: float, sequence_type: str,
+                           max_results: int, align: bool, verify: bool) -> dict:
+    """Local search when there is an index for the sequence type, the remote one as fallback or check."""
+    sequence = "".join(sequence.split())
+    remote_args = (sequence, evalue_cutoff, identity_cutoff, sequence_type, max_results)
+    if molecule_type(sequence_type) not in sequence_indexes:
+        return {"pdb_ids": await remote_similar_sequence(*remote_args), "source": "remote"}
+    local = await asyncio.to_thread(
+        local_similar_sequence, sequence, identity_cutoff, sequence_type, max_results, align
+    )
+    if not local:
+        return {"pdb_ids": await remote_similar_sequence(*remote_args), "source": "remote"}
+    if verify:
+        # only the local hits that RCSB also finds within evalue_cutoff
+        remote = set(await remote_similar_sequence(*remote_args[:-1], max_results=max(100, max_results)))
+        return {"pdb_ids": [pdb_id for pdb_id in local if pdb_id in remote], "source": "local, verified"}
+    return {"pdb_ids": local, "source": "local"}
+
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+async def search_similar_sequence(
+    sequence: str, 
+    evalue_cutoff: float = 0.1,
+    identity_cutoff: float = 0.0,
+    sequence_type: str = "protein",
+    max_results: int = 5,
+    align: bool = True,
+    verify: bool = False
+    ) -> list:
     """
     Search for sequence PDB ids using a sequence similarity query.
     
@@ -55,25 +254,71 @@ def search_similar_sequence(
         identity_cutoff: lower cutoff for percent sequence match (0-1). Defaults to 0.
         sequence_type: type of biological sequence (“protein”, “dna”, “rna”). Defaults to “protein”.
         max_results: Maximum number of results to retrieve (default: 5)
+        align: rank local matches by local alignment rather than shared k-mers alone. Defaults to True.
+        verify: also run the RCSB search and keep only the local matches it confirms. Defaults to False.
         
     Returns:
         A list containing PDB ids with matched sequence.
     """
-    sq = SeqSimilarityQuery(
-        value=sequence, 
-        evalue_cutoff=evalue_cutoff,
-        identity_cutoff=identity_cutoff,
-        sequence_type=sequence_type
-    )
-    results = sq()
-    res = []
+    result = await similar_sequence(sequence, evalue_cutoff, identity_cutoff, sequence_type, max_results,
+                                    align, verify)
+    return result["pdb_ids"]
 
-    for r in results:
-        res.append(r)
-        max_results -= 1
-        if max_results == 0:
-            break
-    return res
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
+async def search_similar_sequences_batch(
+    sequences: List[str],
+    evalue_cutoff: float = 0.1,
+    identity_cutoff: float = 0.0,
+    sequence_type: str = "protein",
+    max_results: int = 5,
+    align: bool = True,
+    verify: bool = False,
+    ctx: Context = None
+    ) -> List[dict]:
+    """
+    Search for the PDB ids of sequences similar to each of many sequences. Prefer this
+    over calling search_similar_sequence per sequence; each sequence's ids are reported
+    as progress as soon as they are found.
+    
+    Args:
+        sequences: protein or nucleotide sequences (at most 500 per call)
+        evalue_cutoff: upper cutoff for E-value (lower is more significant). Defaults to 0.1.
+        identity_cutoff: lower cutoff for percent sequence match (0-1). Defaults to 0.
+        sequence_type: type of biological sequence (“protein”, “dna”, “rna”). Defaults to “protein”.
+        max_results: Maximum number of results to retrieve per sequence (default: 5)
+        align: rank local matches by local alignment rather than shared k-mers alone. Defaults to True.
+        verify: also run the RCSB search and keep only the local matches it confirms. Defaults to False.
+        
+    Returns:
+        A list with one entry per sequence, in the order given, with its position in
+        `sequences`, its pdb_ids and whether they came from the local index or RCSB.
+        Sequences whose search failed have an "error" field instead.
+    """
+    sequences = sequences[:MAX_BATCH_SEQUENCES]
+    results = {}
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEQUENCES)
+
+    async def search(number: int) -> str:
+        async with semaphore:
+            try:
+                result = await similar_sequence(sequences[number], evalue_cutoff, identity_cutoff,
+                                                sequence_type, max_results, align, verify)
+            except Exception as e:
+                results[number] = {"sequence": number, "error": str(e)}
+                return f"sequence {number}: search failed"
+        results[number] = dict(sequence=number, **result)
+        return f"sequence {number}: {', '.join(result['pdb_ids']) or 'no matches'}"
+
+    for finished in asyncio.as_completed([search(number) for number in range(len(sequences))]):
+        message = await finished
+        if ctx is not None:
+            await ctx.report_progress(len(results), len(sequences), message)
+    return [results[number] for number in range(len(sequences))]
+
+@mcp.resource("cache://stats")
+def get_cache_stats() -> str:
+    """Hit/miss counters and size of the response cache."""
+    return json.dumps(cache.stats(), indent=2)
 
 if __name__ == "__main__":
     # Initialize and run the server
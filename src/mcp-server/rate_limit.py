@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# shared by every MCP server process (and every worker of a pool), like the response cache
+RATE_LIMIT_PATH = os.environ.get("MCP_RATE_LIMIT_PATH", os.path.join("mcp_cache", "rate_limits.sqlite"))
+# MCP_RATE_LIMIT=0 turns the limits off
+ENABLED = os.environ.get("MCP_RATE_LIMIT", "1") != "0"
+
+# (requests per second, burst) per upstream host, within the published or
+# commonly observed limits for anonymous use. Hosts not listed are not limited.
+DEFAULT_LIMITS: Dict[str, Tuple[float, int]] = {
+    "api.fda.gov": (4.0, 8),          # 240 requests per minute per IP without an API key
+    "clinicaltrials.gov": (0.8, 5),   # about 50 requests per minute per IP
+    "search.rcsb.org": (5.0, 10),
+    "data.rcsb.org": (5.0, 10),
+    "export.arxiv.org": (1 / 3, 1),   # one request every three seconds
+}
+
+def load_limits() -> Dict[str, Tuple[float, int]]:
+    """DEFAULT_LIMITS updated from MCP_RATE_LIMITS, e.g. '{"api.fda.gov": [40, 40]}' with an API key."""
+    limits = dict(DEFAULT_LIMITS)
+    for host, (rate, burst) in json.loads(os.environ.get("MCP_RATE_LIMITS", "{}")).items():
+        limits[host] = (float(rate), int(burst))
+    return limits
+
+class RateLimiter:
+    """
+    Token buckets per upstream host, kept in SQLite so that every server process
+    draws from the same buckets.
+
+    A request takes a token even when none is left, driving the count negative;
+    the deficit divided by the rate is how long it waits. That queues callers in
+    arrival order across processes without polling. A 429 drains the bucket for
+    the Retry-After delay so every worker backs off together.
+    """
+    def __init__(self, path: str = RATE_LIMIT_PATH, limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 enabled: bool = ENABLED):
+        self.path = path
+        self.limits = load_limits() if limits is None else limits
+        self.enabled = enabled
+        self.counters = {"requests": 0, "delayed": 0, "waited_seconds": 0.0, "throttled": 0}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS buckets (
+                    host TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._db = db
+        return self._db
+
+    def _update(self, host: str, change) -> float:
+        """Refill the host's bucket, apply `change` to its token count and store the result."""
+        rate, burst = self.limits[host]
+        now = time.time()
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute("SELECT tokens, updated_at FROM buckets WHERE host = ?", (host,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                tokens = change(tokens)
+                self.db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (host, tokens, now))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return tokens
+
+    def reserve(self, host: str) -> float:
+        """Take a token for one request to `host`; returns the seconds to wait before sending it."""
+        if not self.enabled or host not in self.limits:
+            return 0.0
+        tokens = self._update(host, lambda tokens: tokens - 1)
+        wait = max(0.0, -tokens / self.limits[host][0])
+        with self._lock:
+            self.counters["requests"] += 1
+            if wait:
+                self.counters["delayed"] += 1
+                self.counters["waited_seconds"] += wait
+        return wait
+
+    def throttle(self, host: str, delay: float) -> bool:
+        """
+        The upstream answered 429: hold every request to it for at least `delay` seconds.
+        Returns False for hosts without a limit, which are left alone.
+        """
+        if not self.enabled or host not in self.limits:
+            return False
+        rate = self.limits[host][0]
+        self._update(host, lambda tokens: min(tokens, -delay * rate))
+        with self._lock:
+            self.counters["throttled"] += 1
+        return True
+
+    async def wait(self, host: str) -> None:
+        # the SQLite transaction may wait up to 30 s for another process; not on the event loop
+        delay = await asyncio.to_thread(self.reserve, host)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def throttle_async(self, host: str, delay: float) -> bool:
+        """throttle() for async callers, run in a worker thread like wait()."""
+        return await asyncio.to_thread(self.throttle, host, delay)
+
+    def wait_sync(self, host: str) -> None:
+        """For tools that call their upstream through a synchronous client, in a worker thread."""
+        delay = self.reserve(host)
+        if delay:
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        return dict(self.counters, waited_seconds=round(self.counters["waited_seconds"], 3))
+
+# one limiter per server process, all backed by the same SQLite file
+limiter = RateLimiter()
@@ -0,0 +1,296 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# shared by every MCP server process, relative to the working directory like arxiv_papers/
+CACHE_PATH = os.environ.get("MCP_CACHE_PATH", os.path.join("mcp_cache", "responses.sqlite"))
+MEMORY_ENTRIES = int(os.environ.get("MCP_CACHE_MEMORY_ENTRIES", "256"))
+MAX_DISK_BYTES = int(os.environ.get("MCP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# writes between scans of the table for expired rows and its total size, unless a write may have crossed the limit
+EVICT_EVERY = int(os.environ.get("MCP_CACHE_EVICT_EVERY", "64"))
+# MCP_CACHE=0 turns lookups and stores off (e.g. for benchmarks); concurrent identical calls are still collapsed
+ENABLED = os.environ.get("MCP_CACHE", "1") != "0"
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+# How long the data behind each tool stays valid: the TTL of its cached responses here,
+# and, in the host, of answers built on it (see src/host/answer_cache.py). Listed for
+# every tool whose data may be reused, including ones without a response cache.
+TOOL_TTLS: Dict[str, float] = {
+    "search_drug": 7 * DAY,
+    "match_drug_names": 7 * DAY,
+    "search_clinical_trials": DAY,
+    "search_pdb_ids": DAY,
+    "extract_pdb_data": 7 * DAY,
+    "extract_pdb_data_batch": 7 * DAY,
+    "search_similar_sequence": 7 * DAY,
+    "search_similar_sequences_batch": 7 * DAY,
+    "search_papers": DAY,
+    "search_papers_batch": DAY,
+    "extract_info": DAY,
+    "search_local_papers": HOUR,
+}
+
+def is_cacheable(value: Any) -> bool:
+    """Error payloads returned by the tools are never cached."""
+    return not (isinstance(value, dict) and "error" in value)
+
+def normalize(value: Any) -> Any:
+    """Make equivalent arguments produce the same key: case, surrounding and repeated whitespace are ignored."""
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    return value
+
+class ResponseCache:
+    """
+    Two-level cache for MCP tool responses.
+
+    An in-memory LRU sits in front of a SQLite table. Entries expire after a per-tool
+    TTL, and the least recently used rows are evicted once the table grows past
+    `max_disk_bytes`. Concurrent identical calls share one upstream fetch.
+
+    `get` and `set` block on SQLite, which other processes may hold locked; async
+    code calls them through `get_async` and `set_async`, which run them in a thread.
+    """
+    def __init__(self, path: str = CACHE_PATH, memory_entries: int = MEMORY_ENTRIES, max_disk_bytes: int = MAX_DISK_BYTES,
+                 enabled: bool = ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "collapsed": 0, "evictions": 0}
+        self._pending: Dict[str, asyncio.Future] = {}
+        # `_lock` guards the memory LRU and counters and is only held briefly, so the event
+        # loop can take it; `_db_lock` is held across SQLite calls, which may wait on locks
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # size of the table at the last scan plus what this process wrote since, None before the first scan
+        self._disk_bytes: Optional[int] = None
+        self._writes_since_scan = 0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._db = db
+        return self._db
+
+    def make_key(self, tool: str, arguments: Dict[str, Any]) -> str:
+        return tool + ":" + json.dumps(normalize(arguments), sort_keys=True, default=str)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (hit, value) for a key, checking memory first and then disk."""
+        if not self.enabled:
+            return False, None
+        now = time.time()
+        with self._lock:
+            hit, value = self._get_memory(key, now)
+        if hit:
+            return hit, value
+
+        with self._db_lock:
+            row = self.db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None or row[1] <= now:
+                self.counters["misses"] += 1
+                return False, None
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.counters["disk_hits"] += 1
+            return True, value
+
+    async def get_async(self, key: str) -> Tuple[bool, Any]:
+        """`get` without blocking the event loop: memory hits are served directly, disk lookups in a thread."""
+        if not self.enabled:
+            return False, None
+        with self._lock:
+            hit, value = self._get_memory(key, time.time())
+        if hit:
+            return hit, value
+        return await asyncio.to_thread(self.get, key)
+
+    def _get_memory(self, key: str, now: float) -> Tuple[bool, Any]:
+        entry = self.memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self.memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return True, entry[1]
+            del self.memory[key]
+        return False, None
+
+    def set(self, key: str, tool: str, value: Any, ttl: float) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        payload = json.dumps(value, default=str)
+        with self._lock:
+            self._remember(key, now + ttl, value)
+        with self._db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, tool, payload, len(payload), now + ttl, now)
+            )
+            self._writes_since_scan += 1
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(payload)
+            if (self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+                    or self._writes_since_scan >= EVICT_EVERY):
+                self._evict(now)
+
+    async def set_async(self, key: str, tool: str, value: Any, ttl: float) -> None:
+        """`set` run in a thread so the event loop does not wait on SQLite."""
+        if self.enabled:
+            await asyncio.to_thread(self.set, key, tool, value, ttl)
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        """
+        Drop expired rows and, over the size limit, the least recently used ones.
+        This scans the table, so `set` only calls it every EVICT_EVERY writes or when
+        the running size total (which misses other processes' writes) passes the limit.
+        """
+        self._writes_since_scan = 0
+        self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._disk_bytes = total
+        if total <= self.max_disk_bytes:
+            return
+        # drop least recently used rows until the table is back under 90% of the limit
+        excess = total - int(self.max_disk_bytes * 0.9)
+        victims = []
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            self._disk_bytes -= size
+            if excess <= 0:
+                break
+        self.db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        with self._lock:
+            for (key,) in victims:
+                self.memory.pop(key, None)
+            self.counters["evictions"] += len(victims)
+
+    def invalidate(self, tool: Optional[str] = None) -> None:
+        """Drop every entry, or only those of one tool."""
+        with self._lock:
+            if tool is None:
+                self.memory.clear()
+            else:
+                for key in [k for k in self.memory if k.startswith(tool + ":")]:
+                    del self.memory[key]
+        with self._db_lock:
+            if tool is None:
+                self.db.execute("DELETE FROM responses")
+            else:
+                self.db.execute("DELETE FROM responses WHERE tool = ?", (tool,))
+            self._disk_bytes = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._db_lock:
+            entries, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {**self.counters, "memory_entries": len(self.memory), "disk_entries": entries, "disk_bytes": size}
+
+    def cached(self, ttl: Optional[float] = None, tool: Optional[str] = None,
+               cache_if: Callable[[Any], bool] = is_cacheable):
+        """
+        Decorate a tool function so its responses are cached for `ttl` seconds,
+        by default the tool's entry in TOOL_TTLS.
+
+        The wrapper is always async: synchronous functions, and lookups and stores
+        that reach SQLite, run in a worker thread so that the MCP server keeps serving
+        other calls while one waits on the network or on the database.
+        """
+        def decorator(fn):
+            name = tool or fn.__name__
+            expires_after = TOOL_TTLS[name] if ttl is None else ttl
+            signature = inspect.signature(fn)
+            is_async = inspect.iscoroutinefunction(fn)
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = self.make_key(name, bound.arguments)
+                while True:
+                    pending = self._pending.get(key)
+                    if pending is None:
+                        hit, value = await self.get_async(key)
+                        if hit:
+                            return value
+                        # another call may have started the fetch while this one read the disk
+                        pending = self._pending.get(key)
+                        if pending is None:
+                            break
+                    self.counters["collapsed"] += 1
+                    try:
+                        return await asyncio.shield(pending)
+                    except asyncio.CancelledError:
+                        if not pending.cancelled():
+                            raise
+                        # the leading call was abandoned, fetch again ourselves
+
+                future = asyncio.get_running_loop().create_future()
+                self._pending[key] = future
+                try:
+                    if is_async:
+                        value = await fn(*args, **kwargs)
+                    else:
+                        value = await asyncio.to_thread(fn, *args, **kwargs)
+                    future.set_result(value)
+                    if cache_if(value):
+                        await self.set_async(key, name, value, expires_after)
+                    return value
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    future.set_exception(e)
+                    future.exception()  # waiters re-raise it; don't warn when there are none
+                    raise
+                finally:
+                    del self._pending[key]
+
+            return wrapper
+        return decorator
+
+# one cache per server process, all backed by the same SQLite file
+cache = ResponseCache()
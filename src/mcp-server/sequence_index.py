@@ -0,0 +1,276 @@
+"""
+Local k-mer index of PDB polymer sequences, built from the FASTA file RCSB
+publishes at https://files.wwpdb.org/pub/pdb/derived_data/pdb_seqres.txt(.gz).
+
+Chains with identical sequences are stored once. Proteins and nucleic acids get
+an index each, in <index_dir>/protein and <index_dir>/na, with the files
+
+    sequences.txt   one distinct sequence per line
+    chains.txt      the chain ids (e.g. 4HHB_A) of each sequence, space separated
+    kmers.npy       every distinct k-mer, encoded as an integer, sorted
+    offsets.npy     where each k-mer's postings start in postings.npy
+    postings.npy    sequence numbers containing each k-mer, as uint32
+    counts.npy      number of distinct k-mers of each sequence
+
+The .npy files are memory-mapped. A search counts the query's k-mers shared by
+every sequence with one np.bincount over the postings, keeps the candidates sharing
+the most beyond what their length explains by chance and, optionally, scores them
+with a local alignment.
+
+Build it with:
+    python3 src/mcp-server/sequence_index.py <pdb_seqres.txt[.gz]> [index_dir]
+"""
+import gzip
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+
+SEQUENCE_INDEX_DIR = os.environ.get("PDB_SEQUENCE_INDEX", "pdb_sequences")
+# k-mer length per molecule type; nucleic acids have a 4 letter alphabet and need longer ones
+KMER_LENGTHS = {"protein": 3, "na": 6}
+# residue letters per molecule type, for the number of possible k-mers
+ALPHABET_SIZES = {"protein": 20, "na": 4}
+# each residue letter is 5 bits of a k-mer's code
+BITS = 5
+# candidates kept after k-mer counting, for alignment
+MAX_CANDIDATES = int(os.environ.get("PDB_SEQUENCE_CANDIDATES", "50"))
+# share of the query's k-mers a candidate needs
+MIN_SHARED = 0.1
+# similarity below which a match is taken for chance (unrelated proteins score 0.1-0.2)
+MIN_SIMILARITY = float(os.environ.get("PDB_SEQUENCE_MIN_SIMILARITY", "0.3"))
+# local alignment scores: linear gap cost
+MATCH, MISMATCH, GAP = 2, -1, 2
+# a target much longer than the query is aligned only in a window around its best k-mer
+# diagonal, reaching this share of the query's length past either end of the query
+WINDOW_MARGIN = 0.5
+# targets in one alignment pass are padded to the longest; a new pass starts at this ratio
+GROUP_LENGTH_RATIO = 1.5
+# query x target cells aligned per search at most; lower-ranked candidates past it are dropped
+MAX_ALIGNMENT_CELLS = int(os.environ.get("PDB_SEQUENCE_MAX_CELLS", "20000000"))
+
+def molecule_type(sequence_type: str) -> str:
+    """The tools' sequence_type ("protein", "dna", "rna") as the index's molecule type."""
+    return "protein" if sequence_type.lower() == "protein" else "na"
+
+def encode(sequence: str) -> np.ndarray:
+    """Residue letters as 1-26 (anything else 0)."""
+    letters = np.frombuffer(sequence.upper().encode("ascii", "replace"), dtype=np.uint8).astype(np.int64) - 64
+    letters[(letters < 1) | (letters > 26)] = 0
+    return letters
+
+def kmer_positions(letters: np.ndarray, k: int) -> np.ndarray:
+    """The k-mer starting at each position of encoded residues, packed into one integer."""
+    if len(letters) < k:
+        return np.empty(0, dtype=np.int64)
+    codes = np.zeros(len(letters) - k + 1, dtype=np.int64)
+    for i in range(k):
+        codes = (codes << BITS) | letters[i:len(letters) - k + 1 + i]
+    return codes
+
+def kmer_codes(sequence: str, k: int) -> np.ndarray:
+    """The distinct k-mers of a sequence, each packed into one integer."""
+    return np.unique(kmer_positions(encode(sequence), k)).astype(np.uint64)
+
+def iter_fasta(path: str) -> Iterator[Tuple[str, str, str]]:
+    """(chain id, molecule type, sequence) of each record of pdb_seqres.txt."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as file:
+        header, lines = None, []
+        for line in file:
+            line = line.strip()
+            if line.startswith(">"):
+                if header is not None:
+                    yield header + ("".join(lines),)
+                # >101m_A mol:protein length:154  MYOGLOBIN
+                fields = line[1:].split()
+                entry, _, chain = fields[0].partition("_")
+                mol = "protein" if "mol:protein" in fields else "na"
+                header, lines = (f"{entry.upper()}_{chain}", mol), []
+            elif line:
+                lines.append(line)
+        if header is not None:
+            yield header + ("".join(lines),)
+
+def build(path: str, index_dir: str = SEQUENCE_INDEX_DIR) -> Dict[str, dict]:
+    """Build the protein and nucleic acid indexes from a FASTA file."""
+    chains: Dict[str, Dict[str, List[str]]] = {mol: {} for mol in KMER_LENGTHS}
+    for chain, mol, sequence in iter_fasta(path):
+        if sequence:
+            chains[mol].setdefault(sequence.upper(), []).append(chain)
+
+    counts = {}
+    for mol, by_sequence in chains.items():
+        directory = os.path.join(index_dir, mol)
+        os.makedirs(directory, exist_ok=True)
+        sequences = list(by_sequence)
+        codes = [kmer_codes(sequence, KMER_LENGTHS[mol]) for sequence in sequences]
+        sizes = np.array([len(c) for c in codes], dtype=np.uint32)
+        all_codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.uint64)
+        numbers = np.repeat(np.arange(len(sequences), dtype=np.uint32), sizes)
+        order = np.argsort(all_codes, kind="stable")
+        kmers, starts = np.unique(all_codes[order], return_index=True)
+        offsets = np.append(starts, len(order)).astype(np.int64)
+
+        files = {"kmers.npy": kmers, "offsets.npy": offsets, "postings.npy": numbers[order], "counts.npy": sizes}
+        for name, array in files.items():
+            with open(os.path.join(directory, name + ".tmp"), "wb") as file:
+                np.save(file, array)
+        with open(os.path.join(directory, "sequences.txt.tmp"), "w") as file:
+            file.write("\n".join(sequences))
+        with open(os.path.join(directory, "chains.txt.tmp"), "w") as file:
+            file.write("\n".join(" ".join(by_sequence[sequence]) for sequence in sequences))
+        # swap the files in only once all of them are complete
+        for name in list(files) + ["sequences.txt", "chains.txt"]:
+            os.replace(os.path.join(directory, name + ".tmp"), os.path.join(directory, name))
+        counts[mol] = {"chains": sum(len(c) for c in by_sequence.values()), "sequences": len(sequences),
+                       "kmers": len(kmers), "postings": len(order)}
+    return counts
+
+def local_alignment_scores(query: np.ndarray, targets: List[np.ndarray]) -> np.ndarray:
+    """
+    Smith-Waterman scores with a linear gap cost of the query against every target.
+    Targets of similar length are padded into one matrix and each query residue is
+    one numpy pass over it; a new matrix starts once a target is GROUP_LENGTH_RATIO
+    times longer than the shortest in it, so short targets are not padded to long ones.
+    Within a row, the best horizontal gap H[j] = max over k <= j of F[k] - GAP * (j - k)
+    is a running maximum of F[k] + GAP * k.
+    """
+    best = np.zeros(len(targets), dtype=np.int64)
+    order = sorted(range(len(targets)), key=lambda number: len(targets[number]))
+    groups: List[List[int]] = []
+    for number in order:
+        if not groups or len(targets[number]) > GROUP_LENGTH_RATIO * max(1, len(targets[groups[-1][0]])):
+            groups.append([])
+        groups[-1].append(number)
+    for group in groups:
+        best[group] = aligned_group_scores(query, [targets[number] for number in group])
+    return best
+
+def aligned_group_scores(query: np.ndarray, targets: List[np.ndarray]) -> np.ndarray:
+    # padding never matches, so it never raises a score
+    padded = np.full((len(targets), max(len(t) for t in targets)), -1, dtype=np.int64)
+    for number, target in enumerate(targets):
+        padded[number, :len(target)] = target
+    ramp = GAP * np.arange(padded.shape[1] + 1)
+    previous = np.zeros((len(targets), padded.shape[1] + 1), dtype=np.int64)
+    best = np.zeros(len(targets), dtype=np.int64)
+    for residue in query:
+        row = np.zeros_like(previous)
+        diagonal = previous[:, :-1] + np.where(padded == residue, MATCH, MISMATCH)
+        row[:, 1:] = np.maximum(np.maximum(diagonal, previous[:, 1:] - GAP), 0)
+        row = np.maximum.accumulate(row + ramp, axis=1) - ramp
+        np.maximum(best, row.max(axis=1), out=best)
+        previous = row
+    return best
+
+def diagonal_window(query: np.ndarray, target: np.ndarray, k: int) -> np.ndarray:
+    """
+    The part of a long target around the diagonal (target position - query position)
+    on which it shares the most k-mers with the query. The best local alignment lies
+    along that diagonal, give or take its gaps, so its score is the same in the window.
+    """
+    margin = int(len(query) * WINDOW_MARGIN) + k
+    if len(target) <= len(query) + 2 * margin:
+        return target
+    query_kmers, target_kmers = kmer_positions(query, k), kmer_positions(target, k)
+    if not len(query_kmers):
+        return target[:len(query) + 2 * margin]
+    order = np.argsort(query_kmers, kind="stable")
+    positions = np.searchsorted(query_kmers[order], target_kmers)
+    positions = np.minimum(positions, len(order) - 1)
+    shared = query_kmers[order][positions] == target_kmers
+    if not shared.any():
+        return target[:len(query) + 2 * margin]
+    diagonals = np.flatnonzero(shared) - order[positions[shared]]
+    diagonal = int(np.argmax(np.bincount(diagonals + len(query)))) - len(query)
+    start = max(0, diagonal - margin)
+    return target[start:start + len(query) + 2 * margin]
+class SequenceIndex:
+    """Read side of one molecule type's index."""
+    def __init__(self, directory: str, k: int, alphabet_size: int = 20):
+        self.k = k
+        self.kmer_space = alphabet_size ** k
+        self.kmers = np.load(os.path.join(directory, "kmers.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(directory, "postings.npy"), mmap_mode="r")
+        self.counts = np.load(os.path.join(directory, "counts.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "sequences.txt")) as file:
+            self.sequences = file.read().split("\n")
+        with open(os.path.join(directory, "chains.txt")) as file:
+            self.chains = file.read().split("\n")
+
+    def candidates(self, sequence: str, max_candidates: int = MAX_CANDIDATES) -> List[Tuple[int, float]]:
+        """Sequence numbers sharing the most k-mers with the query, with the share of the smaller k-mer set."""
+        codes = kmer_codes(sequence, self.k)
+        if not len(codes) or not len(self.kmers):
+            return []
+        positions = np.searchsorted(self.kmers, codes)
+        found = positions < len(self.kmers)
+        found[found] = self.kmers[positions[found]] == codes[found]
+        positions = positions[found]
+        if not len(positions):
+            return []
+        hits = np.concatenate([self.postings[self.offsets[p]:self.offsets[p + 1]] for p in positions])
+        shared = np.bincount(hits, minlength=len(self.counts)).astype(np.float64)
+        # A long sequence contains a large share of all possible k-mers and so shares
+        # many with any query by chance; only k-mers beyond that expectation count.
+        expected = len(codes) * np.minimum(1.0, self.counts / self.kmer_space)
+        excess = np.maximum(shared - expected, 0)
+        excess[shared < max(1, MIN_SHARED * len(codes))] = 0
+        top = np.argpartition(-excess, min(max_candidates, len(excess) - 1))[:max_candidates]
+        top = top[excess[top] > 0]
+        score = excess[top] / np.maximum(np.minimum(len(codes), self.counts[top]) - expected[top], 1)
+        order = np.argsort(-score, kind="stable")
+        return [(int(number), float(min(1.0, s))) for number, s in zip(top[order], score[order])]
+
+    def search(self, sequence: str, min_similarity: float = MIN_SIMILARITY, max_results: int = 5,
+               align: bool = True) -> List[dict]:
+        """
+        Sequences like the query, most similar first. With align, similarity is the
+        local alignment score relative to a perfect match of the shorter sequence;
+        without, it is the share of k-mers in common.
+        """
+        candidates = self.candidates(sequence)
+        if not candidates:
+            return []
+        numbers = [number for number, _ in candidates]
+        similarities = np.array([similarity for _, similarity in candidates])
+        if align:
+            query = encode(sequence)
+            targets = [encode(self.sequences[number]) for number in numbers]
+            lengths = np.minimum(len(query), [len(target) for target in targets])
+            windows = [diagonal_window(query, target, self.k) for target in targets]
+            # candidates come best first; stop before the alignment would get too costly
+            cells = np.cumsum([len(query) * len(window) for window in windows])
+            kept = int(np.searchsorted(cells, MAX_ALIGNMENT_CELLS, side="right"))
+            if kept:
+                numbers, windows, lengths = numbers[:kept], windows[:kept], lengths[:kept]
+                similarities = local_alignment_scores(query, windows) / (MATCH * lengths)
+            # otherwise (a query too long to align even once) the k-mer shares are kept
+        hits = [
+            {"chains": self.chains[number].split(), "similarity": round(float(similarity), 3)}
+            for number, similarity in zip(numbers, similarities) if similarity >= min_similarity
+        ]
+        hits.sort(key=lambda hit: -hit["similarity"])
+        return hits[:max_results] if max_results else hits
+
+def open_indexes(index_dir: str = SEQUENCE_INDEX_DIR) -> Dict[str, SequenceIndex]:
+    """The molecule types built in index_dir and their indexes; empty when none has been built."""
+    return {
+        mol: SequenceIndex(os.path.join(index_dir, mol), k, ALPHABET_SIZES[mol])
+        for mol, k in KMER_LENGTHS.items()
+        if os.path.exists(os.path.join(index_dir, mol, "chains.txt"))
+    }
+
+if __name__ == "__main__":
+    # python3 src/mcp-server/sequence_index.py <pdb_seqres.txt[.gz]> [index_dir]
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    start = time.perf_counter()
+    counts = build(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else SEQUENCE_INDEX_DIR)
+    for mol, c in counts.items():
+        print(f"{mol}: {c['sequences']} distinct sequences of {c['chains']} chains, "
+              f"{c['kmers']} k-mers, {c['postings']} postings")
+    print(f"Built in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,115 @@
+import bisect
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# spans are recorded unless TRACING=0; when off, span() returns a shared no-op object
+ENABLED = os.environ.get("TRACING", "1") != "0"
+# histogram bucket upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_RESOURCE = "metrics://histograms"
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+class Registry:
+    """Latency histograms keyed by metric name and label set."""
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def snapshot(self) -> List[dict]:
+        """JSON-friendly copy of every histogram, e.g. to ship from an MCP server to the host."""
+        return [
+            {"name": name, "labels": dict(labels), "counts": list(h.counts), "sum": h.sum, "count": h.count}
+            for (name, labels), h in self.histograms.items()
+        ]
+
+class Span:
+    """Times a block and records it in the registry, labelled with its outcome."""
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name: str, labels: Dict[str, str]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        outcome = "ok" if exc_type is None else "error"
+        registry.observe(self.name, time.perf_counter() - self.start, outcome=outcome, **self.labels)
+        return False
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_SPAN = NullSpan()
+registry = Registry()
+
+def span(name: str, **labels: str):
+    """Time a `with` block as an observation of the `name` histogram."""
+    return Span(name, labels) if ENABLED else NULL_SPAN
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    """Record a duration measured elsewhere (e.g. time to first byte)."""
+    if ENABLED:
+        registry.observe(name, seconds, **labels)
+
+def expose(mcp) -> None:
+    """Serve this process's histograms as an MCP resource for the host's /metrics endpoint."""
+    @mcp.resource(METRICS_RESOURCE)
+    def get_metrics() -> str:
+        """Latency histograms recorded by this server."""
+        return json.dumps(registry.snapshot())
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = sorted(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+def render_prometheus(snapshots: Iterable[dict]) -> str:
+    """Render histogram snapshots in the Prometheus text exposition format."""
+    by_name: Dict[str, List[dict]] = {}
+    for entry in snapshots:
+        by_name.setdefault(entry["name"], []).append(entry)
+    lines = []
+    for name in sorted(by_name):
+        lines.append(f"# TYPE {name} histogram")
+        for entry in by_name[name]:
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), entry["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(entry['labels'], ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(entry['labels'])} {entry['sum']}")
+            lines.append(f"{name}_count{_format_labels(entry['labels'])} {entry['count']}")
+    return "\n".join(lines) + "\n"
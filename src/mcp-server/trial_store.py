@@ -0,0 +1,257 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+# studies harvested from ClinicalTrials.gov, shared by every server process
+TRIAL_DB = os.environ.get("CLINICALTRIALS_DB", os.path.join("mcp_cache", "trials.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS studies (
+    nct_id TEXT PRIMARY KEY,
+    title TEXT,
+    status TEXT,
+    study_type TEXT,
+    sponsor TEXT COLLATE NOCASE,
+    sponsor_class TEXT,
+    start_date TEXT,
+    completion_date TEXT,
+    enrollment INTEGER,
+    harvested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS study_conditions (
+    nct_id TEXT NOT NULL REFERENCES studies (nct_id),
+    condition TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (nct_id, condition)
+);
+CREATE TABLE IF NOT EXISTS study_interventions (
+    nct_id TEXT NOT NULL REFERENCES studies (nct_id),
+    name TEXT NOT NULL COLLATE NOCASE,
+    type TEXT,
+    PRIMARY KEY (nct_id, name)
+);
+CREATE TABLE IF NOT EXISTS study_phases (
+    nct_id TEXT NOT NULL REFERENCES studies (nct_id),
+    phase TEXT NOT NULL,
+    PRIMARY KEY (nct_id, phase)
+);
+CREATE INDEX IF NOT EXISTS studies_status ON studies (status);
+CREATE INDEX IF NOT EXISTS studies_sponsor ON studies (sponsor);
+CREATE INDEX IF NOT EXISTS study_conditions_condition ON study_conditions (condition);
+CREATE INDEX IF NOT EXISTS study_interventions_name ON study_interventions (name);
+CREATE INDEX IF NOT EXISTS study_phases_phase ON study_phases (phase, nct_id);
+CREATE TABLE IF NOT EXISTS harvests (
+    query TEXT PRIMARY KEY,
+    studies INTEGER NOT NULL,
+    pages INTEGER NOT NULL,
+    total INTEGER,
+    next_page_token TEXT,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# group_by names -> (table joined for it, or None for studies, and the column or expression)
+GROUPS = {
+    "phase": ("study_phases", "phase"),
+    "condition": ("study_conditions", "condition"),
+    "intervention": ("study_interventions", "name"),
+    "intervention_type": ("study_interventions", "type"),
+    "status": (None, "s.status"),
+    "sponsor": (None, "s.sponsor"),
+    "sponsor_class": (None, "s.sponsor_class"),
+    "study_type": (None, "s.study_type"),
+    "start_year": (None, "substr(s.start_date, 1, 4)"),
+}
+
+def normalize_phase(phase: str) -> str:
+    """'phase 3', '3' or 'Phase3' -> 'PHASE3'; 'early phase 1' -> 'EARLY_PHASE1', as the API spells them."""
+    phase = re.sub(r"[\s_]+", "", phase.upper())
+    if phase.isdigit():
+        return "PHASE" + phase
+    if phase.startswith("EARLYPHASE"):
+        return "EARLY_PHASE" + phase[len("EARLYPHASE"):]
+    return phase
+
+def normalize_status(status: str) -> str:
+    """'active, not recruiting' -> 'ACTIVE_NOT_RECRUITING'."""
+    return re.sub(r"[\s,_]+", "_", status.strip().upper())
+
+def study_row(study: dict) -> tuple:
+    """The columns of one study from the API's protocolSection."""
+    section = study.get("protocolSection", {})
+    identification = section.get("identificationModule", {})
+    status = section.get("statusModule", {})
+    sponsor = section.get("sponsorCollaboratorsModule", {}).get("leadSponsor", {})
+    design = section.get("designModule", {})
+    return (
+        identification.get("nctId"),
+        identification.get("briefTitle"),
+        status.get("overallStatus"),
+        design.get("studyType"),
+        sponsor.get("name"),
+        sponsor.get("class"),
+        status.get("startDateStruct", {}).get("date"),
+        status.get("completionDateStruct", {}).get("date"),
+        design.get("enrollmentInfo", {}).get("count"),
+    )
+
+class TrialStore:
+    """
+    SQLite store for studies harvested from ClinicalTrials.gov.
+
+    Conditions, interventions and phases, which a study has several of, live in
+    their own indexed tables so that counts and group-bys over them are answered
+    with SQL. Every page is written in one IMMEDIATE transaction together with the
+    harvest's resume token, so an interrupted harvest continues where it stopped.
+    """
+    def __init__(self, path: str = TRIAL_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    def get_harvest(self, query: str) -> Optional[dict]:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT studies, pages, total, next_page_token, started_at, updated_at FROM harvests WHERE query = ?",
+                (query,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("studies", "pages", "total", "next_page_token", "started_at", "updated_at"), row))
+
+    def list_harvests(self) -> List[dict]:
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT query, studies, total, next_page_token IS NULL, updated_at FROM harvests ORDER BY updated_at DESC"
+            ).fetchall()
+        return [
+            {"query": json.loads(query), "studies": studies, "total": total, "complete": bool(complete),
+             "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(updated_at))}
+            for query, studies, total, complete, updated_at in rows
+        ]
+
+    def save_page(self, query: str, studies: List[dict], next_page_token: Optional[str],
+                  total: Optional[int] = None, first: bool = False) -> None:
+        """Upsert one page of studies and advance the harvest of `query` to `next_page_token`."""
+        now = time.time()
+        rows, conditions, interventions, phases = [], [], [], []
+        for study in studies:
+            row = study_row(study)
+            nct_id = row[0]
+            if not nct_id:
+                continue
+            rows.append(row + (now,))
+            section = study.get("protocolSection", {})
+            conditions += [(nct_id, c) for c in section.get("conditionsModule", {}).get("conditions", [])]
+            interventions += [
+                (nct_id, i["name"], i.get("type"))
+                for i in section.get("armsInterventionsModule", {}).get("interventions", []) if i.get("name")
+            ]
+            phases += [(nct_id, p) for p in section.get("designModule", {}).get("phases", [])]
+        ids = [(row[0],) for row in rows]
+
+        with self._lock:
+            db = self.db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany("INSERT OR REPLACE INTO studies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                # a re-harvested study may have dropped conditions, interventions or phases
+                for table in ("study_conditions", "study_interventions", "study_phases"):
+                    db.executemany(f"DELETE FROM {table} WHERE nct_id = ?", ids)
+                db.executemany("INSERT OR IGNORE INTO study_conditions VALUES (?, ?)", conditions)
+                db.executemany("INSERT OR IGNORE INTO study_interventions VALUES (?, ?, ?)", interventions)
+                db.executemany("INSERT OR IGNORE INTO study_phases VALUES (?, ?)", phases)
+                if first:
+                    db.execute(
+                        "INSERT OR REPLACE INTO harvests VALUES (?, 0, 0, ?, NULL, ?, ?)", (query, total, now, now)
+                    )
+                db.execute(
+                    """UPDATE harvests SET studies = studies + ?, pages = pages + 1,
+                           total = coalesce(?, total), next_page_token = ?, updated_at = ?
+                       WHERE query = ?""",
+                    (len(rows), total, next_page_token, now, query)
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def aggregate(self, group_by: Optional[List[str]] = None, cond: Optional[str] = None,
+                  intr: Optional[str] = None, phase: Optional[str] = None, status: Optional[str] = None,
+                  sponsor: Optional[str] = None, max_groups: int = 25) -> dict:
+        """
+        Count the stored studies matching every given filter, optionally per group.
+
+        cond, intr and sponsor match case-insensitive substrings; phase and status
+        are normalized to the API's values. A study with several phases, conditions
+        or interventions counts once in each of its groups.
+        """
+        group_by = list(dict.fromkeys(group_by or []))
+        unknown = [name for name in group_by if name not in GROUPS]
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(unknown)}; choose from {', '.join(GROUPS)}.")
+
+        where, params = [], []
+        if cond:
+            where.append("s.nct_id IN (SELECT nct_id FROM study_conditions WHERE condition LIKE ?)")
+            params.append(f"%{cond}%")
+        if intr:
+            where.append("s.nct_id IN (SELECT nct_id FROM study_interventions WHERE name LIKE ?)")
+            params.append(f"%{intr}%")
+        if phase:
+            where.append("s.nct_id IN (SELECT nct_id FROM study_phases WHERE phase = ?)")
+            params.append(normalize_phase(phase))
+        if status:
+            where.append("s.status = ?")
+            params.append(normalize_status(status))
+        if sponsor:
+            where.append("s.sponsor LIKE ?")
+            params.append(f"%{sponsor}%")
+        where_sql = " WHERE " + " AND ".join(where) if where else ""
+
+        with self._lock:
+            total = self.db.execute(f"SELECT COUNT(*) FROM studies s{where_sql}", params).fetchone()[0]
+            if not group_by:
+                return {"total": total}
+
+            joins, columns = {}, []
+            for name in group_by:
+                table, column = GROUPS[name]
+                if table is None:
+                    columns.append(column)
+                else:
+                    alias = joins.setdefault(table, f"g{len(joins)}")
+                    columns.append(f"{alias}.{column}")
+            join_sql = "".join(f" JOIN {table} {alias} ON {alias}.nct_id = s.nct_id" for table, alias in joins.items())
+            rows = self.db.execute(
+                f"""SELECT {', '.join(columns)}, COUNT(DISTINCT s.nct_id) AS count
+                    FROM studies s{join_sql}{where_sql}
+                    GROUP BY {', '.join(columns)} ORDER BY count DESC LIMIT ?""",
+                params + [max_groups]
+            ).fetchall()
+        return {
+            "total": total,
+            "groups": [dict(zip(group_by + ["count"], row)) for row in rows],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("studies", "study_conditions", "study_interventions", "study_phases", "harvests")
+            }
@@ -0,0 +1,102 @@
+"""Streaming /chat client for the Streamlit front-end, free of Streamlit so it can be benchmarked."""
+import json
+import os
+import time
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+
+CHAT_URL = os.environ.get("CHAT_URL", "http://fastapi:8000/chat")
+# the answer is re-rendered at most this often while it streams, and once more at the end
+RENDER_INTERVAL = float(os.environ.get("RENDER_INTERVAL", "0.1"))
+# seconds to connect to the backend, and to wait for the next bytes of a streaming answer
+# (the backend sends a heartbeat every SSE_HEARTBEAT seconds, 10 by default)
+CONNECT_TIMEOUT = float(os.environ.get("CHAT_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("CHAT_READ_TIMEOUT", "60"))
+
+def make_session(pool_size: int = 10) -> requests.Session:
+    """A session whose kept-alive connections are reused by every prompt."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def parse_sse(lines: Iterable[str]) -> Iterator[Tuple[str, dict]]:
+    """(event, data) pairs from the lines of a text/event-stream; comments (heartbeats) are skipped."""
+    event, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+
+def stream_chat(session: requests.Session, query: str, session_id: Optional[str] = None,
+                url: str = CHAT_URL) -> Tuple[Optional[str], Iterator[Tuple[str, dict]]]:
+    """
+    Start a chat request; returns the backend's session id and its event stream.
+
+    The response is closed, and its connection handed back to the session's pool,
+    once the events are read to the end or the iterator is closed.
+    """
+    response = session.post(
+        url,
+        json={"query": query, "session_id": session_id},
+        headers={"Accept": "text/event-stream"},
+        stream=True,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    )
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+    response.encoding = "utf-8"
+    return response.headers.get("X-Session-Id"), read_events(response)
+
+def read_events(response: requests.Response) -> Iterator[Tuple[str, dict]]:
+    try:
+        # chunk_size=None hands over whatever has arrived instead of tiny fixed-size reads
+        yield from parse_sse(response.iter_lines(chunk_size=None, decode_unicode=True))
+    finally:
+        response.close()
+
+def render_stream(events: Iterable[Tuple[str, dict]], render_text: Callable[[str], None],
+                  render_tool: Callable[[str, dict], None], interval: float = RENDER_INTERVAL) -> str:
+    """
+    Feed chat events to the renderers and return the full answer text.
+
+    Re-rendering the whole answer costs time proportional to its length, so it is
+    done by the clock rather than once per token event. Tool events go to
+    `render_tool` as (event, data); an error event is raised as a RuntimeError.
+    The event stream is closed on return, error or exception.
+    """
+    answer = ""
+    last_render = time.monotonic()
+    try:
+        for event, data in events:
+            if event == "token":
+                answer += data["text"]
+                now = time.monotonic()
+                if now - last_render >= interval:
+                    render_text(answer + " ▌")
+                    last_render = now
+            elif event in ("tool_start", "tool_progress", "tool_end"):
+                render_tool(event, data)
+            elif event == "error":
+                render_text(answer)
+                raise RuntimeError(data.get("message", "chat failed"))
+            elif event == "done":
+                break
+    finally:
+        # a generator left by break or an exception would hold its connection until collected
+        close = getattr(events, "close", None)
+        if close is not None:
+            close()
+    # final render without the cursor
+    render_text(answer)
+    return answer
@@ -1,4 +1,10 @@
-import streamlit as st, requests, time
+import streamlit as st
+from chat_client import make_session, stream_chat, render_stream
+
+@st.cache_resource
+def get_session():
+    # one pooled HTTP session for all prompts, so connections to the backend are reused
+    return make_session()
 
 with st.sidebar:
     gemini_api_key = st.text_input("Gemini API Key", key="chatbot_api_key", type="password")
@@ -25,24 +31,27 @@ if prompt := st.chat_input():
     # Send query to GeminiChatBot API and handle streaming response
     try:
         with st.chat_message("assistant"):
+            tool_placeholder = st.empty()
             response_placeholder = st.empty()
-
-            response = requests.post(
-                "http://fastapi:8000/chat",
-                json={"query": prompt},
-                stream=True 
-            )
-
-            text_accum = ""
-            for chunk in response.iter_content(chunk_size=32, decode_unicode=True):
-                if not chunk: continue
-                text_accum += chunk
-                response_placeholder.markdown(text_accum)
-                time.sleep(0.01)
-            # final render without cursor
-            response_placeholder.markdown(text_accum)
+            tool_calls = {}
+
+            def show_tool(event, data):
+                if event == "tool_start":
+                    tool_calls[data["id"]] = f"🔧 {data['name']} with args {data['args']} …"
+                elif event == "tool_progress":
+                    # e.g. the papers found so far by search_papers_batch
+                    tool_calls[data["id"]] = f"🔧 {data['name']} {data['message'] or ''} …"
+                else:
+                    status = "failed" if data["error"] else "done"
+                    tool_calls[data["id"]] = f"🔧 {data['name']} {status} in {data['seconds']:.2f}s"
+                tool_placeholder.caption("  \n".join(tool_calls.values()))
+
+            # the backend keeps the conversation history under this id
+            session_id, events = stream_chat(get_session(), prompt, st.session_state.get("session_id"))
+            st.session_state["session_id"] = session_id
+            text_accum = render_stream(events, response_placeholder.markdown, show_tool)
             st.session_state.messages.append({"role":"assistant","content":text_accum})
 
     except Exception as e:
         st.session_state.messages.append({"role": "assistant", "content": f"Error: {str(e)}"})
-        st.chat_message("assistant").write(f"Error: {str(e)}")
\ No newline at end of file
+        st.chat_message("assistant").write(f"Error: {str(e)}")
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the tests import the host as `src....`, and the server modules and the Streamlit
+# client by their bare names, the way they import each other when run as scripts
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "src", "mcp-server"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "streamlit_app"))
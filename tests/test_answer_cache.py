@@ -0,0 +1,63 @@
+import pytest
+from response_cache import TOOL_TTLS as SERVER_TOOL_TTLS
+from src.host.answer_cache import TOOL_TTLS, AnswerCache, normalize_query, same_question
+
+
+@pytest.fixture
+def answers():
+    cache = AnswerCache(max_entries=8)
+    cache.set("Is ibuprofen safe during pregnancy?", "Ask a doctor.", ["search_drug"])
+    cache.set("What are the warnings for ibuprofen?", "Stomach bleeding.", ["search_drug"])
+    return cache
+
+
+def test_ttls_are_shared_with_the_servers():
+    assert all(TOOL_TTLS[tool] == ttl for tool, ttl in SERVER_TOOL_TTLS.items())
+    assert "read_tool_result" in TOOL_TTLS
+
+
+def test_rephrasing_hits(answers):
+    assert answers.get("what are the warnings of ibuprofen") == "Stomach bleeding."
+    assert answers.get("what is the warning for ibuprofen") == "Stomach bleeding."
+    assert answers.counters["hits"] == 1
+    assert answers.counters["similar_hits"] == 1
+
+
+def test_word_order_is_kept():
+    assert normalize_query("Does aspirin increase warfarin levels?") == "aspirin increase warfarin levels"
+
+
+@pytest.mark.parametrize("cached, query", [
+    ("Does aspirin increase warfarin levels?", "Does warfarin increase aspirin levels?"),
+    ("trials of drug A after drug B failed", "trials of drug B after drug A failed"),
+])
+def test_reversed_direction_misses(cached, query):
+    cache = AnswerCache(max_entries=8)
+    cache.set(cached, "answer", ["search_drug"])
+    assert cache.get(query) is None
+    assert cache.get(cached) == "answer"
+
+
+@pytest.mark.parametrize("query", [
+    "Is ibuprofen unsafe during pregnancy?",
+    "Is ibuprofen not safe during pregnancy?",
+    "What are the warnings for naproxen?",
+])
+def test_different_question_misses(answers, query):
+    assert answers.get(query) is None
+
+
+@pytest.mark.parametrize("a, b, same", [
+    ("breast cancer clinical trials", "breast cancers clinical trial", True),
+    ("aspirin effective", "aspirin ineffective", False),
+    ("phase 2 trials", "phase 3 trials", False),
+    ("aspirin warfarin interaction", "warfarin aspirin interaction", False),
+])
+def test_same_question(a, b, same):
+    assert same_question(normalize_query(a), normalize_query(b)) is same
+
+
+def test_answers_using_uncached_tools_are_not_stored():
+    cache = AnswerCache(max_entries=8)
+    assert not cache.set("read /etc/hosts", "...", ["read_file"])
+    assert cache.get("read /etc/hosts") is None
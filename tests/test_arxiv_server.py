@@ -0,0 +1,54 @@
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import arxiv
+import pytest
+from rate_limit import RateLimiter
+from benchmarks.stub_upstreams import serve
+
+HOST = "127.0.0.1"
+
+
+@pytest.fixture
+def arxiv_server(tmp_path, monkeypatch):
+    """arxiv_server pointed at a stub upstream, with a limiter that counts every request to it."""
+    server = serve(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("arxiv_server")
+    monkeypatch.setattr(module, "ARXIV_API_URL", f"http://{HOST}:{server.server_address[1]}/arxiv/api/query")
+    monkeypatch.setattr(module, "ARXIV_HOST", HOST)
+    limiter = RateLimiter(path=str(tmp_path / "rate_limits.sqlite"), limits={HOST: (1000.0, 1000)}, enabled=True)
+    monkeypatch.setattr(module, "limiter", limiter)
+    monkeypatch.setattr(module, "clients", threading.local())
+    yield module
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_searches(arxiv_server):
+    topics = [f"topic {number}" for number in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda topic: arxiv_server.fetch_topic(topic, 5), topics))
+    assert all(len(papers) == 5 for papers in results)
+    assert arxiv_server.limiter.counters["requests"] == len(topics)
+
+
+def test_every_page_waits_for_the_limiter(arxiv_server):
+    client = arxiv_server.PacedClient(page_size=10)
+    papers = list(client.results(arxiv.Search(query="anything", max_results=25)))
+    assert len(papers) == 25
+    assert arxiv_server.limiter.counters["requests"] == 3
+
+
+def test_each_thread_reuses_its_client(arxiv_server):
+    closed = []
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        client = pool.submit(arxiv_server.get_client).result()
+        client._session.close = lambda: closed.append(True)
+        for topic in ("first", "second"):
+            pool.submit(arxiv_server.fetch_topic, topic, 5).result()
+        assert pool.submit(arxiv_server.get_client).result() is client
+    assert client is not arxiv_server.get_client()
+    # searches leave the session, and its pooled connections, open for the next one
+    assert not closed
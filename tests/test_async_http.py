@@ -0,0 +1,118 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import pytest
+import async_http
+from rate_limit import RateLimiter
+from benchmarks.stub_upstreams import serve
+
+HOST = "127.0.0.1"
+LABEL_QUERY = {"search": "openfda.brand_name:advil", "limit": 1}
+
+
+@pytest.fixture
+def stub():
+    """Start a stub upstream; call the fixture with its --rate-limit and get its base URL."""
+    servers = []
+
+    def start(rate_limit: float = 0.0) -> str:
+        server = serve(0, rate_limit=rate_limit)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://{HOST}:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def use_limiter(tmp_path, monkeypatch):
+    """Install a limiter with the given per-host limits in async_http, and a fresh client per test."""
+    monkeypatch.setattr(async_http, "_client", None)
+    monkeypatch.setattr(async_http, "backoff", lambda attempt: 0.0)
+
+    def install(limits: dict) -> RateLimiter:
+        limiter = RateLimiter(path=str(tmp_path / "rate_limits.sqlite"), limits=limits, enabled=True)
+        monkeypatch.setattr(async_http, "limiter", limiter)
+        return limiter
+
+    return install
+
+
+def fetch(url: str, params: dict, count: int = 1, **kwargs):
+    """Seconds taken and status codes of `count` concurrent GETs."""
+    async def run():
+        start = time.monotonic()
+        try:
+            responses = await asyncio.gather(*(async_http.get(url, params, **kwargs) for _ in range(count)))
+        finally:
+            await async_http.get_client().aclose()
+        return time.monotonic() - start, [r.status_code for r in responses]
+
+    return asyncio.run(run())
+
+
+def test_retry_after_is_honoured(stub, use_limiter):
+    # the stub refuses the second request within a second, with Retry-After: 1
+    base_url = stub(rate_limit=1)
+    use_limiter({})
+    seconds, statuses = fetch(base_url + "/openfda/drug/label.json", params=LABEL_QUERY, count=2)
+    assert statuses == [200, 200]
+    assert 0.9 <= seconds < 3
+
+
+def test_429_drains_the_shared_bucket(stub, use_limiter):
+    base_url = stub(rate_limit=1)
+    limiter = use_limiter({HOST: (100.0, 10)})
+    seconds, statuses = fetch(base_url + "/openfda/drug/label.json", params=LABEL_QUERY, count=2)
+    assert statuses == [200, 200]
+    assert limiter.counters["throttled"] == 1
+    # the retry waited for the Retry-After delay in the limiter rather than in a plain sleep
+    assert limiter.counters["delayed"] >= 1
+    assert seconds >= 0.9
+
+
+def test_token_bucket_paces_requests(stub, use_limiter):
+    base_url = stub()
+    limiter = use_limiter({HOST: (10.0, 2)})
+    seconds, statuses = fetch(base_url + "/openfda/drug/label.json", params=LABEL_QUERY, count=6)
+    assert statuses == [200] * 6
+    # two requests go at once from the burst, the other four are spaced 0.1 s apart
+    assert limiter.counters["delayed"] == 4
+    assert 0.35 <= seconds < 1.5
+
+
+def test_last_response_is_returned_when_retries_run_out(stub, use_limiter):
+    base_url = stub(rate_limit=1)
+    use_limiter({})
+    _, statuses = fetch(base_url + "/openfda/drug/label.json", params=LABEL_QUERY, count=2, retries=0)
+    assert sorted(statuses) == [200, 429]
+
+
+def test_wait_does_not_block_the_event_loop(tmp_path):
+    limiter = RateLimiter(path=str(tmp_path / "rate_limits.sqlite"), limits={HOST: (10.0, 2)}, enabled=True)
+    limiter.reserve(HOST)  # creates the table
+    # another process holds the write lock for a moment
+    other = sqlite3.connect(str(tmp_path / "rate_limits.sqlite"), isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, lambda: other.execute("COMMIT")).start()
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await limiter.wait(HOST)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+    other.close()
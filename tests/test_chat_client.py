@@ -0,0 +1,84 @@
+import pytest
+import requests
+import chat_client
+from chat_client import render_stream, stream_chat
+
+
+class FakeResponse:
+    def __init__(self, lines, status=200):
+        self.lines = lines
+        self.status_code = status
+        self.headers = {"X-Session-Id": "abc"}
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+    def iter_lines(self, chunk_size=None, decode_unicode=False):
+        yield from self.lines
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.kwargs = None
+
+    def post(self, url, **kwargs):
+        self.kwargs = kwargs
+        return self.response
+
+
+def sse(*events):
+    lines = []
+    for event, data in events:
+        lines += [f"event: {event}", f"data: {data}", ""]
+    return lines
+
+
+def start(lines, status=200):
+    response = FakeResponse(lines, status)
+    session = FakeSession(response)
+    session_id, events = stream_chat(session, "ibuprofen", url="http://backend/chat")
+    return response, session, session_id, events
+
+
+def test_timeouts_are_passed():
+    _, session, session_id, _ = start(sse(("done", "{}")))
+    assert session.kwargs["timeout"] == (chat_client.CONNECT_TIMEOUT, chat_client.READ_TIMEOUT)
+    assert session_id == "abc"
+
+
+def test_closed_after_done():
+    # events after done are never read, but the response is still closed
+    response, _, _, events = start(sse(("token", '{"text": "Hi"}'), ("done", "{}"), ("token", '{"text": "!"}')))
+    assert render_stream(events, lambda text: None, lambda event, data: None) == "Hi"
+    assert response.closed
+
+
+def test_closed_after_error_event():
+    response, _, _, events = start(sse(("error", '{"message": "boom"}')))
+    with pytest.raises(RuntimeError, match="boom"):
+        render_stream(events, lambda text: None, lambda event, data: None)
+    assert response.closed
+
+
+def test_closed_when_a_renderer_raises():
+    response, _, _, events = start(sse(("tool_start", '{"name": "search_drug"}'), ("done", "{}")))
+
+    def render_tool(event, data):
+        raise ValueError("renderer failed")
+
+    with pytest.raises(ValueError):
+        render_stream(events, lambda text: None, render_tool)
+    assert response.closed
+
+
+def test_closed_on_http_error():
+    response = FakeResponse([], status=503)
+    with pytest.raises(requests.HTTPError):
+        stream_chat(FakeSession(response), "ibuprofen", url="http://backend/chat")
+    assert response.closed
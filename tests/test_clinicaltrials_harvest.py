@@ -0,0 +1,92 @@
+import asyncio
+import importlib
+import json
+import pytest
+from trial_store import TrialStore
+
+STUDIES = [
+    {"protocolSection": {
+        "identificationModule": {"nctId": f"NCT{number:08d}", "briefTitle": f"Study {number}"},
+        "designModule": {"phases": ["PHASE3"]},
+    }}
+    for number in range(25)
+]
+
+
+class FakeResponse:
+    def __init__(self, body: dict):
+        self.status_code = 200
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """clinicaltrials_server with its own trial store and an upstream of 25 studies."""
+    module = importlib.import_module("clinicaltrials_server")
+    monkeypatch.setattr(module, "store", TrialStore(str(tmp_path / "trials.sqlite")))
+    requests = []
+
+    async def get(url, params=None):
+        requests.append(dict(params))
+        start = int(params.get("pageToken") or 0)
+        end = start + int(params["pageSize"])
+        body = {"studies": STUDIES[start:end], "totalCount": len(STUDIES)}
+        if end < len(STUDIES):
+            body["nextPageToken"] = str(end)
+        return FakeResponse(body)
+
+    monkeypatch.setattr(module.async_http, "get", get)
+    module.requests = requests
+    return module
+
+
+def harvest(server, **kwargs) -> dict:
+    return asyncio.run(server.harvest_clinical_trials(cond="asthma", **kwargs))
+
+
+def test_iter_pages_trims_the_last_page(server):
+    async def collect():
+        return [page async for page in server.iter_pages({"pageSize": 10}, limit=15)]
+
+    pages = asyncio.run(collect())
+    assert [len(page["studies"]) for page in pages] == [10, 5]
+    assert [request["pageSize"] for request in server.requests] == [10, 5]
+
+
+def test_harvest_stops_at_max_studies_and_resumes(server, monkeypatch):
+    monkeypatch.setattr(server, "HARVEST_PAGE_SIZE", 10)
+    first = harvest(server, max_studies=15)
+    assert first == {"studies": 15, "total": 25, "complete": False, "pages_fetched": 2}
+
+    second = harvest(server, max_studies=15)
+    assert second == {"studies": 25, "total": 25, "complete": True, "pages_fetched": 1}
+    # the resumed harvest started from the token saved after the first
+    assert server.requests[2]["pageToken"] == "15"
+
+    # a complete harvest is not fetched again unless refreshed
+    assert harvest(server)["pages_fetched"] == 0
+    assert harvest(server, refresh=True) == {"studies": 25, "total": 25, "complete": True, "pages_fetched": 3}
+    assert len(server.requests) == 6
+
+
+def test_harvest_reports_upstream_errors(server, monkeypatch):
+    async def failing(url, params=None):
+        response = FakeResponse({})
+        response.status_code = 503
+        return response
+
+    monkeypatch.setattr(server.async_http, "get", failing)
+    result = harvest(server)
+    assert result["error"].startswith("Harvest stopped after 0 studies")
+    assert result["pages_fetched"] == 0
+
+
+def test_harvest_log_goes_to_stderr(server, capsys):
+    harvest(server, max_studies=5)
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Harvested 1 pages" in captured.err
+    assert json.dumps({"cond": "asthma"}) in captured.err
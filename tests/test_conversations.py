@@ -0,0 +1,26 @@
+from src.host.conversations import ConversationStore
+
+
+def test_unknown_session_id_gets_a_fresh_one():
+    store = ConversationStore()
+    conversation = store.get("chosen-by-client")
+    assert conversation.session_id != "chosen-by-client"
+    assert "chosen-by-client" not in store.conversations
+    assert store.get(conversation.session_id) is conversation
+
+
+def test_expired_session_id_gets_a_fresh_one():
+    store = ConversationStore(idle_ttl=0)
+    first = store.get()
+    second = store.get(first.session_id)
+    assert second is not first
+    assert second.session_id != first.session_id
+
+
+def test_least_recently_used_sessions_are_evicted():
+    store = ConversationStore(max_sessions=2)
+    a, b = store.get(), store.get()
+    store.get(a.session_id)
+    store.get()
+    assert a.session_id in store.conversations
+    assert b.session_id not in store.conversations
@@ -0,0 +1,25 @@
+import io
+import os
+import pytest
+import requests
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from chat_client import read_events
+from src.fastapi_app import sse_event
+
+
+def response_with(body: str) -> requests.Response:
+    """A streamed response the way requests builds it, reading `body` from the socket."""
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(body.encode("utf-8"))
+    response.encoding = "utf-8"
+    return response
+
+
+@pytest.mark.parametrize("text", ["line\u2028separator", "paragraph\u2029separator", "next\u0085line", "naïve ✓"])
+def test_events_survive_unicode_line_breaks(text):
+    body = sse_event("token", {"text": text}) + sse_event("done", {"session_id": "abc"})
+    events = list(read_events(response_with(body)))
+    assert events == [("token", {"text": text}), ("done", {"session_id": "abc"})]
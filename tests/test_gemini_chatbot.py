@@ -0,0 +1,45 @@
+import asyncio
+import os
+from google.genai import types
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from benchmarks.chat_load import StubPool
+from src.host import gemini_chatbot
+from src.host.gemini_chatbot import GeminiChatBot
+
+
+def chatbot_with(tool_latency: float) -> GeminiChatBot:
+    """A chatbot whose tools all take `tool_latency` seconds."""
+    chatbot = GeminiChatBot()
+    chatbot.gemini_client.pools["pdb_server"] = StubPool(tool_latency)
+    for name in ("search_pdb_ids", "search_similar_sequences_batch"):
+        chatbot.gemini_client.tool_server_map[name] = "pdb_server"
+    return chatbot
+
+
+def call(chatbot: GeminiChatBot, name: str) -> dict:
+    part = asyncio.run(chatbot.call_tool(types.FunctionCall(name=name, args={})))
+    return part.function_response.response
+
+
+def test_over_budget_call_is_reported_as_timed_out(monkeypatch):
+    monkeypatch.setattr(gemini_chatbot, "TOOL_CALL_TIMEOUT", 0.05)
+    response = call(chatbot_with(tool_latency=0.3), "search_pdb_ids")
+    assert response == {"error": "Tool search_pdb_ids timed out after 0.05 seconds."}
+
+
+def test_batch_tools_get_their_own_budget(monkeypatch):
+    monkeypatch.setattr(gemini_chatbot, "TOOL_CALL_TIMEOUT", 0.05)
+    monkeypatch.setitem(gemini_chatbot.TOOL_TIMEOUTS, "search_similar_sequences_batch", 2)
+    chatbot = chatbot_with(tool_latency=0.3)
+    assert call(chatbot, "search_similar_sequences_batch") == {"result": [{}]}
+    # still bounded by that budget
+    monkeypatch.setitem(gemini_chatbot.TOOL_TIMEOUTS, "search_similar_sequences_batch", 0.1)
+    assert "timed out after 0.1 seconds" in call(chatbot, "search_similar_sequences_batch")["error"]
+
+
+def test_default_budgets_fit_the_batch_limits():
+    # a full batch of remote sequence searches, paced at 5 requests/s, fits its budget
+    assert gemini_chatbot.TOOL_TIMEOUTS["search_similar_sequences_batch"] >= 500 / 5 * 2
+    assert gemini_chatbot.TOOL_TIMEOUTS["search_papers_batch"] >= 10 * 3 * 2
@@ -0,0 +1,84 @@
+import json
+import zipfile
+import pytest
+from label_index import LabelIndex, build
+
+
+def label(label_id, effective_time="20240101", **openfda):
+    return {"id": label_id, "effective_time": effective_time, "openfda": openfda, "warnings": [f"{label_id} warning"]}
+
+
+LABELS = [
+    label("advil-old", "20200101", brand_name=["Advil"], generic_name=["Ibuprofen"]),
+    label("advil", "20240101", brand_name=["Advil"], generic_name=["Ibuprofen"]),
+    label("motrin", "20240601", brand_name=["Motrin IB"], generic_name=["IBUPROFEN"]),
+    # a brand name beats a newer label that only has it as the generic name
+    label("generic-advil", "20250101", generic_name=["ADVIL"]),
+    label("tylenol", brand_name=["Tylenol"], generic_name=["Acetaminophen"], substance_name=["ACETAMINOPHEN"]),
+]
+
+
+def write_dump(path, labels):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("drug-label-0001-of-0001.json", json.dumps({"results": labels}))
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    dumps = tmp_path / "dumps"
+    dumps.mkdir()
+    write_dump(dumps / "drug-label-0001-of-0001.json.zip", LABELS)
+    counts = build([str(dumps)], str(tmp_path / "index"))
+    assert counts == {"files": 1, "labels": 5, "names": 5, "records": 3}
+    return tmp_path / "index"
+
+
+@pytest.fixture
+def index(index_dir):
+    index = LabelIndex.open(str(index_dir))
+    yield index
+    index.close()
+
+
+def test_missing_index_is_none(tmp_path):
+    assert LabelIndex.open(str(tmp_path / "nothing")) is None
+
+
+def test_exact_match_ignores_case_and_spacing(index):
+    assert index.get("advil")["id"] == "advil"
+    assert index.get("  Motrin   ib ")["id"] == "motrin"
+    assert index.get("acetaminophen")["id"] == "tylenol"
+    assert index.get("naproxen") is None
+
+
+def test_preferred_label_wins(index):
+    # the newest label naming it as a brand; the generic name goes to the newest label with it
+    assert index.get("Advil")["id"] == "advil"
+    assert index.get("Ibuprofen")["id"] == "motrin"
+
+
+def test_prefix_and_misspelled_names(index):
+    assert index.match("mot") == ["motrin ib"]
+    assert index.match("ibuprofin") == ["ibuprofen"]
+    name, found = index.closest("Tylenoll")
+    assert name == "tylenol"
+    assert found["id"] == "tylenol"
+    assert index.closest("xyz") is None
+
+
+def test_rebuild_picks_up_changed_source(index_dir, index, tmp_path):
+    dumps = tmp_path / "dumps"
+    changed = [label("advil", "20250601", brand_name=["Advil"]), label("aleve", brand_name=["Aleve"])]
+    write_dump(dumps / "drug-label-0001-of-0001.json.zip", changed)
+    build([str(dumps)], str(index_dir))
+
+    rebuilt = LabelIndex.open(str(index_dir))
+    try:
+        assert rebuilt.get("aleve")["id"] == "aleve"
+        assert rebuilt.get("tylenol") is None
+        assert rebuilt.get("advil")["effective_time"] == "20250601"
+    finally:
+        rebuilt.close()
+    # an index opened before the rebuild keeps reading the files it mapped
+    assert index.get("tylenol")["id"] == "tylenol"
+    assert not list(index_dir.glob("*.tmp"))
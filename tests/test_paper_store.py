@@ -0,0 +1,50 @@
+import json
+import sqlite3
+from paper_store import PaperStore
+
+PAPERS = {
+    "2101.00001": {"title": "Protein folding with transformers", "authors": ["A. Author"],
+                   "summary": "Deep learning predicts protein structures.", "pdf_url": None, "published": "2021-01-01"},
+    "2101.00002": {"title": "Graph networks", "authors": ["B. Author"],
+                   "summary": "Message passing on graphs.", "pdf_url": None, "published": "2021-01-02"},
+    "2101.00003": {"title": "Folding kinetics", "authors": ["C. Author"],
+                   "summary": "How fast a protein folds.", "pdf_url": None, "published": "2021-01-03"},
+}
+
+
+def ids(results):
+    return [paper["paper_id"] for paper in results]
+
+
+def test_search_survives_vacuum(tmp_path):
+    store = PaperStore(str(tmp_path / "papers.sqlite"))
+    store.save_papers("proteins", PAPERS)
+    # a deleted row leaves a gap that VACUUM would close by renumbering implicit rowids
+    store.db.execute("DELETE FROM papers WHERE paper_id = '2101.00001'")
+    store.db.execute("VACUUM")
+    assert ids(store.search("protein")) == ["2101.00003"]
+    store.save_papers("proteins", {"2101.00002": dict(PAPERS["2101.00002"], summary="Graphs of protein contacts.")})
+    assert sorted(ids(store.search("protein"))) == ["2101.00002", "2101.00003"]
+
+
+def test_database_without_paper_ids_is_migrated(tmp_path):
+    path = str(tmp_path / "papers.sqlite")
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE papers (paper_id TEXT PRIMARY KEY, title TEXT NOT NULL, authors TEXT NOT NULL,
+                             summary TEXT NOT NULL, pdf_url TEXT, published TEXT);
+        CREATE TABLE topic_papers (topic TEXT NOT NULL, paper_id TEXT NOT NULL REFERENCES papers (paper_id),
+                                   added_at INTEGER NOT NULL, PRIMARY KEY (topic, paper_id));
+    """)
+    for number, (paper_id, info) in enumerate(PAPERS.items()):
+        db.execute("INSERT INTO papers VALUES (?, ?, ?, ?, ?, ?)",
+                   (paper_id, info["title"], json.dumps(info["authors"]), info["summary"], None, info["published"]))
+        db.execute("INSERT INTO topic_papers VALUES ('proteins', ?, ?)", (paper_id, number))
+    db.commit()
+    db.close()
+
+    store = PaperStore(path)
+    assert list(store.get_topic_papers("proteins")) == list(PAPERS)
+    assert sorted(ids(store.search("protein"))) == ["2101.00001", "2101.00003"]
+    columns = [row[1] for row in store.db.execute("PRAGMA table_info(papers)")]
+    assert columns[:2] == ["id", "paper_id"]
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from types import SimpleNamespace
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from benchmarks import plan_bench
+from src.host.planner import PlanError, parse_plan, pick, resolve_args
+
+TOOLS = ["search_drug", "search_pdb_ids", "extract_pdb_data_batch"]
+
+
+def ids(steps):
+    return [step.id for step in steps]
+
+
+def test_steps_come_after_their_dependencies():
+    plan = """```json
+    {"steps": [
+        {"id": "s3", "tool": "extract_pdb_data_batch", "args": {"pdb_ids": "$s2"}},
+        {"id": "s2", "tool": "search_pdb_ids", "args": {"query": "$s1.name"}, "depends_on": ["s1"]},
+        {"id": "s1", "tool": "search_drug", "args": {"drug_name": "aspirin"}}
+    ]}
+    ```"""
+    steps = parse_plan(plan, TOOLS)
+    assert ids(steps) == ["s1", "s2", "s3"]
+    # a reference in the arguments is a dependency even when depends_on leaves it out
+    assert steps[2].depends_on == ["s2"]
+
+
+def test_independent_steps_keep_their_order():
+    plan = '{"steps": [{"tool": "search_drug", "args": {"drug_name": "a"}}, {"tool": "search_drug"}]}'
+    steps = parse_plan(plan, TOOLS)
+    assert ids(steps) == ["s1", "s2"]
+    assert steps[1].args == {}
+
+
+@pytest.mark.parametrize("plan, message", [
+    ('{"steps": [{"id": "a", "tool": "search_drug", "depends_on": ["b"]},'
+     ' {"id": "b", "tool": "search_drug", "args": {"drug_name": "$a"}}]}', "cycle"),
+    ('{"steps": [{"id": "a", "tool": "search_drug", "args": {"drug_name": "$a.name"}}]}', "cycle"),
+    ('{"steps": [{"id": "a", "tool": "search_drug", "depends_on": ["s9"]}]}', "unknown steps s9"),
+    ('{"steps": [{"id": "a", "tool": "search_drug", "args": {"drug_name": "$s9.0"}}]}', "unknown steps s9"),
+    ('{"steps": [{"id": "a", "tool": "delete_everything"}]}', "unknown tool"),
+    ('{"steps": [{"id": "a", "tool": "search_drug"}, {"id": "a", "tool": "search_drug"}]}', "used twice"),
+    ('{"steps": [{"id": "a", "tool": "search_drug", "args": ["aspirin"]}]}', "not an object"),
+    ('{"steps": ["search_drug"]}', "not an object"),
+    ('{"plan": []}', "no list of steps"),
+    ('Sure! First I will search for aspirin.', "not JSON"),
+])
+def test_unusable_plans_are_refused(plan, message):
+    with pytest.raises(PlanError, match=message):
+        parse_plan(plan, TOOLS)
+
+
+def test_plan_size_is_capped(monkeypatch):
+    monkeypatch.setattr("src.host.planner.MAX_PLAN_STEPS", 2)
+    with pytest.raises(PlanError, match="more than 2"):
+        parse_plan('{"steps": [{"tool": "search_drug"}, {"tool": "search_drug"}, {"tool": "search_drug"}]}', TOOLS)
+
+
+OUTPUTS = {
+    "s1": [{"pdb_id": "4HHB", "chains": [{"id": "A"}, {"id": "B"}]}, {"pdb_id": "1E10", "chains": []}],
+    "s2": {"drug": {"names": ["aspirin", "ASA"]}},
+}
+
+
+@pytest.mark.parametrize("reference, value", [
+    ("$s1", OUTPUTS["s1"]),
+    ("$s1.*.pdb_id", ["4HHB", "1E10"]),
+    ("$s1.0.pdb_id", "4HHB"),
+    ("$s1.0.chains.*.id", ["A", "B"]),
+    ("$s1.*.chains.*.id", [["A", "B"], []]),
+    ("$s2.drug.names.1", "ASA"),
+])
+def test_references_are_resolved(reference, value):
+    assert resolve_args(reference, OUTPUTS) == value
+
+
+def test_references_nested_in_arguments_are_resolved():
+    args = {"pdb_ids": "$s1.*.pdb_id", "filters": {"name": "$s2.drug.names.0", "extra": ["$s1.1.pdb_id", 3]},
+            "note": "costs $5", "limit": 10}
+    assert resolve_args(args, OUTPUTS) == {
+        "pdb_ids": ["4HHB", "1E10"], "filters": {"name": "aspirin", "extra": ["1E10", 3]},
+        "note": "costs $5", "limit": 10,
+    }
+
+
+@pytest.mark.parametrize("path, message", [
+    (["5"], "No item 5"),
+    (["x"], "No item x"),
+    (["0", "title"], "No field 'title'"),
+    (["0", "pdb_id", "x"], "Cannot pick 'x' from a str"),
+    (["0", "*"], r"Cannot take every item of a dict"),
+])
+def test_bad_paths_are_plan_errors(path, message):
+    with pytest.raises(PlanError, match=message):
+        pick(OUTPUTS["s1"], path)
+
+
+@pytest.mark.parametrize("reply", [
+    "I will look these up one by one.",
+    {"steps": [{"id": "s1", "tool": "no_such_tool", "args": {}}]},
+    {"steps": [{"id": "s1", "tool": "search_drug", "args": {}, "depends_on": ["s1"]}]},
+])
+def test_unusable_plan_falls_back_to_the_tool_loop(reply):
+    args = SimpleNamespace(model_latency=0, tool_latency=0, chats=1)
+    result = asyncio.run(plan_bench.run(args, True, reply))
+    # the planning call, then one turn per tool call and the answer, as without a plan
+    assert result["model_calls"] == 2 + len(plan_bench.CALLS)
+    assert result["tool_calls"] == len(plan_bench.CALLS)
+
+
+def test_usable_plan_runs_every_step():
+    args = SimpleNamespace(model_latency=0, tool_latency=0, chats=1)
+    result = asyncio.run(plan_bench.run(args, True, plan_bench.PLAN))
+    assert result["model_calls"] == 2
+    assert result["tool_calls"] == len(plan_bench.CALLS)
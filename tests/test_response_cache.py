@@ -0,0 +1,286 @@
+import asyncio
+import time
+import pytest
+import response_cache
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"), memory_entries=2, enabled=True)
+    yield cache
+    cache.db.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() as seen by response_cache."""
+    now = [time.time()]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    return now
+
+
+def counting(cache, ttl=60, **options):
+    """A cached async tool that records the arguments of every real call."""
+    calls = []
+
+    @cache.cached(ttl=ttl, **options)
+    async def lookup(name: str, limit: int = 5):
+        calls.append((name, limit))
+        return {"name": name, "limit": limit}
+
+    return lookup, calls
+
+
+def test_hit_after_miss(cache):
+    lookup, calls = counting(cache)
+
+    async def run():
+        first = await lookup("ibuprofen")
+        second = await lookup("ibuprofen", limit=5)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"name": "ibuprofen", "limit": 5}
+    assert calls == [("ibuprofen", 5)]
+    assert cache.counters["misses"] == 1
+    assert cache.counters["memory_hits"] == 1
+
+
+def test_equivalent_arguments_share_a_key(cache):
+    lookup, calls = counting(cache)
+
+    async def run():
+        await lookup("Ibuprofen")
+        await lookup("  ibuprofen ")
+        await lookup("ibuprofen", limit=10)
+
+    asyncio.run(run())
+    assert calls == [("Ibuprofen", 5), ("ibuprofen", 10)]
+
+
+def test_entries_expire_after_ttl(cache, clock):
+    lookup, calls = counting(cache, ttl=60)
+
+    async def run():
+        await lookup("aspirin")
+        clock[0] += 59
+        await lookup("aspirin")
+        clock[0] += 2
+        await lookup("aspirin")
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert cache.stats()["disk_entries"] == 1
+
+
+def test_error_payloads_are_not_cached(cache):
+    calls = []
+
+    @cache.cached(ttl=60)
+    async def lookup(name: str):
+        calls.append(name)
+        return {"error": "upstream unavailable"}
+
+    async def run():
+        await lookup("aspirin")
+        await lookup("aspirin")
+
+    asyncio.run(run())
+    assert calls == ["aspirin", "aspirin"]
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_memory_eviction_falls_back_to_disk(cache):
+    lookup, calls = counting(cache)
+
+    async def run():
+        for name in ("a", "b", "c"):
+            await lookup(name)
+        # "a" was pushed out of the two-entry memory LRU but is still on disk
+        assert await lookup("a") == {"name": "a", "limit": 5}
+
+    asyncio.run(run())
+    assert len(calls) == 3
+    assert cache.counters["disk_hits"] == 1
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_eviction_drops_least_recently_used(tmp_path, clock):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"), max_disk_bytes=250, enabled=True)
+    value = "x" * 100
+    for key in ("a", "b"):
+        cache.set(key, "tool", value, ttl=60)
+        clock[0] += 1
+    cache.get("a")  # in memory, so only the memory LRU is touched
+    cache.memory.clear()
+    clock[0] += 1
+    assert cache.get("a")[0]  # now the disk row's accessed_at is bumped too
+    clock[0] += 1
+    cache.set("c", "tool", value, ttl=60)
+
+    assert cache.counters["evictions"] == 1
+    cache.memory.clear()
+    assert cache.get("a")[0]
+    assert not cache.get("b")[0]
+    assert cache.get("c")[0]
+    cache.db.close()
+
+
+def test_concurrent_identical_calls_are_collapsed(cache):
+    calls = []
+
+    @cache.cached(ttl=60)
+    async def slow(name: str):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return [name]
+
+    async def run():
+        return await asyncio.gather(*(slow("aspirin") for _ in range(5)), slow("naproxen"))
+
+    results = asyncio.run(run())
+    assert results == [["aspirin"]] * 5 + [["naproxen"]]
+    assert sorted(calls) == ["aspirin", "naproxen"]
+    assert cache.counters["collapsed"] == 4
+
+
+def test_collapsed_calls_share_the_exception(cache):
+    calls = []
+
+    @cache.cached(ttl=60)
+    async def failing(name: str):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(failing("aspirin") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == ["aspirin"]
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_waiter_fetches_again_when_leader_is_cancelled(cache):
+    calls = []
+
+    @cache.cached(ttl=60)
+    async def slow(name: str):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return name
+
+    async def run():
+        leader = asyncio.create_task(slow("aspirin"))
+        # the leader looks up the disk in a thread before it starts the fetch
+        while not cache._pending:
+            await asyncio.sleep(0.001)
+        waiter = asyncio.create_task(slow("aspirin"))
+        while not cache.counters["collapsed"]:
+            await asyncio.sleep(0.001)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(run()) == "aspirin"
+    assert calls == ["aspirin", "aspirin"]
+
+
+def test_sync_tools_run_in_a_thread(cache):
+    import threading
+    threads = []
+
+    @cache.cached(ttl=60)
+    def lookup(name: str):
+        threads.append(threading.current_thread())
+        return name.upper()
+
+    assert asyncio.run(lookup("aspirin")) == "ASPIRIN"
+    assert threads[0] is not threading.main_thread()
+
+
+def test_invalidate_one_tool(cache):
+    cache.set(cache.make_key("search_drug", {"drug_name": "a"}), "search_drug", 1, ttl=60)
+    cache.set(cache.make_key("search_papers", {"topic": "a"}), "search_papers", 2, ttl=60)
+    cache.invalidate("search_drug")
+    assert not cache.get(cache.make_key("search_drug", {"drug_name": "a"}))[0]
+    assert cache.get(cache.make_key("search_papers", {"topic": "a"})) == (True, 2)
+
+
+def test_disabled_cache_still_collapses(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"), enabled=False)
+    calls = []
+
+    @cache.cached(ttl=60)
+    async def slow(name: str):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return name
+
+    async def run():
+        await asyncio.gather(slow("a"), slow("a"))
+        await slow("a")
+
+    asyncio.run(run())
+    # the two concurrent calls share one fetch, the later one is not served from a cache
+    assert calls == ["a", "a"]
+
+
+def test_ttl_defaults_to_the_tool_entry(cache, clock, monkeypatch):
+    monkeypatch.setitem(response_cache.TOOL_TTLS, "lookup", 60)
+    lookup, calls = counting(cache, ttl=None)
+
+    async def run():
+        await lookup("aspirin")
+        clock[0] += 61
+        await lookup("aspirin")
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_size_limit_is_not_scanned_on_every_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "EVICT_EVERY", 4)
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"), max_disk_bytes=10_000, enabled=True)
+    scans = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda now: (scans.append(now), evict(now)))
+    for i in range(9):
+        cache.set(f"k{i}", "tool", "x" * 10, ttl=60)
+    # the first write measures the table, then every fourth write
+    assert len(scans) == 3
+    # a write that takes the running total over the limit scans at once
+    cache.set("big", "tool", "x" * 20_000, ttl=60)
+    assert len(scans) == 4
+    assert cache.counters["evictions"] >= 1
+    cache.db.close()
+
+
+def test_locked_database_does_not_block_the_event_loop(cache):
+    import sqlite3
+    import threading
+    lookup, calls = counting(cache)
+    cache.stats()  # creates the table
+    # another process holds the write lock for a moment
+    other = sqlite3.connect(cache.path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN EXCLUSIVE")
+    threading.Timer(0.3, lambda: other.execute("COMMIT")).start()
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await lookup("aspirin")
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+    assert calls == [("aspirin", 5)]
+    other.close()
@@ -0,0 +1,58 @@
+import json
+from mcp.types import CallToolResult, ImageContent, TextContent
+from src.client.result_compaction import ResultCompactor, content_value
+
+
+def result(*items, is_error=False) -> CallToolResult:
+    """A CallToolResult the way FastMCP builds it: one text block per list item."""
+    content = [TextContent(type="text", text=item if isinstance(item, str) else json.dumps(item)) for item in items]
+    return CallToolResult(content=content, isError=is_error)
+
+
+def test_single_value_is_unwrapped():
+    assert ResultCompactor().compact("search_drug", result({"warnings": ["x"]})) == {"warnings": ["x"]}
+
+
+def test_one_item_list_keeps_its_shape():
+    compactor = ResultCompactor()
+    assert compactor.compact("search_pdb_ids", result("4HHB")) == ["4HHB"]
+    assert compactor.compact("extract_pdb_data_batch", result({"pdb_id": "4HHB"})) == [{"pdb_id": "4HHB"}]
+
+
+def test_ids_that_look_like_numbers_stay_text():
+    compactor = ResultCompactor()
+    assert compactor.compact("search_pdb_ids", result("1E10", "2E12", "4HHB")) == ["1E10", "2E12", "4HHB"]
+    assert compactor.compact("search_pdb_ids", result("3E50")) == ["3E50"]
+    assert content_value(result("1E10").content) == "1E10"
+
+
+def test_multi_content_and_empty_results_are_lists():
+    compactor = ResultCompactor()
+    assert compactor.compact("search_drug", result({"a": 1}, {"b": 2})) == [{"a": 1}, {"b": 2}]
+    assert compactor.compact("search_pdb_ids", CallToolResult(content=[])) == []
+
+
+def test_non_text_content_is_noted():
+    image = ImageContent(type="image", data="", mimeType="image/png")
+    assert content_value([image]) == {"type": "image", "note": "non-text content omitted"}
+
+
+def test_errors_are_not_projected():
+    compactor = ResultCompactor(budget=100)
+    message = "Error executing tool search_drug: " + "upstream timed out " * 20
+    compacted = compactor.compact("search_drug", result(message, is_error=True))
+    assert list(compacted) == ["error"]
+    assert compacted["error"].startswith("Error executing tool search_drug: upstream timed out")
+    assert not compactor.stored
+
+
+def test_large_result_is_projected_and_stored():
+    compactor = ResultCompactor(budget=200)
+    label = {"openfda": {"brand_name": ["Advil"], "spl_id": ["x" * 50]}, "warnings": ["w"], "package_label": "p" * 500}
+    compacted = compactor.compact("search_drug", result(label))
+    assert compacted["compacted"]
+    assert compacted["content"] == {"openfda": {"brand_name": ["Advil"]}, "warnings": ["w"]}
+    assert compactor.full(compacted) == label
+    page = compactor.read(compacted["handle"], offset=0, length=50)
+    assert page["text"] == json.dumps(label)[:50]
+    assert page["next_offset"] == 50
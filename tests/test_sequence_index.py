@@ -0,0 +1,80 @@
+import random
+import pytest
+import sequence_index
+from sequence_index import GAP, MATCH, MISMATCH, build, diagonal_window, encode, local_alignment_scores, open_indexes
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def random_protein(length: int) -> str:
+    return "".join(random.choice(AMINO_ACIDS) for _ in range(length))
+
+
+def mutate(sequence: str, share: float) -> str:
+    residues = list(sequence)
+    for position in random.sample(range(len(residues)), int(len(residues) * share)):
+        residues[position] = random.choice(AMINO_ACIDS)
+    return "".join(residues)
+
+
+def reference_score(query: str, target: str) -> int:
+    """Textbook Smith-Waterman with a linear gap cost."""
+    previous = [0] * (len(target) + 1)
+    best = 0
+    for a in query:
+        row = [0] * (len(target) + 1)
+        for j, b in enumerate(target, 1):
+            row[j] = max(0, previous[j - 1] + (MATCH if a == b else MISMATCH), previous[j] - GAP, row[j - 1] - GAP)
+        best = max(best, max(row))
+        previous = row
+    return best
+
+
+def test_scores_match_the_reference_across_lengths():
+    random.seed(1)
+    query = random_protein(60)
+    targets = [random_protein(length) for length in (5, 30, 61, 90, 150, 400)]
+    targets.append(random_protein(20) + mutate(query, 0.2) + random_protein(20))
+    scores = local_alignment_scores(encode(query), [encode(t) for t in targets])
+    assert list(scores) == [reference_score(query, t) for t in targets]
+
+
+def test_window_keeps_the_best_alignment_of_a_long_target():
+    random.seed(2)
+    query = random_protein(80)
+    target = random_protein(3000) + mutate(query, 0.2) + random_protein(3000)
+    window = diagonal_window(encode(query), encode(target), k=3)
+    assert len(window) < 200
+    assert local_alignment_scores(encode(query), [window])[0] == reference_score(query, target)
+
+
+@pytest.fixture
+def index(tmp_path):
+    random.seed(3)
+    sequences = [random_protein(random.randint(80, 300)) for _ in range(200)]
+    # one very long chain, with a fragment of sequence 0 in its middle
+    sequences.append(random_protein(20000) + sequences[0][:100] + random_protein(20000))
+    fasta = tmp_path / "pdb_seqres.txt"
+    fasta.write_text("".join(
+        f">{number:04d}_A mol:protein length:{len(s)}  SYNTHETIC\n{s}\n" for number, s in enumerate(sequences)
+    ))
+    build(str(fasta), str(tmp_path / "index"))
+    return open_indexes(str(tmp_path / "index"))["protein"], sequences
+
+
+def test_search_finds_the_source_and_the_long_chain(index):
+    index, sequences = index
+    random.seed(4)
+    hits = index.search(mutate(sequences[0][:100], 0.1), max_results=0)
+    chains = [hit["chains"][0] for hit in hits]
+    assert chains[:2] == ["0000_A", "0200_A"] or chains[:2] == ["0200_A", "0000_A"]
+
+
+def test_alignment_cost_is_capped(index, monkeypatch):
+    index, sequences = index
+    query = sequences[5]
+    aligned = index.search(query, max_results=0)
+    assert aligned[0]["chains"] == ["0005_A"] and aligned[0]["similarity"] == 1.0
+    # too little budget for even one alignment: ranked by shared k-mers instead
+    monkeypatch.setattr(sequence_index, "MAX_ALIGNMENT_CELLS", len(query))
+    assert index.search(query, max_results=1) == [{"chains": ["0005_A"], "similarity": 1.0}]
@@ -0,0 +1,83 @@
+import asyncio
+import sys
+import textwrap
+import time
+import pytest
+from mcp import StdioServerParameters
+from src.client.session_pool import CONNECTION_ERRORS, PING_TIMEOUT, ServerPool
+
+# a server whose tools kill their own process; `flaky` does so only on its first call
+SERVER = textwrap.dedent("""
+    import os
+    import sys
+    from mcp.server.fastmcp import FastMCP
+
+    mcp = FastMCP("dying")
+    MARKER = sys.argv[1]
+
+    @mcp.tool()
+    def crash() -> str:
+        os._exit(1)
+
+    @mcp.tool()
+    def flaky() -> str:
+        if not os.path.exists(MARKER):
+            open(MARKER, "w").close()
+            os._exit(1)
+        return "ok"
+
+    if __name__ == "__main__":
+        mcp.run(transport="stdio")
+""")
+
+
+@pytest.fixture
+def params(tmp_path):
+    script = tmp_path / "dying_server.py"
+    script.write_text(SERVER)
+    return StdioServerParameters(command=sys.executable, args=[str(script), str(tmp_path / "crashed")])
+
+
+def test_call_fails_as_soon_as_worker_dies(params):
+    async def run():
+        pool = ServerPool("dying", params)
+        await pool.start()
+        try:
+            start = time.monotonic()
+            with pytest.raises(CONNECTION_ERRORS):
+                await pool.call_tool("crash")
+            # not left waiting for the supervisor's ping to time out
+            assert time.monotonic() - start < PING_TIMEOUT
+            assert not pool.workers[0].healthy
+        finally:
+            await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_retry_goes_to_another_worker(params):
+    async def run():
+        pool = ServerPool("dying", params, workers=2)
+        await pool.start()
+        try:
+            result = await pool.call_tool("flaky", retry=True)
+            assert result.content[0].text == "ok"
+            assert sum(w.healthy for w in pool.workers) == 1
+        finally:
+            await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_retry_waits_for_the_restart_of_a_single_worker(params):
+    async def run():
+        pool = ServerPool("dying", params)
+        await pool.start()
+        try:
+            result = await pool.call_tool("flaky", retry=True)
+            assert result.content[0].text == "ok"
+            assert pool.restarts == 1
+        finally:
+            await pool.stop()
+
+    asyncio.run(run())